@@ -31,6 +31,26 @@ class Settings(BaseSettings):
     API_V1_PREFIX: str = "/api/v1"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     
+    # Background import jobs
+    IMPORT_SPOOL_DIR: str = "import_spool"
+    IMPORT_MAX_FILE_SIZE: int = 20 * 1024 * 1024 * 1024  # 20GB
+    IMPORT_MAX_CONCURRENT_JOBS: int = 1
+    IMPORT_PARSE_WORKERS: int = 0  # Parallel import parser processes, 0 = one per CPU
+    IMPORT_MAX_DECOMPRESSED_SIZE: int = 50 * 1024 * 1024 * 1024  # 50GB, per gzip/zstd upload
+    IMPORT_JOB_HEARTBEAT_SECONDS: int = 30  # How often a worker confirms it still owns a running job
+    IMPORT_JOB_STALE_SECONDS: int = 300  # Running jobs silent for this long are failed as abandoned
+    
+    # Response cache for dashboard and analytics, invalidated through data_versions
+    RESPONSE_CACHE_MAX_ENTRIES: int = 1000
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    
+    # Auto-casing of open violations after each scan
+    AUTO_CASE_AFTER_SCAN: bool = True
+    AUTO_CASE_WINDOW_DAYS: int = 0  # 0 = one case per account regardless of time
+    AUTO_CASE_BY_TYPOLOGY: bool = False  # Also split cases by the rule that fired
+    AUTO_CASE_MIN_VIOLATIONS: int = 1
+    
     # CORS Configuration
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:5174"
     
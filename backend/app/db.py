@@ -2,11 +2,18 @@
 MongoDB connection management using motor (async driver)
 """
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from typing import Optional
+from pymongo.errors import OperationFailure
+from typing import Optional, List, Tuple
 
 from app.config import settings
 
 
+# Oldest server the aggregations run on: $lookup with both localField and a
+# pipeline (control health, expanded case view) needs 5.0, auto-casing's
+# $firstN needs 5.2 (first in a major: 6.0)
+MIN_SERVER_VERSION = (6, 0)
+
+
 class Database:
     """MongoDB connection manager"""
     client: Optional[AsyncIOMotorClient] = None
@@ -26,6 +33,14 @@ async def connect_to_mongo():
     await db_manager.client.admin.command('ping')
     print(f"Connected to MongoDB database: {settings.MONGO_DB_NAME}")
     
+    info = await db_manager.client.server_info()
+    version = tuple(info.get("versionArray", [0, 0])[:2])
+    if version < MIN_SERVER_VERSION:
+        raise RuntimeError(
+            f"MongoDB {info.get('version')} is not supported; "
+            f"{'.'.join(map(str, MIN_SERVER_VERSION))} or newer is required"
+        )
+    
     # Create indexes
     await create_indexes()
 
@@ -45,6 +60,22 @@ def get_database() -> AsyncIOMotorDatabase:
     return db_manager.db
 
 
+async def ensure_unique_index(collection, keys: List[Tuple[str, int]]):
+    """
+    Create a unique index, replacing a non-unique index on the same keys
+    
+    Existing duplicates make the build fail; that is reported rather than
+    raised so startup still succeeds.
+    """
+    for name, info in (await collection.index_information()).items():
+        if info["key"] == keys and not info.get("unique"):
+            await collection.drop_index(name)
+    try:
+        await collection.create_index(keys, unique=True)
+    except OperationFailure as e:
+        print(f"Warning: could not create unique index {keys} on {collection.name}: {e}")
+
+
 async def create_indexes():
     """Create necessary indexes for collections"""
     db = get_database()
@@ -60,11 +91,13 @@ async def create_indexes():
     await db.rules.create_index("company_id")
     await db.rules.create_index("framework")
     await db.rules.create_index("control_id")
+    await db.rules.create_index([("company_id", 1), ("created_at", -1), ("_id", -1)])
     
     # Scan runs collection indexes
     await db.scan_runs.create_index("started_at")
     await db.scan_runs.create_index("status")
     await db.scan_runs.create_index("company_id")
+    await db.scan_runs.create_index([("company_id", 1), ("started_at", -1), ("_id", -1)])
     
     # Violations collection indexes
     await db.violations.create_index([("scan_run_id", 1), ("rule_id", 1)])
@@ -73,6 +106,13 @@ async def create_indexes():
     await db.violations.create_index("created_at")
     await db.violations.create_index("company_id")
     await db.violations.create_index("assigned_to_user_id")
+    await db.violations.create_index([("company_id", 1), ("account_ids", 1), ("created_at", -1)])
+    await db.violations.create_index([("company_id", 1), ("rule_id", 1), ("created_at", -1)])
+    await db.violations.create_index([("company_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.violations.create_index([("company_id", 1), ("framework", 1), ("created_at", -1), ("_id", -1)])
+    await db.violations.create_index([("company_id", 1), ("control_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.violations.create_index([("company_id", 1), ("status", 1), ("case_ids", 1), ("created_at", 1)])
+    await db.violations.create_index([("company_id", 1), ("case_ids", 1), ("created_at", -1), ("_id", -1)])
     
     # Cases collection indexes
     await db.cases.create_index("company_id")
@@ -80,5 +120,48 @@ async def create_indexes():
     await db.cases.create_index("severity")
     await db.cases.create_index("assigned_to_user_id")
     await db.cases.create_index("created_at")
+    await db.cases.create_index([("company_id", 1), ("created_at", -1), ("_id", -1)])
+    # At most one open auto-case per group, so concurrent scans upsert onto the same case
+    try:
+        await db.cases.create_index(
+            [("company_id", 1), ("auto_case_key", 1)],
+            unique=True,
+            partialFilterExpression={"auto_case_key": {"$type": "string"}, "status": {"$in": ["OPEN", "IN_REVIEW"]}}
+        )
+    except OperationFailure as e:
+        print(f"Warning: could not create unique auto_case_key index on cases: {e}")
+    
+    # Comments on violations and cases, paged newest first per entity
+    await db.comments.create_index(
+        [("company_id", 1), ("entity_type", 1), ("entity_id", 1), ("created_at", -1), ("_id", -1)]
+    )
+    
+    # Dataset recommendations are listed per company plus the global (null company) set
+    await db.dataset_recommendations.create_index([("company_id", 1), ("risk_level", -1), ("_id", -1)])
+    
+    # Account risk collection indexes
+    await db.account_risk.create_index([("company_id", 1), ("account_id", 1)], unique=True)
+    await db.account_risk.create_index([("company_id", 1), ("risk_score", -1)])
+    
+    # Rule metrics collection indexes
+    await db.rule_metrics.create_index([("company_id", 1), ("rule_id", 1)], unique=True)
+    
+    # Daily violation rollups
+    await db.violation_daily_stats.create_index(
+        [("company_id", 1), ("day", 1), ("severity", 1), ("rule_id", 1)], unique=True
+    )
+    
+    # Natural keys used by upsert imports
+    await ensure_unique_index(db.transactions, [("company_id", 1), ("transaction_id", 1)])
+    await ensure_unique_index(db.accounts, [("company_id", 1), ("account_id", 1)])
+    await db.accounts.create_index([("company_id", 1), ("_id", -1)])
+    
+    # Ground-truth label counts for detection metrics
+    await db.transactions.create_index([("company_id", 1), ("is_laundering", 1)])
+    
+    # Import jobs collection indexes
+    await db.import_jobs.create_index([("company_id", 1), ("created_at", -1)])
+    await db.import_jobs.create_index("status")
+    await db.import_jobs.create_index([("status", 1), ("heartbeat_at", 1)])
     
     print("Database indexes created successfully")
@@ -5,12 +5,16 @@ Main entry point for the backend API
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
-from app.db import connect_to_mongo, close_mongo_connection
+from app.config import settings as app_settings
+from app.db import connect_to_mongo, close_mongo_connection, get_database
 from app.routes import (
     policies, rules, scans, violations, test_llm, dashboard, 
     auth, accounts, settings, cases, analytics, data_import, dataset
 )
+from app.services.import_jobs import resume_pending_jobs, watch_import_jobs
+from app.services.upload_streams import RequestSizeLimitMiddleware
 
 
 @asynccontextmanager
@@ -18,8 +22,11 @@ async def lifespan(app: FastAPI):
     """Handle startup and shutdown events"""
     # Startup
     await connect_to_mongo()
+    await resume_pending_jobs(get_database())
+    reaper = asyncio.create_task(watch_import_jobs(get_database()))
     yield
     # Shutdown
+    reaper.cancel()
     await close_mongo_connection()
 
 
@@ -30,6 +37,15 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Refuse oversized uploads before Starlette spools them to disk
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/data/import/": app_settings.MAX_UPLOAD_SIZE,
+        "/data/import/jobs": app_settings.IMPORT_MAX_FILE_SIZE,
+    },
+)
+
 # CORS middleware for React frontend
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +53,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "Content-Disposition"],
 )
 
 # Include routers
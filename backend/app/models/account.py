@@ -20,9 +20,11 @@ class AccountRiskScore(BaseModel):
     risk_level: RiskLevel
     risk_score: float = Field(..., ge=0, le=100)
     violation_count: int = 0
+    critical_severity_count: int = 0
     high_severity_count: int = 0
     medium_severity_count: int = 0
     low_severity_count: int = 0
+    network_score: float = 0.0
     last_violation_date: Optional[datetime] = None
     calculated_at: datetime
 
@@ -35,6 +37,8 @@ class AccountSummary(BaseModel):
     balance: Optional[float] = None
     status: Optional[str] = None
     risk_score: Optional[int] = 0
+    risk_level: Optional[RiskLevel] = None
+    computed_risk_score: Optional[float] = None
     
     model_config = {
         "populate_by_name": True,
@@ -74,8 +74,8 @@ class CaseIn(BaseModel):
     level: CaseLevel = CaseLevel.L1
 
 
-class CaseOut(BaseModel):
-    """Response model for case"""
+class CaseSummaryOut(BaseModel):
+    """Case fields shared by every case response"""
     id: str = Field(validation_alias="_id")
     company_id: str
     title: str
@@ -84,12 +84,13 @@ class CaseOut(BaseModel):
     status: CaseStatus
     assigned_to_user_id: Optional[str] = None
     assigned_to_user_name: Optional[str] = None
-    linked_violation_ids: List[str] = Field(default_factory=list)
-    comments: List[CaseComment] = Field(default_factory=list)
+    comments: List[CaseComment] = Field(default_factory=list, description="Latest comments; empty in list views")
+    comment_count: int = 0
     due_by: Optional[datetime] = None
     sla_status: SLAStatus = SLAStatus.ON_TRACK
     level: CaseLevel = CaseLevel.L1
     activity_log: List[ActivityLogEntry] = Field(default_factory=list)
+    auto_case_key: Optional[str] = Field(None, description="Grouping key of cases opened by auto-casing")
     created_at: datetime
     updated_at: datetime
     created_by: str
@@ -101,6 +102,38 @@ class CaseOut(BaseModel):
     }
 
 
+class CaseOut(CaseSummaryOut):
+    """Response model for case"""
+    linked_violation_ids: List[str] = Field(default_factory=list)
+
+
+class LinkedViolation(BaseModel):
+    """Summary of a violation linked to a case"""
+    id: str = Field(validation_alias="_id")
+    rule_id: str
+    rule_name: str
+    framework: Optional[str] = None
+    control_id: Optional[str] = None
+    collection: str
+    document_id: str
+    account_ids: List[str] = Field(default_factory=list)
+    severity: str
+    status: str
+    assigned_to_user_name: Optional[str] = None
+    created_at: datetime
+    
+    model_config = {
+        "populate_by_name": True,
+        "from_attributes": True
+    }
+
+
+class CaseDetailOut(CaseSummaryOut):
+    """Case with one page of its linked violations in place of linked_violation_ids"""
+    linked_violations: List[LinkedViolation] = Field(default_factory=list)
+    linked_violation_count: int = 0
+
+
 class CaseUpdate(BaseModel):
     """Model for updating case fields"""
     title: Optional[str] = None
@@ -112,6 +145,22 @@ class CaseUpdate(BaseModel):
     level: Optional[CaseLevel] = None
 
 
+class AutoCaseRequest(BaseModel):
+    """Request model for running auto-casing"""
+    scan_run_id: Optional[str] = Field(None, description="Only case violations from this scan")
+    window_days: Optional[int] = Field(None, ge=1, le=365, description="Split cases into windows of this many days")
+    by_typology: bool = Field(False, description="Split cases by the rule that fired")
+    min_violations: int = Field(1, ge=1, description="Leave smaller groups un-cased")
+
+
+class AutoCaseResult(BaseModel):
+    """Result of an auto-casing run"""
+    groups: int
+    cases_created: int
+    cases_extended: int
+    violations_linked: int
+
+
 class CommentIn(BaseModel):
     """Request model for adding a comment"""
     comment: str = Field(..., min_length=1, max_length=2000)
@@ -0,0 +1,21 @@
+"""
+Pydantic models for comments on violations and cases
+"""
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class CommentOut(BaseModel):
+    """Response model for a stored comment"""
+    id: str = Field(validation_alias="_id")
+    entity_type: str
+    entity_id: str
+    user_id: str
+    user_name: str
+    comment: str
+    created_at: datetime
+    
+    model_config = {
+        "populate_by_name": True,
+        "from_attributes": True
+    }
@@ -0,0 +1,37 @@
+"""
+Pydantic models for background import jobs
+"""
+from pydantic import BaseModel, Field
+from typing import Optional
+from enum import Enum
+
+
+class ImportJobStatus(str, Enum):
+    """Import job lifecycle"""
+    UPLOADING = "UPLOADING"
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+
+class ImportMode(str, Enum):
+    """How imported rows are written"""
+    INSERT = "insert"  # Always insert new documents
+    UPSERT = "upsert"  # Insert or update by natural key (transactions and accounts only)
+
+
+class ImportJobCreate(BaseModel):
+    """Request model for starting a chunked upload"""
+    import_type: str = Field(..., description="transactions, accounts or payroll")
+    mode: ImportMode = ImportMode.INSERT
+    filename: str = Field(..., min_length=1, max_length=255)
+    total_size: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Expected file size in bytes, checked when the upload is completed"
+    )
+    parallel: bool = Field(
+        False,
+        description="Parse uncompressed CSVs in a process pool; quoted fields must not contain line breaks"
+    )
@@ -63,3 +63,5 @@ class ScanSummary(BaseModel):
     total_violations_found: int
     execution_time_seconds: float
     rule_results: List[RuleScanResult]
+    cases_created: int = 0
+    cases_extended: int = 0
@@ -30,6 +30,8 @@ class Violation(BaseModel):
     scan_run_id: str
     rule_id: str
     rule_name: str
+    framework: Optional[str] = None
+    control_id: Optional[str] = None
     collection: str
     document_id: str = Field(description="ID of the violating document")
     document_data: Dict[str, Any] = Field(description="Snapshot of violating document")
@@ -42,7 +44,9 @@ class Violation(BaseModel):
     remediation_suggestions: Optional[List[Dict[str, Any]]] = Field(None, description="AI-generated remediation suggestions")
     assigned_to_user_id: Optional[str] = None
     assigned_to_user_name: Optional[str] = None
-    comments: List[ViolationComment] = Field(default_factory=list)
+    comments: List[ViolationComment] = Field(default_factory=list, description="Latest comments; empty in list views")
+    comment_count: int = 0
+    case_ids: List[str] = Field(default_factory=list, description="Cases this violation is linked to")
     created_at: datetime
     
     model_config = {
@@ -68,6 +72,47 @@ class ViolationFilters(BaseModel):
     offset: int = Field(default=0, ge=0)
 
 
+class BulkViolationFilter(BaseModel):
+    """Filter selecting violations for a bulk change"""
+    rule_id: Optional[str] = None
+    severity: Optional[str] = None
+    status: Optional[ViolationStatus] = None
+    scan_run_id: Optional[str] = None
+    framework: Optional[str] = None
+    control_id: Optional[str] = None
+    account_id: Optional[str] = None
+
+
+class ViolationSelection(BaseModel):
+    """Violations targeted by a bulk change: explicit IDs, a filter, or both"""
+    violation_ids: Optional[List[str]] = Field(None, max_length=10000)
+    filter: Optional[BulkViolationFilter] = None
+
+
+class BulkViolationUpdate(ViolationSelection):
+    """Model for updating the status of many violations"""
+    status: ViolationStatus
+    reviewer_note: Optional[str] = None
+    reviewed_by: Optional[str] = None
+
+
+class BulkAssignmentUpdate(ViolationSelection):
+    """Model for assigning many violations"""
+    assigned_to_user_id: Optional[str] = None
+    assigned_to_user_name: Optional[str] = None
+
+
+class BulkCommentIn(ViolationSelection):
+    """Model for adding the same comment to many violations"""
+    comment: str = Field(..., min_length=1, max_length=2000)
+
+
+class BulkUpdateResult(BaseModel):
+    """Counts returned by bulk violation changes"""
+    matched_count: int
+    modified_count: int
+
+
 class CommentIn(BaseModel):
     """Request model for adding a comment"""
     comment: str = Field(..., min_length=1, max_length=2000)
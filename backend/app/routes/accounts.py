@@ -1,49 +1,69 @@
 """
 Account and risk scoring routes
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 
 from app.db import get_database
-from app.models.account import AccountDetail, AccountRiskScore, RiskLevel, AccountSummary
+from app.models.account import AccountDetail, AccountRiskScore, AccountSummary
 from app.models.user import TokenData
 from app.routes.auth import get_current_user
+from app.services.account_risk import get_account_risk, risk_level_for_score
+from app.services.pagination import fetch_page
 
 router = APIRouter(prefix="/accounts", tags=["Accounts"])
 
 
 @router.get("/", response_model=List[AccountSummary])
 async def list_accounts(
+    response: Response,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     List all accounts for the current company
+    Most recently added first; pass the X-Next-Cursor header back as `cursor` for the next page
     """
     db = get_database()
     
     # Build query - handle both with and without company_id for backward compatibility
     query = {"company_id": current_user.company_id}
     
-    cursor = db.accounts.find(query).skip(offset).limit(limit)
-    accounts = await cursor.to_list(length=limit)
+    try:
+        accounts, next_cursor = await fetch_page(db.accounts, query, "_id", limit, cursor, offset)
+        
+        # If no accounts found with company_id, try without (for legacy data)
+        if not accounts:
+            accounts, next_cursor = await fetch_page(db.accounts, {}, "_id", limit, cursor, offset)
+            # Add company_id to legacy accounts
+            for account in accounts:
+                if "company_id" not in account:
+                    account["company_id"] = current_user.company_id
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    # If no accounts found with company_id, try without (for legacy data)
-    if not accounts:
-        cursor = db.accounts.find({}).skip(offset).limit(limit)
-        accounts = await cursor.to_list(length=limit)
-        # Add company_id to legacy accounts
-        for account in accounts:
-            if "company_id" not in account:
-                account["company_id"] = current_user.company_id
+    # Attach precomputed risk scores for this page of accounts
+    account_ids = [a["account_id"] for a in accounts if a.get("account_id")]
+    risk_docs = await db.account_risk.find(
+        {"company_id": current_user.company_id, "account_id": {"$in": account_ids}},
+        {"account_id": 1, "risk_score": 1, "risk_level": 1}
+    ).to_list(length=len(account_ids))
+    risk_by_account = {r["account_id"]: r for r in risk_docs}
     
     # Ensure _id is converted to string for Pydantic
     for account in accounts:
         if "_id" in account:
             account["_id"] = str(account["_id"])
+        risk = risk_by_account.get(account.get("account_id"))
+        if risk:
+            account["computed_risk_score"] = risk["risk_score"]
+            account["risk_level"] = risk["risk_level"]
     
     return accounts
 
@@ -67,36 +87,29 @@ async def get_account_detail(
     if not account_data:
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Get violations for this account (checking various potential account fields)
-    violations = await db.violations.find({
-        "company_id": current_user.company_id,
-        "$or": [
-            {"document_data.account_id": account_id},
-            {"document_data.src_account": account_id},
-            {"document_data.dst_account": account_id}
-        ]
-    }).sort("created_at", -1).limit(20).to_list(20)
+    # Get recent violations involving this account (multikey index seek)
+    violations = await db.violations.find(
+        {"company_id": current_user.company_id, "account_ids": account_id},
+        {"rule_name": 1, "severity": 1, "created_at": 1}
+    ).sort("created_at", -1).limit(20).to_list(20)
     
-    # Calculate risk score
-    high_count = sum(1 for v in violations if v.get("severity") == "HIGH")
-    medium_count = sum(1 for v in violations if v.get("severity") == "MEDIUM")
-    low_count = sum(1 for v in violations if v.get("severity") == "LOW")
-    
-    risk_score = (high_count * 10 + medium_count * 5 + low_count * 2)
-    risk_level = RiskLevel.CRITICAL if risk_score > 50 else \
-                 RiskLevel.HIGH if risk_score > 30 else \
-                 RiskLevel.MEDIUM if risk_score > 10 else RiskLevel.LOW
+    # Risk score is precomputed by the account risk batch job
+    risk = await get_account_risk(db, current_user.company_id, account_id) or {}
+    risk_score = risk.get("risk_score", 0.0)
     
     risk_score_obj = AccountRiskScore(
         account_id=account_id,
         company_id=current_user.company_id,
-        risk_level=risk_level,
-        risk_score=min(risk_score, 100),
-        violation_count=len(violations),
-        high_severity_count=high_count,
-        medium_severity_count=medium_count,
-        low_severity_count=low_count,
-        calculated_at=datetime.utcnow()
+        risk_level=risk.get("risk_level", risk_level_for_score(risk_score)),
+        risk_score=risk_score,
+        violation_count=risk.get("violation_count", 0),
+        critical_severity_count=risk.get("critical_count", 0),
+        high_severity_count=risk.get("high_count", 0),
+        medium_severity_count=risk.get("medium_count", 0),
+        low_severity_count=risk.get("low_count", 0),
+        network_score=risk.get("network_score", 0.0),
+        last_violation_date=risk.get("last_violation_at"),
+        calculated_at=risk.get("calculated_at", datetime.utcnow())
     )
     
     return AccountDetail(
@@ -1,18 +1,21 @@
 """
 Analytics and reporting endpoints
 """
-from fastapi import APIRouter, Depends
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
-from bson import ObjectId
+from fastapi import APIRouter, Depends, Query
+from typing import Dict, Any
 
 from app.db import get_database
 from app.routes.auth import get_current_user, TokenData
+from app.routes.conditional import conditional_get
+from app.services.detection_metrics import refresh_detection_metrics
+from app.services.rule_metrics import get_rule_metrics
+from app.services.violation_stats import get_violation_trends
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
 
-@router.get("/control-health")
+@router.get("/control-health", dependencies=[Depends(conditional_get)])
 async def get_control_health(current_user: TokenData = Depends(get_current_user)):
     """
     Get control health metrics per rule
@@ -21,64 +24,74 @@ async def get_control_health(current_user: TokenData = Depends(get_current_user)
     db = get_database()
     company_id = current_user.company_id
     
-    # Get all rules for the company
-    rules = await db.rules.find({"company_id": company_id}).to_list(length=1000)
+    # Scans are not per rule, so every rule shares the same scan count
+    total_scans = await db.scan_runs.count_documents({
+        "company_id": company_id,
+        "status": "COMPLETED"
+    })
     
-    control_health = []
+    # Rules joined to their violation stats; each lookup is an index range
+    # on (company_id, rule_id, created_at)
+    pipeline = [
+        {"$match": {"company_id": company_id}},
+        {"$limit": 1000},
+        {"$set": {"rule_id": {"$toString": "$_id"}}},
+        {
+            "$lookup": {
+                "from": "violations",
+                "localField": "rule_id",
+                "foreignField": "rule_id",
+                "pipeline": [
+                    {"$match": {"company_id": company_id}},
+                    {"$group": {
+                        "_id": None,
+                        "total_violations": {"$sum": 1},
+                        "last_seen_at": {"$max": "$created_at"}
+                    }}
+                ],
+                "as": "stats"
+            }
+        },
+        {"$set": {"stats": {"$first": "$stats"}}},
+        {"$sort": {"stats.total_violations": -1}}
+    ]
     
-    for rule in rules:
-        rule_id = str(rule["_id"])
-        
-        # Count total scans that checked this rule
-        total_scans = await db.scan_runs.count_documents({
-            "company_id": company_id,
-            "status": "COMPLETED"
-        })
-        
-        # Count violations for this rule
-        total_violations = await db.violations.count_documents({
-            "company_id": company_id,
-            "rule_id": rule_id
-        })
-        
-        # Get last violation date
-        last_violation = await db.violations.find_one(
-            {"company_id": company_id, "rule_id": rule_id},
-            sort=[("created_at", -1)]
-        )
-        
-        last_seen_at = last_violation["created_at"].isoformat() if last_violation else None
-        
-        # Calculate average violations per scan
-        avg_violations = round(total_violations / total_scans, 2) if total_scans > 0 else 0
+    control_health = []
+    async for rule in db.rules.aggregate(pipeline):
+        stats = rule.get("stats") or {}
+        total_violations = stats.get("total_violations", 0)
+        last_seen_at = stats.get("last_seen_at")
         
         control_health.append({
-            "rule_id": rule_id,
+            "rule_id": rule["rule_id"],
             "rule_name": rule.get("name", "Unknown"),
             "framework": rule.get("framework", "AML"),
             "control_id": rule.get("control_id"),
             "severity": rule.get("severity", "MEDIUM"),
             "total_scans": total_scans,
             "total_violations": total_violations,
-            "last_seen_at": last_seen_at,
-            "average_violations_per_scan": avg_violations,
+            "last_seen_at": last_seen_at.isoformat() if last_seen_at else None,
+            "average_violations_per_scan": round(total_violations / total_scans, 2) if total_scans > 0 else 0,
             "enabled": rule.get("enabled", True)
         })
     
-    # Sort by total violations descending
-    control_health.sort(key=lambda x: x["total_violations"], reverse=True)
-    
     return control_health
 
 
-@router.get("/top-risks")
+@router.get("/top-risks", dependencies=[Depends(conditional_get)])
 async def get_top_risks(current_user: TokenData = Depends(get_current_user)):
     """
     Get top risk accounts and rules
     """
     db = get_database()
     company_id = current_user.company_id
-    
+    return await response_cache.get_or_compute(
+        db, company_id, "analytics/top-risks", {}, lambda: compute_top_risks(db, company_id)
+    )
+
+
+async def compute_top_risks(db, company_id: str) -> Dict[str, Any]:
+    """Top rules by violation count and top accounts by risk score"""
     # Top 5 rules by violation count
     top_rules_pipeline = [
         {"$match": {"company_id": company_id}},
@@ -111,35 +124,31 @@ async def get_top_risks(current_user: TokenData = Depends(get_current_user)):
         for rule in top_rules
     ]
     
-    # Top 5 accounts by violation count
-    top_accounts_pipeline = [
-        {"$match": {"company_id": company_id, "collection": "accounts"}},
-        {"$group": {
-            "_id": "$document_id",
-            "violation_count": {"$sum": 1},
-            "critical_count": {
-                "$sum": {"$cond": [{"$eq": ["$severity", "CRITICAL"]}, 1, 0]}
-            },
-            "high_count": {
-                "$sum": {"$cond": [{"$eq": ["$severity", "HIGH"]}, 1, 0]}
-            },
-            "account_data": {"$first": "$document_data"}
-        }},
-        {"$sort": {"violation_count": -1}},
-        {"$limit": 5}
-    ]
+    # Top 5 accounts from the materialized account risk table
+    top_accounts = await db.account_risk.find(
+        {"company_id": company_id}
+    ).sort("risk_score", -1).limit(5).to_list(length=5)
     
-    top_accounts = await db.violations.aggregate(top_accounts_pipeline).to_list(length=5)
+    account_ids = [acc["account_id"] for acc in top_accounts]
+    account_docs = await db.accounts.find(
+        {"company_id": company_id, "account_id": {"$in": account_ids}},
+        {"account_id": 1, "account_name": 1, "customer_name": 1}
+    ).to_list(length=len(account_ids))
+    names = {
+        a["account_id"]: a.get("account_name") or a.get("customer_name") or "Unknown"
+        for a in account_docs
+    }
     
     # Format top accounts
     top_accounts_formatted = [
         {
-            "account_id": str(acc["_id"]),
-            "account_name": acc["account_data"].get("account_name", "Unknown"),
-            "violation_count": acc["violation_count"],
-            "critical_count": acc["critical_count"],
-            "high_count": acc["high_count"],
-            "risk_score": (acc["critical_count"] * 10 + acc["high_count"] * 5)
+            "account_id": acc["account_id"],
+            "account_name": names.get(acc["account_id"], "Unknown"),
+            "violation_count": acc.get("violation_count", 0),
+            "critical_count": acc.get("critical_count", 0),
+            "high_count": acc.get("high_count", 0),
+            "risk_score": acc.get("risk_score", 0),
+            "risk_level": acc.get("risk_level")
         }
         for acc in top_accounts
     ]
@@ -150,14 +159,20 @@ async def get_top_risks(current_user: TokenData = Depends(get_current_user)):
     }
 
 
-@router.get("/framework-coverage")
+@router.get("/framework-coverage", dependencies=[Depends(conditional_get)])
 async def get_framework_coverage(current_user: TokenData = Depends(get_current_user)):
     """
     Get coverage statistics per framework and control
     """
     db = get_database()
     company_id = current_user.company_id
-    
+    return await response_cache.get_or_compute(
+        db, company_id, "analytics/framework-coverage", {}, lambda: compute_framework_coverage(db, company_id)
+    )
+
+
+async def compute_framework_coverage(db, company_id: str) -> Dict[str, Any]:
+    """Rule counts per framework and per control"""
     # Count rules per framework
     framework_pipeline = [
         {"$match": {"company_id": company_id}},
@@ -212,60 +227,37 @@ async def get_framework_coverage(current_user: TokenData = Depends(get_current_u
     }
 
 
-@router.get("/trends")
+@router.get("/trends", dependencies=[Depends(conditional_get)])
 async def get_trends(
     days: int = 30,
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     Get violation trends over time
+    Read from the violation_daily_stats rollup, so long ranges stay cheap
     """
     db = get_database()
     company_id = current_user.company_id
-    
-    # Get violations from last N days
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    pipeline = [
-        {"$match": {
-            "company_id": company_id,
-            "created_at": {"$gte": start_date}
-        }},
-        {"$group": {
-            "_id": {
-                "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
-                "severity": "$severity"
-            },
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"_id.date": 1}}
-    ]
-    
-    results = await db.violations.aggregate(pipeline).to_list(length=1000)
-    
-    # Format results
-    trends = {}
-    for result in results:
-        date = result["_id"]["date"]
-        severity = result["_id"]["severity"]
-        count = result["count"]
-        
-        if date not in trends:
-            trends[date] = {"date": date, "LOW": 0, "MEDIUM": 0, "HIGH": 0, "CRITICAL": 0}
-        
-        trends[date][severity] = count
-    
-    return list(trends.values())
-
+    return await response_cache.get_or_compute(
+        db, company_id, "analytics/trends", {"days": days},
+        lambda: get_violation_trends(db, company_id, days)
+    )
 
 
 @router.get("/detection-metrics")
-async def get_detection_metrics(current_user: TokenData = Depends(get_current_user)):
+async def get_detection_metrics(
+    refresh: bool = Query(False, description="Recompute from current violations and labels"),
+    current_user: TokenData = Depends(get_current_user)
+):
     """
     Get detection accuracy metrics based on ground truth labels from IBM AML dataset
+    Includes precision, recall and F1 per rule under by_rule
     """
     db = get_database()
     
+    if refresh:
+        return await refresh_detection_metrics(db, current_user.company_id)
+    
     metrics = await db.detection_metrics.find_one(
         {"company_id": current_user.company_id},
         sort=[("calculated_at", -1)]
@@ -273,7 +265,7 @@ async def get_detection_metrics(current_user: TokenData = Depends(get_current_us
     
     if not metrics:
         return {
-            "message": "No detection metrics available. Run add_aml_labels.py to generate metrics.",
+            "message": "No detection metrics available. Run add_aml_labels.py or pass refresh=true to generate metrics.",
             "metrics": None
         }
     
@@ -284,17 +276,34 @@ async def get_detection_metrics(current_user: TokenData = Depends(get_current_us
     return metrics
 
 
-@router.get("/laundering-by-type")
+@router.get("/rule-metrics", dependencies=[Depends(conditional_get)])
+async def get_live_rule_metrics(current_user: TokenData = Depends(get_current_user)):
+    """
+    Get live per-rule precision and alert yield
+    Read from counters kept current as violations are created and reviewed
+    """
+    db = get_database()
+    return {"rules": await get_rule_metrics(db, current_user.company_id)}
+
+
+@router.get("/laundering-by-type", dependencies=[Depends(conditional_get)])
 async def get_laundering_by_type(current_user: TokenData = Depends(get_current_user)):
     """
     Get laundering activity breakdown by type
     """
     db = get_database()
-    
+    company_id = current_user.company_id
+    return await response_cache.get_or_compute(
+        db, company_id, "analytics/laundering-by-type", {}, lambda: compute_laundering_by_type(db, company_id)
+    )
+
+
+async def compute_laundering_by_type(db, company_id: str) -> Dict[str, Any]:
+    """Labelled laundering transactions grouped by type"""
     pipeline = [
         {
             "$match": {
-                "company_id": current_user.company_id,
+                "company_id": company_id,
                 "is_laundering": True
             }
         },
@@ -324,3 +333,11 @@ async def get_laundering_by_type(current_user: TokenData = Depends(get_current_u
             for r in results
         ]
     }
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(current_user: TokenData = Depends(get_current_user)):
+    """
+    Get response cache hit/miss counters for the worker serving the request
+    """
+    return response_cache.stats()
@@ -1,18 +1,57 @@
 """
 Case Management endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from app.db import get_database
-from app.models.case import CaseIn, CaseOut, CaseUpdate, CommentIn, CaseStatus, CaseSeverity, CaseComment
+from app.models.case import (
+    CaseIn, CaseOut, CaseDetailOut, CaseUpdate, CommentIn, CaseStatus, CaseSeverity,
+    AutoCaseRequest, AutoCaseResult
+)
+from app.models.comment import CommentOut
 from app.routes.auth import get_current_user, TokenData
+from app.routes.conditional import conditional_get
+from app.services.response_cache import bump_data_version
+from app.services.pagination import fetch_page
+from app.services import comment_service
+from app.services.auto_case import auto_case_violations
+from app.services.case_detail import get_case_detail
+from app.services.export_service import (
+    ExportFormat, FORMAT_MEDIA, CASE_EXPORT_FIELDS, EXPORT_CHUNK_ROWS, export_projection, stream_export
+)
 
 router = APIRouter()
 
 
+def _case_filter(
+    company_id: str,
+    status: Optional[CaseStatus] = None,
+    severity: Optional[CaseSeverity] = None,
+    assigned_to: Optional[str] = None
+) -> Dict[str, Any]:
+    """Mongo filter for the list and export query parameters"""
+    query_filter = {"company_id": company_id}
+    if status:
+        query_filter["status"] = status
+    if severity:
+        query_filter["severity"] = severity
+    if assigned_to:
+        query_filter["assigned_to_user_id"] = assigned_to
+    return query_filter
+
+
+async def _with_comments(db, company_id: str, case: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the latest comments from the comments collection to a single case"""
+    case["comments"] = await comment_service.recent_comments(db, company_id, comment_service.CASE, str(case["_id"]))
+    return case
+
+
 @router.post("/", response_model=CaseOut, status_code=201)
 async def create_case(case_data: CaseIn, current_user: TokenData = Depends(get_current_user)):
     """
@@ -42,7 +81,7 @@ async def create_case(case_data: CaseIn, current_user: TokenData = Depends(get_c
         "assigned_to_user_id": case_data.assigned_to_user_id,
         "assigned_to_user_name": None,  # TODO: Fetch from users collection
         "linked_violation_ids": case_data.violation_ids,
-        "comments": [],
+        "comment_count": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow(),
         "created_by": current_user.user_id,
@@ -52,45 +91,105 @@ async def create_case(case_data: CaseIn, current_user: TokenData = Depends(get_c
     result = await db.cases.insert_one(case_doc)
     case_doc["_id"] = str(result.inserted_id)
     
+    # Mark the violations as cased so auto-casing leaves them alone
+    if case_data.violation_ids:
+        await db.violations.update_many(
+            {"_id": {"$in": violation_ids}, "company_id": company_id},
+            {"$addToSet": {"case_ids": case_doc["_id"]}}
+        )
+    await bump_data_version(db, company_id)
+    
     return CaseOut(**case_doc)
 
 
-@router.get("/", response_model=List[CaseOut])
+@router.post("/auto", response_model=AutoCaseResult)
+async def run_auto_casing(request: AutoCaseRequest, current_user: TokenData = Depends(get_current_user)):
+    """
+    Group open, un-cased violations by primary account into new or existing cases
+    Runs automatically after each scan; call this to re-run with other grouping options
+    """
+    db = get_database()
+    
+    if request.scan_run_id and not ObjectId.is_valid(request.scan_run_id):
+        raise HTTPException(status_code=400, detail="Invalid scan run ID format")
+    
+    summary = await auto_case_violations(
+        db,
+        current_user.company_id,
+        scan_run_id=request.scan_run_id,
+        window_days=request.window_days,
+        by_typology=request.by_typology,
+        min_violations=request.min_violations
+    )
+    return AutoCaseResult(**summary)
+
+
+@router.get("/", response_model=List[CaseOut], dependencies=[Depends(conditional_get)])
 async def list_cases(
+    response: Response,
     status: Optional[CaseStatus] = Query(None, description="Filter by status"),
     severity: Optional[CaseSeverity] = Query(None, description="Filter by severity"),
     assigned_to: Optional[str] = Query(None, description="Filter by assigned user ID"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     List cases with optional filters and pagination
+    Newest first; pass the X-Next-Cursor header back as `cursor` for the next page
     """
     db = get_database()
-    company_id = current_user.company_id
-    
-    # Build query filter
-    query_filter = {"company_id": company_id}
-    if status:
-        query_filter["status"] = status
-    if severity:
-        query_filter["severity"] = severity
-    if assigned_to:
-        query_filter["assigned_to_user_id"] = assigned_to
+    query_filter = _case_filter(current_user.company_id, status, severity, assigned_to)
     
     # Execute query
-    cursor = db.cases.find(query_filter).sort("created_at", -1).skip(offset).limit(limit)
-    cases = await cursor.to_list(length=limit)
+    try:
+        cases, next_cursor = await fetch_page(
+            db.cases, query_filter, "created_at", limit, cursor, offset, projection={"comments": 0}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    # Convert ObjectId to string
+    # Convert ObjectId to string; list views carry only comment_count
     for case in cases:
         case["_id"] = str(case["_id"])
     
     return [CaseOut(**case) for case in cases]
 
 
-@router.get("/{case_id}", response_model=CaseOut)
+@router.get("/export")
+async def export_cases(
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="csv, ndjson or parquet"),
+    compress: bool = Query(False, alias="gzip", description="Gzip the export"),
+    status: Optional[CaseStatus] = Query(None, description="Filter by status"),
+    severity: Optional[CaseSeverity] = Query(None, description="Filter by severity"),
+    assigned_to: Optional[str] = Query(None, description="Filter by assigned user ID"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Stream every case matching the filters as a file download
+    Rows are read from a server cursor and written in chunks, newest first
+    """
+    db = get_database()
+    query_filter = _case_filter(current_user.company_id, status, severity, assigned_to)
+    
+    cursor = db.cases.find(query_filter, export_projection(CASE_EXPORT_FIELDS), batch_size=EXPORT_CHUNK_ROWS)
+    cursor = cursor.sort([("created_at", -1), ("_id", -1)])
+    
+    media_type, extension = FORMAT_MEDIA[export_format]
+    filename = f"cases_{datetime.utcnow():%Y%m%d_%H%M%S}.{extension}"
+    if compress:
+        media_type, filename = "application/gzip", f"{filename}.gz"
+    return StreamingResponse(
+        stream_export(cursor, CASE_EXPORT_FIELDS, export_format, compress=compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/{case_id}", response_model=CaseOut, dependencies=[Depends(conditional_get)])
 async def get_case(case_id: str, current_user: TokenData = Depends(get_current_user)):
     """
     Get a specific case by ID with linked violations
@@ -101,18 +200,52 @@ async def get_case(case_id: str, current_user: TokenData = Depends(get_current_u
     if not ObjectId.is_valid(case_id):
         raise HTTPException(status_code=400, detail="Invalid case ID format")
     
-    case = await db.cases.find_one({
-        "_id": ObjectId(case_id),
-        "company_id": company_id
-    })
+    case = await db.cases.find_one(
+        {"_id": ObjectId(case_id), "company_id": company_id},
+        {"comments": 0}
+    )
     
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
     
+    await _with_comments(db, company_id, case)
     case["_id"] = str(case["_id"])
     return CaseOut(**case)
 
 
+@router.get("/{case_id}/expanded", response_model=CaseDetailOut, dependencies=[Depends(conditional_get)])
+async def get_case_expanded(
+    response: Response,
+    case_id: str,
+    limit: int = Query(50, ge=1, le=200, description="Linked violations per page"),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Get a case with a page of its linked violations joined in one query
+    Linked violations are newest first; pass the X-Next-Cursor header back as `cursor` for the next page
+    """
+    db = get_database()
+    
+    if not ObjectId.is_valid(case_id):
+        raise HTTPException(status_code=400, detail="Invalid case ID format")
+    
+    try:
+        case, next_cursor = await get_case_detail(db, current_user.company_id, case_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    case["_id"] = str(case["_id"])
+    for violation in case["linked_violations"]:
+        violation["_id"] = str(violation["_id"])
+    return CaseDetailOut(**case)
+
+
 @router.patch("/{case_id}", response_model=CaseOut)
 async def update_case(
     case_id: str,
@@ -133,15 +266,22 @@ async def update_case(
     update_data["updated_at"] = datetime.utcnow()
     
     # Update case
-    result = await db.cases.find_one_and_update(
-        {"_id": ObjectId(case_id), "company_id": company_id},
-        {"$set": update_data},
-        return_document=True
-    )
+    try:
+        result = await db.cases.find_one_and_update(
+            {"_id": ObjectId(case_id), "company_id": company_id},
+            {"$set": update_data},
+            projection={"comments": 0},
+            return_document=True
+        )
+    except DuplicateKeyError:
+        # Reopening a closed auto-case while auto-casing has opened a newer one for its group
+        raise HTTPException(status_code=409, detail="Another open auto-case already covers this group")
     
     if not result:
         raise HTTPException(status_code=404, detail="Case not found")
     
+    await bump_data_version(db, company_id)
+    await _with_comments(db, company_id, result)
     result["_id"] = str(result["_id"])
     return CaseOut(**result)
 
@@ -161,31 +301,66 @@ async def add_comment(
     if not ObjectId.is_valid(case_id):
         raise HTTPException(status_code=400, detail="Invalid case ID format")
     
-    # Create comment
-    comment = CaseComment(
-        user_id=current_user.user_id,
-        user_name=current_user.email, # Simplified
-        comment=comment_data.comment,
-        created_at=datetime.utcnow()
-    )
-    
-    # Add comment to case
+    # Count the comment on the case, then store it in the comments collection
     result = await db.cases.find_one_and_update(
         {"_id": ObjectId(case_id), "company_id": company_id},
         {
-            "$push": {"comments": comment.model_dump()},
+            "$inc": {"comment_count": 1},
             "$set": {"updated_at": datetime.utcnow()}
         },
+        projection={"comments": 0},
         return_document=True
     )
     
     if not result:
         raise HTTPException(status_code=404, detail="Case not found")
     
+    await comment_service.add_comment(
+        db, company_id, comment_service.CASE, case_id,
+        current_user.user_id, current_user.email, comment_data.comment  # Simplified
+    )
+    await bump_data_version(db, company_id)
+    await _with_comments(db, company_id, result)
     result["_id"] = str(result["_id"])
     return CaseOut(**result)
 
 
+@router.get("/{case_id}/comments", response_model=List[CommentOut], dependencies=[Depends(conditional_get)])
+async def list_case_comments(
+    response: Response,
+    case_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    List the comments on a case
+    Newest first; pass the X-Next-Cursor header back as `cursor` for the next page
+    """
+    db = get_database()
+    company_id = current_user.company_id
+    
+    if not ObjectId.is_valid(case_id):
+        raise HTTPException(status_code=400, detail="Invalid case ID format")
+    
+    if not await db.cases.find_one({"_id": ObjectId(case_id), "company_id": company_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Case not found")
+    
+    try:
+        comments, next_cursor = await comment_service.list_comments(
+            db, company_id, comment_service.CASE, case_id, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    for comment in comments:
+        comment["_id"] = str(comment["_id"])
+    
+    return [CommentOut(**comment) for comment in comments]
+
+
 @router.post("/{case_id}/violations/{violation_id}", response_model=CaseOut)
 async def link_violation(
     case_id: str,
@@ -196,16 +371,18 @@ async def link_violation(
     Link an additional violation to an existing case
     """
     db = get_database()
-    company_id = current_user["company_id"]
+    company_id = current_user.company_id
     
     if not ObjectId.is_valid(case_id) or not ObjectId.is_valid(violation_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
     
-    # Verify violation exists and belongs to company
-    violation = await db.violations.find_one({
-        "_id": ObjectId(violation_id),
-        "company_id": company_id
-    })
+    # Stamping the violation also checks that it exists and belongs to the company
+    violation = await db.violations.find_one_and_update(
+        {"_id": ObjectId(violation_id), "company_id": company_id},
+        {"$addToSet": {"case_ids": case_id}},
+        projection={"case_ids": 1},
+        return_document=ReturnDocument.BEFORE
+    )
     
     if not violation:
         raise HTTPException(status_code=404, detail="Violation not found")
@@ -217,11 +394,17 @@ async def link_violation(
             "$addToSet": {"linked_violation_ids": violation_id},
             "$set": {"updated_at": datetime.utcnow()}
         },
-        return_document=True
+        projection={"comments": 0},
+        return_document=ReturnDocument.AFTER
     )
     
     if not result:
+        # Undo the stamp unless the violation was already linked to this id
+        if case_id not in (violation.get("case_ids") or []):
+            await db.violations.update_one({"_id": ObjectId(violation_id)}, {"$pull": {"case_ids": case_id}})
         raise HTTPException(status_code=404, detail="Case not found")
     
+    await bump_data_version(db, company_id)
+    await _with_comments(db, company_id, result)
     result["_id"] = str(result["_id"])
     return CaseOut(**result)
@@ -0,0 +1,55 @@
+"""
+Conditional GET support
+Read endpoints depend on conditional_get, which derives an ETag from the
+company's data version and the request URL. A client whose If-None-Match
+still matches gets a bodiless 304 before the endpoint runs any queries.
+"""
+from fastapi import Depends, HTTPException, Request, Response
+from typing import Optional
+import hashlib
+
+from app.db import get_database
+from app.routes.auth import get_current_user, TokenData
+from app.services.response_cache import get_data_version, DataVersion
+
+
+def compute_etag(company_id: str, version: DataVersion, path: str, query: str) -> str:
+    """Weak ETag for a company's view of a URL at a data version"""
+    key = f"{company_id}|{version[0]}|{version[1]}|{path}?{query}"
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+async def conditional_get(
+    request: Request,
+    response: Response,
+    current_user: TokenData = Depends(get_current_user)
+) -> str:
+    """
+    Dependency for cacheable GET endpoints
+    
+    Raises:
+        HTTPException: 304 when the client's cached copy is still current
+    
+    Returns: The ETag, which is also set on the response
+    """
+    db = get_database()
+    version = await get_data_version(db, current_user.company_id)
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    etag = compute_etag(current_user.company_id, version, request.url.path, query)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers=headers)
+    
+    response.headers.update(headers)
+    return etag
@@ -1,170 +1,83 @@
 """
-Data import endpoints for CSV uploads
+Data import endpoints for file uploads
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request
+from fastapi.responses import FileResponse
 from typing import Dict, Any, List
-import csv
-import io
-from datetime import datetime
 from bson import ObjectId
 
+from app.config import settings
 from app.db import get_database
+from app.models.import_job import ImportJobCreate, ImportMode
 from app.routes.auth import get_current_user, TokenData
+from app.services.csv_import import stream_csv_import
+from app.services.columnar_import import detect_upload_format, stream_columnar_import
+from app.services import import_jobs
+from app.services.response_cache import bump_data_version
+from app.services.upload_streams import open_upload, UploadTooLarge, DECOMPRESSION_ERRORS
 
 router = APIRouter()
 
 
-def parse_csv_file(file_content: bytes) -> List[Dict[str, Any]]:
-    """Parse CSV file content into list of dictionaries"""
+async def run_file_import(
+    file: UploadFile,
+    import_type: str,
+    company_id: str,
+    mode: ImportMode = ImportMode.INSERT
+) -> Dict[str, Any]:
+    """
+    Validate the upload and stream it into the target collection
+    
+    gzip and zstd uploads are decompressed as they are parsed.
+    """
+    db = get_database()
     try:
-        # Decode bytes to string
-        content = file_content.decode('utf-8')
-        # Parse CSV
-        reader = csv.DictReader(io.StringIO(content))
-        return list(reader)
-    except Exception as e:
+        stream, filename, compression = open_upload(
+            file.file, file.filename, settings.MAX_UPLOAD_SIZE, settings.IMPORT_MAX_DECOMPRESSED_SIZE
+        )
+        file_format = detect_upload_format(filename, import_type, compressed=compression is not None)
+        if file_format != "csv":
+            return await stream_columnar_import(db, stream, file_format, company_id, mode=mode.value)
+        return await stream_csv_import(db, stream, import_type, company_id, mode=mode.value)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except DECOMPRESSION_ERRORS as e:
+        raise HTTPException(status_code=400, detail=f"Failed to decompress upload: {str(e)}")
+    except UnicodeDecodeError as e:
         raise HTTPException(status_code=400, detail=f"Failed to parse CSV: {str(e)}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Rows may have been written even when the import fails part way
+        await bump_data_version(db, company_id)
 
 
 @router.post("/import/transactions")
 async def import_transactions(
     file: UploadFile = File(...),
+    mode: ImportMode = Query(ImportMode.INSERT, description="upsert updates rows matched on transaction_id"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
-    Import transactions from CSV file
+    Import transactions from a CSV, Parquet, Arrow IPC or NDJSON file
     Expected columns: transaction_id (optional), date, amount, currency, from_account, to_account, type, channel
+    In upsert mode rows without a transaction_id are rejected; in insert mode they get one
+    generated from the upload and row number, so identical rows are all kept
     """
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Only CSV files are supported")
-    
-    # Read and parse CSV
-    file_content = await file.read()
-    rows = parse_csv_file(file_content)
-    
-    if not rows:
-        raise HTTPException(status_code=400, detail="CSV file is empty")
-    
-    # Validate required columns
-    required_columns = ['date', 'amount', 'from_account', 'to_account']
-    first_row = rows[0]
-    missing_columns = [col for col in required_columns if col not in first_row]
-    if missing_columns:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Missing required columns: {', '.join(missing_columns)}"
-        )
-    
-    db = get_database()
-    company_id = current_user.company_id
-    
-    inserted = 0
-    failed = 0
-    errors = []
-    
-    for idx, row in enumerate(rows):
-        try:
-            # Parse and validate data
-            transaction_doc = {
-                "company_id": company_id,
-                "transaction_id": row.get('transaction_id', f"TXN{idx:06d}"),
-                "timestamp": datetime.fromisoformat(row['date'].replace('Z', '+00:00')) if 'T' in row['date'] else datetime.strptime(row['date'], '%Y-%m-%d'),
-                "amount": float(row['amount']),
-                "currency": row.get('currency', 'USD'),
-                "transaction_type": row.get('type', 'TRANSFER'),
-                "channel": row.get('channel', 'ONLINE'),
-                "src_account": row['from_account'],
-                "dst_account": row['to_account'],
-                "description": row.get('description', ''),
-                "status": row.get('status', 'COMPLETED'),
-                "created_at": datetime.utcnow()
-            }
-            
-            await db.transactions.insert_one(transaction_doc)
-            inserted += 1
-            
-        except Exception as e:
-            failed += 1
-            if len(errors) < 5:  # Keep only first 5 errors
-                errors.append(f"Row {idx + 1}: {str(e)}")
-    
-    return {
-        "rows_processed": len(rows),
-        "rows_inserted": inserted,
-        "rows_failed": failed,
-        "sample_errors": errors
-    }
+    return await run_file_import(file, "transactions", current_user.company_id, mode)
 
 
 @router.post("/import/accounts")
 async def import_accounts(
     file: UploadFile = File(...),
+    mode: ImportMode = Query(ImportMode.INSERT, description="upsert updates rows matched on account_id"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     Import accounts from CSV file
     Expected columns: account_id, customer_id, country, risk_score, segment
     """
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Only CSV files are supported")
-    
-    # Read and parse CSV
-    file_content = await file.read()
-    rows = parse_csv_file(file_content)
-    
-    if not rows:
-        raise HTTPException(status_code=400, detail="CSV file is empty")
-    
-    # Validate required columns
-    required_columns = ['account_id']
-    first_row = rows[0]
-    missing_columns = [col for col in required_columns if col not in first_row]
-    if missing_columns:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Missing required columns: {', '.join(missing_columns)}"
-        )
-    
-    db = get_database()
-    company_id = current_user.company_id
-    
-    inserted = 0
-    failed = 0
-    errors = []
-    
-    for idx, row in enumerate(rows):
-        try:
-            # Parse and validate data
-            account_doc = {
-                "company_id": company_id,
-                "account_id": row['account_id'],
-                "customer_id": row.get('customer_id', f"CUST{idx:04d}"),
-                "customer_name": row.get('customer_name', f"Customer {idx}"),
-                "account_type": row.get('account_type', 'CHECKING'),
-                "balance": float(row.get('balance', 0)),
-                "currency": row.get('currency', 'USD'),
-                "country": row.get('country', 'US'),
-                "status": row.get('status', 'ACTIVE'),
-                "risk_score": int(row.get('risk_score', 50)),
-                "segment": row.get('segment', 'RETAIL'),
-                "opened_date": datetime.utcnow(),
-                "created_at": datetime.utcnow()
-            }
-            
-            await db.accounts.insert_one(account_doc)
-            inserted += 1
-            
-        except Exception as e:
-            failed += 1
-            if len(errors) < 5:
-                errors.append(f"Row {idx + 1}: {str(e)}")
-    
-    return {
-        "rows_processed": len(rows),
-        "rows_inserted": inserted,
-        "rows_failed": failed,
-        "sample_errors": errors
-    }
+    return await run_file_import(file, "accounts", current_user.company_id, mode)
 
 
 @router.post("/import/payroll")
@@ -176,63 +89,156 @@ async def import_payroll(
     Import payroll data from CSV file
     Expected columns: employee_id, name, department, salary, bank_account, pay_date
     """
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="Only CSV files are supported")
-    
-    # Read and parse CSV
-    file_content = await file.read()
-    rows = parse_csv_file(file_content)
+    return await run_file_import(file, "payroll", current_user.company_id)
+
+
+async def load_import_job(db, job_id: str, company_id: str) -> Dict[str, Any]:
+    """Fetch an import job owned by the company or raise 404"""
+    if not ObjectId.is_valid(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
     
-    if not rows:
-        raise HTTPException(status_code=400, detail="CSV file is empty")
+    job = await db.import_jobs.find_one({"_id": ObjectId(job_id), "company_id": company_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+@router.post("/import/jobs", status_code=201)
+async def create_import_job(
+    request: ImportJobCreate,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Start a resumable chunked upload
     
-    # Validate required columns
-    required_columns = ['employee_id', 'name', 'salary']
-    first_row = rows[0]
-    missing_columns = [col for col in required_columns if col not in first_row]
-    if missing_columns:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Missing required columns: {', '.join(missing_columns)}"
+    Send the file with PUT /import/jobs/{id}/chunks?offset=N, then call
+    POST /import/jobs/{id}/complete to queue it for background ingestion.
+    """
+    db = get_database()
+    try:
+        job = await import_jobs.create_job(
+            db,
+            current_user.company_id,
+            current_user.user_id,
+            request.import_type,
+            request.filename,
+            request.total_size,
+            request.parallel,
+            request.mode.value
         )
-    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return import_jobs.serialize_job(job)
+
+
+@router.post("/import/jobs/upload", status_code=202)
+async def upload_import_job(
+    import_type: str = Query(..., description="transactions, accounts or payroll"),
+    mode: ImportMode = Query(ImportMode.INSERT, description="upsert is supported for transactions and accounts"),
+    parallel: bool = Query(False, description="Parse uncompressed CSVs in a process pool; quoted fields must not contain line breaks"),
+    file: UploadFile = File(...),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Upload a whole file in one request and queue it for background ingestion
+    """
     db = get_database()
-    company_id = current_user.company_id
-    
-    inserted = 0
-    failed = 0
-    errors = []
+    try:
+        job = await import_jobs.create_job(
+            db, current_user.company_id, current_user.user_id, import_type, file.filename,
+            parallel=parallel, mode=mode.value
+        )
+        job = await import_jobs.spool_upload(db, job, file.file)
+        job = await import_jobs.start_job(db, job)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return import_jobs.serialize_job(job)
+
+
+@router.put("/import/jobs/{job_id}/chunks")
+async def upload_import_chunk(
+    job_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Byte offset of this chunk in the file"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Append a raw chunk of the file at the given byte offset
     
-    for idx, row in enumerate(rows):
-        try:
-            # Parse and validate data
-            payroll_doc = {
-                "company_id": company_id,
-                "employee_id": row['employee_id'],
-                "employee_name": row['name'],
-                "department": row.get('department', 'GENERAL'),
-                "salary_amount": float(row['salary']),
-                "bank_account_number": row.get('bank_account', ''),
-                "pay_date": datetime.fromisoformat(row['pay_date'].replace('Z', '+00:00')) if 'pay_date' in row and 'T' in row['pay_date'] else datetime.strptime(row.get('pay_date', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d'),
-                "payment_method": row.get('payment_method', 'BANK_TRANSFER'),
-                "status": row.get('status', 'PAID'),
-                "created_at": datetime.utcnow()
-            }
-            
-            await db.payroll.insert_one(payroll_doc)
-            inserted += 1
-            
-        except Exception as e:
-            failed += 1
-            if len(errors) < 5:
-                errors.append(f"Row {idx + 1}: {str(e)}")
+    To resume an interrupted upload, read bytes_received from the job and
+    continue from that offset.
+    """
+    db = get_database()
+    job = await load_import_job(db, job_id, current_user.company_id)
+    try:
+        job = await import_jobs.append_chunk(db, job, offset, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return import_jobs.serialize_job(job)
+
+
+@router.post("/import/jobs/{job_id}/complete", status_code=202)
+async def complete_import_job(
+    job_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Finish a chunked upload and queue the job for background ingestion
+    """
+    db = get_database()
+    job = await load_import_job(db, job_id, current_user.company_id)
+    try:
+        job = await import_jobs.start_job(db, job)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return import_jobs.serialize_job(job)
+
+
+@router.get("/import/jobs")
+async def list_import_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: TokenData = Depends(get_current_user)
+) -> List[Dict[str, Any]]:
+    """
+    List recent import jobs for the current company
+    """
+    db = get_database()
+    cursor = db.import_jobs.find({"company_id": current_user.company_id}).sort("created_at", -1).limit(limit)
+    return [import_jobs.serialize_job(job) async for job in cursor]
+
+
+@router.get("/import/jobs/{job_id}")
+async def get_import_job(
+    job_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Poll an import job's status and progress
+    """
+    db = get_database()
+    job = await load_import_job(db, job_id, current_user.company_id)
+    return import_jobs.serialize_job(job)
+
+
+@router.get("/import/jobs/{job_id}/errors")
+async def download_import_errors(
+    job_id: str,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Download every rejected row of an import job as CSV
+    """
+    db = get_database()
+    job = await load_import_job(db, job_id, current_user.company_id)
+    path = import_jobs.errors_path(job_id)
+    if not job.get("error_file_available") or not path.exists():
+        raise HTTPException(status_code=404, detail="No rejected rows for this job")
     
-    return {
-        "rows_processed": len(rows),
-        "rows_inserted": inserted,
-        "rows_failed": failed,
-        "sample_errors": errors
-    }
+    return FileResponse(
+        path,
+        media_type="text/csv",
+        filename=f"{job['filename'].rsplit('.', 1)[0]}_errors.csv"
+    )
 
 
 @router.get("/stats")
@@ -1,7 +1,7 @@
 """
 Dataset recommendation endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
@@ -18,6 +18,8 @@ from app.services.dataset_parser import get_sample_recommendations, parse_recomm
 from app.services.recommendation_mapper import map_recommendation_to_rule
 from app.services.explainability_service import generate_violation_explanation
 from app.services.coverage_service import compute_coverage_metrics
+from app.services.response_cache import response_cache, bump_data_version, GLOBAL_SCOPE
+from app.services.pagination import fetch_page
 
 router = APIRouter()
 
@@ -52,6 +54,9 @@ async def import_dataset_recommendations(
             await db.dataset_recommendations.insert_one(rec)
             inserted_count += 1
     
+    if inserted_count:
+        await bump_data_version(db, GLOBAL_SCOPE)
+    
     return {
         "message": f"Imported {inserted_count} dataset recommendations",
         "total_processed": len(recommendations),
@@ -61,10 +66,12 @@ async def import_dataset_recommendations(
 
 @router.get("/recommendations", response_model=List[DatasetRecommendation])
 async def list_recommendations(
+    response: Response,
     risk_level: Optional[str] = Query(None),
     implemented: Optional[bool] = Query(None),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
@@ -87,8 +94,14 @@ async def list_recommendations(
         query_filter["implemented"] = implemented
     
     # Execute query
-    cursor = db.dataset_recommendations.find(query_filter).sort("risk_level", -1).skip(offset).limit(limit)
-    recommendations = await cursor.to_list(length=limit)
+    try:
+        recommendations, next_cursor = await fetch_page(
+            db.dataset_recommendations, query_filter, "risk_level", limit, cursor, offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     # Convert ObjectId to string
     for rec in recommendations:
@@ -103,23 +116,27 @@ async def get_coverage_metrics(
 ):
     """
     Get coverage metrics for current company
+    Recomputed only when the company's rules or recommendations change
     """
     db = get_database()
     company_id = current_user.company_id
     
-    metrics = await compute_coverage_metrics(db, company_id)
-    
-    # Store/update in coverage_metrics collection
-    await db.coverage_metrics.update_one(
-        {"company_id": company_id},
-        {"$set": metrics},
-        upsert=True
-    )
-    
-    # Return with _id
-    stored = await db.coverage_metrics.find_one({"company_id": company_id})
-    stored["_id"] = str(stored["_id"])
+    async def compute_and_store():
+        metrics = await compute_coverage_metrics(db, company_id)
+        
+        # Store/update in coverage_metrics collection
+        await db.coverage_metrics.update_one(
+            {"company_id": company_id},
+            {"$set": metrics},
+            upsert=True
+        )
+        
+        # Return with _id
+        stored = await db.coverage_metrics.find_one({"company_id": company_id})
+        stored["_id"] = str(stored["_id"])
+        return stored
     
+    stored = await response_cache.get_or_compute(db, company_id, "dataset/coverage", {}, compute_and_store)
     return CoverageMetrics(**stored)
 
 
@@ -167,6 +184,10 @@ async def implement_recommendation(
         }
     )
     
+    await bump_data_version(db, company_id)
+    if recommendation.get("company_id") is None:
+        await bump_data_version(db, GLOBAL_SCOPE)
+    
     return {
         "message": "Recommendation implemented as rule",
         "rule_id": rule_id,
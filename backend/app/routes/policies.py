@@ -12,6 +12,8 @@ from app.models.rule import RuleOut
 from app.services.pdf_service import extract_text_from_pdf
 from app.services.llm_service import generate_rules_from_policy
 from app.routes.auth import get_current_user, TokenData
+from app.services.violation_fields import primary_account_id
+from app.services.response_cache import bump_data_version
 
 router = APIRouter()
 
@@ -215,6 +217,8 @@ async def extract_rules_from_policy(
         rule_ids.append(str(result.inserted_id))
         created_rules.append(RuleOut(**rule_doc))
     
+    await bump_data_version(db, current_user.company_id)
+    
     # If auto_scan is enabled, run scan immediately
     scan_summary = None
     if auto_scan and created_rules:
@@ -228,10 +232,13 @@ async def extract_rules_from_policy(
             )
             
             # Get violation counts by severity
-            violations = await db.violations.find({
-                "company_id": current_user.company_id,
-                "scan_run_id": scan_result.scan_run_id
-            }).to_list(length=None)
+            violations = await db.violations.find(
+                {
+                    "company_id": current_user.company_id,
+                    "scan_run_id": scan_result.scan_run_id
+                },
+                {"severity": 1, "rule_id": 1, "rule_name": 1, "account_ids": 1}
+            ).to_list(length=None)
             
             severity_counts = {"HIGH": 0, "MEDIUM": 0, "LOW": 0, "CRITICAL": 0}
             rule_counts = {}
@@ -249,9 +256,8 @@ async def extract_rules_from_policy(
                         rule_counts[rule_id] = {"rule_id": rule_id, "rule_name": rule_name, "count": 0}
                     rule_counts[rule_id]["count"] += 1
                 
-                # Count by account
-                doc_data = v.get("document_data", {})
-                account_id = doc_data.get("account_id") or doc_data.get("src_account") or doc_data.get("dst_account")
+                # Count by primary account
+                account_id = primary_account_id(v)
                 if account_id:
                     if account_id not in account_counts:
                         account_counts[account_id] = {"account_id": account_id, "count": 0}
@@ -311,5 +317,6 @@ async def delete_policy(
         "policy_id": policy_id,
         "company_id": current_user.company_id
     })
+    await bump_data_version(db, current_user.company_id)
     
     return None
@@ -1,7 +1,7 @@
 """
 Rule management endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
@@ -9,12 +9,17 @@ from bson import ObjectId
 from app.db import get_database
 from app.models.rule import RuleIn, RuleOut, RuleUpdate
 from app.routes.auth import get_current_user, TokenData
+from app.routes.conditional import conditional_get
+from app.services.response_cache import bump_data_version
+from app.services.pagination import fetch_page
+from app.services.violation_fields import RULE_FIELDS, rule_fields
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[RuleOut])
+@router.get("/", response_model=List[RuleOut], dependencies=[Depends(conditional_get)])
 async def list_rules(
+    response: Response,
     collection: Optional[str] = Query(None, description="Filter by collection name"),
     enabled: Optional[bool] = Query(None, description="Filter by enabled status"),
     policy_id: Optional[str] = Query(None, description="Filter by policy ID"),
@@ -22,10 +27,12 @@ async def list_rules(
     control_id: Optional[str] = Query(None, description="Filter by control ID"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     List rules with optional filters and pagination
+    Newest first; pass the X-Next-Cursor header back as `cursor` for the next page
     """
     db = get_database()
     
@@ -43,8 +50,12 @@ async def list_rules(
         query_filter["control_id"] = control_id
     
     # Execute query
-    cursor = db.rules.find(query_filter).sort("created_at", -1).skip(offset).limit(limit)
-    rules = await cursor.to_list(length=limit)
+    try:
+        rules, next_cursor = await fetch_page(db.rules, query_filter, "created_at", limit, cursor, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     # Convert ObjectId to string
     for rule in rules:
@@ -53,7 +64,7 @@ async def list_rules(
     return [RuleOut(**rule) for rule in rules]
 
 
-@router.get("/{rule_id}", response_model=RuleOut)
+@router.get("/{rule_id}", response_model=RuleOut, dependencies=[Depends(conditional_get)])
 async def get_rule(
     rule_id: str,
     current_user: TokenData = Depends(get_current_user)
@@ -108,6 +119,7 @@ async def create_rule(
     
     result = await db.rules.insert_one(rule_doc)
     rule_doc["_id"] = str(result.inserted_id)
+    await bump_data_version(db, current_user.company_id)
     
     return RuleOut(**rule_doc)
 
@@ -147,6 +159,14 @@ async def update_rule(
     if not result:
         raise HTTPException(status_code=404, detail="Rule not found")
     
+    # Keep the copies on the rule's violations in sync
+    if any(field in update_data for field in RULE_FIELDS):
+        await db.violations.update_many(
+            {"company_id": current_user.company_id, "rule_id": rule_id},
+            {"$set": rule_fields(result)}
+        )
+    
+    await bump_data_version(db, current_user.company_id)
     result["_id"] = str(result["_id"])
     return RuleOut(**result)
 
@@ -172,6 +192,7 @@ async def delete_rule(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Rule not found")
     
+    await bump_data_version(db, current_user.company_id)
     return None
 
 
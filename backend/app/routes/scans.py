@@ -1,14 +1,16 @@
 """
 Scan execution endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
+from typing import List, Optional
 from bson import ObjectId
 
 from app.db import get_database
 from app.models.scan import ScanRequest, ScanSummary, ScanRun
 from app.services.scan_service import run_scan
 from app.routes.auth import get_current_user, TokenData
+from app.services.violation_events import violations_deleting, violations_deleted
+from app.services.pagination import fetch_page
 
 router = APIRouter()
 
@@ -40,17 +42,25 @@ async def execute_scan(
 
 @router.get("/runs", response_model=List[ScanRun])
 async def list_scan_runs(
+    response: Response,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     List historical scan runs with pagination
+    Newest first; pass the X-Next-Cursor header back as `cursor` for the next page
     """
     db = get_database()
     
-    cursor = db.scan_runs.find({"company_id": current_user.company_id}).sort("started_at", -1).skip(offset).limit(limit)
-    scan_runs = await cursor.to_list(length=limit)
+    query_filter = {"company_id": current_user.company_id}
+    try:
+        scan_runs, next_cursor = await fetch_page(db.scan_runs, query_filter, "started_at", limit, cursor, offset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     # Convert ObjectId to string
     for scan_run in scan_runs:
@@ -107,9 +117,12 @@ async def delete_scan_run(
         raise HTTPException(status_code=404, detail="Scan run not found")
     
     # Delete associated violations (with company_id check)
-    await db.violations.delete_many({
+    violation_query = {
         "scan_run_id": scan_run_id,
         "company_id": current_user.company_id
-    })
+    }
+    await violations_deleting(db, current_user.company_id, violation_query)
+    await db.violations.delete_many(violation_query)
+    await violations_deleted(db, current_user.company_id)
     
     return None
@@ -1,23 +1,74 @@
 """
 Violation management endpoints
 """
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.db import get_database
 from app.models.violation import (
-    Violation, ViolationUpdate, ViolationStatus, ViolationComment,
-    CommentIn, AssignmentUpdate
+    Violation, ViolationUpdate, ViolationStatus, CommentIn, AssignmentUpdate, ViolationSelection, BulkViolationUpdate,
+    BulkAssignmentUpdate, BulkCommentIn, BulkUpdateResult
 )
+from app.models.comment import CommentOut
 from app.routes.auth import get_current_user, TokenData
+from app.routes.conditional import conditional_get
+from app.services.response_cache import bump_data_version
+from app.services.pagination import fetch_page
+from app.services import comment_service
+from app.services.export_service import (
+    ExportFormat, FORMAT_MEDIA, VIOLATION_EXPORT_FIELDS, EXPORT_CHUNK_ROWS, export_projection, stream_export
+)
+from app.services.violation_events import (
+    violation_status_changed, violations_status_changing, violations_updated,
+    violations_deleting, violations_deleted
+)
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[Violation])
+def _violation_filter(
+    company_id: str,
+    rule_id: Optional[str] = None,
+    severity: Optional[str] = None,
+    status: Optional[ViolationStatus] = None,
+    scan_run_id: Optional[str] = None,
+    framework: Optional[str] = None,
+    control_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Mongo filter for the list and export query parameters"""
+    query_filter = {"company_id": company_id}
+    if rule_id:
+        query_filter["rule_id"] = rule_id
+    if severity:
+        query_filter["severity"] = severity
+    if status:
+        query_filter["status"] = status
+    if scan_run_id:
+        query_filter["scan_run_id"] = scan_run_id
+    
+    # framework and control_id are copied from the rule onto each violation
+    if framework:
+        query_filter["framework"] = framework
+    if control_id:
+        query_filter["control_id"] = control_id
+    return query_filter
+
+
+async def _with_comments(db, company_id: str, violation: Dict[str, Any]) -> Dict[str, Any]:
+    """Attach the latest comments from the comments collection to a single violation"""
+    violation["comments"] = await comment_service.recent_comments(
+        db, company_id, comment_service.VIOLATION, str(violation["_id"])
+    )
+    return violation
+
+
+@router.get("/", response_model=List[Violation], dependencies=[Depends(conditional_get)])
 async def list_violations(
+    response: Response,
     rule_id: Optional[str] = Query(None, description="Filter by rule ID"),
     severity: Optional[str] = Query(None, description="Filter by severity"),
     status: Optional[ViolationStatus] = Query(None, description="Filter by status"),
@@ -26,46 +77,31 @@ async def list_violations(
     control_id: Optional[str] = Query(None, description="Filter by control ID"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     List violations with optional filters and pagination
+    Newest first; pass the X-Next-Cursor header back as `cursor` for the next page
     """
     db = get_database()
-    company_id = current_user.company_id
-    
-    # Build query filter
-    query_filter = {"company_id": company_id}
-    if rule_id:
-        query_filter["rule_id"] = rule_id
-    if severity:
-        query_filter["severity"] = severity
-    if status:
-        query_filter["status"] = status
-    if scan_run_id:
-        query_filter["scan_run_id"] = scan_run_id
-    
-    # If framework or control_id filter, need to join with rules
-    if framework or control_id:
-        rule_filter = {"company_id": company_id}
-        if framework:
-            rule_filter["framework"] = framework
-        if control_id:
-            rule_filter["control_id"] = control_id
-        
-        rules = await db.rules.find(rule_filter, {"_id": 1}).to_list(length=1000)
-        rule_ids = [str(r["_id"]) for r in rules]
-        query_filter["rule_id"] = {"$in": rule_ids}
+    query_filter = _violation_filter(
+        current_user.company_id, rule_id, severity, status, scan_run_id, framework, control_id
+    )
     
     # Execute query
-    cursor = db.violations.find(query_filter).sort("created_at", -1).skip(offset).limit(limit)
-    violations = await cursor.to_list(length=limit)
-    
-    # Convert ObjectId to string and ensure comments field exists
+    try:
+        violations, next_cursor = await fetch_page(
+            db.violations, query_filter, "created_at", limit, cursor, offset, projection={"comments": 0}
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    # Convert ObjectId to string; list views carry only comment_count
     for violation in violations:
         violation["_id"] = str(violation["_id"])
-        if "comments" not in violation:
-            violation["comments"] = []
         if "assigned_to_user_id" not in violation:
             violation["assigned_to_user_id"] = None
         if "assigned_to_user_name" not in violation:
@@ -74,7 +110,130 @@ async def list_violations(
     return [Violation(**violation) for violation in violations]
 
 
-@router.get("/{violation_id}", response_model=Violation)
+@router.get("/export")
+async def export_violations(
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format", description="csv, ndjson or parquet"),
+    compress: bool = Query(False, alias="gzip", description="Gzip the export"),
+    include_document_data: bool = Query(False, description="Add the violating document snapshot as JSON"),
+    rule_id: Optional[str] = Query(None, description="Filter by rule ID"),
+    severity: Optional[str] = Query(None, description="Filter by severity"),
+    status: Optional[ViolationStatus] = Query(None, description="Filter by status"),
+    scan_run_id: Optional[str] = Query(None, description="Filter by scan run ID"),
+    framework: Optional[str] = Query(None, description="Filter by framework"),
+    control_id: Optional[str] = Query(None, description="Filter by control ID"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Stream every violation matching the filters as a file download
+    Rows are read from a server cursor and written in chunks, newest first
+    """
+    db = get_database()
+    query_filter = _violation_filter(
+        current_user.company_id, rule_id, severity, status, scan_run_id, framework, control_id
+    )
+    fields = {**VIOLATION_EXPORT_FIELDS, "document_data": "json"} if include_document_data else VIOLATION_EXPORT_FIELDS
+    
+    cursor = db.violations.find(query_filter, export_projection(fields), batch_size=EXPORT_CHUNK_ROWS)
+    cursor = cursor.sort([("created_at", -1), ("_id", -1)])
+    
+    media_type, extension = FORMAT_MEDIA[export_format]
+    filename = f"violations_{datetime.utcnow():%Y%m%d_%H%M%S}.{extension}"
+    if compress:
+        media_type, filename = "application/gzip", f"{filename}.gz"
+    return StreamingResponse(
+        stream_export(cursor, fields, export_format, compress=compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+def _selection_query(selection: ViolationSelection, company_id: str) -> Dict[str, Any]:
+    """Mongo filter for the violations a bulk request targets"""
+    query: Dict[str, Any] = {"company_id": company_id}
+    
+    if selection.violation_ids is not None:
+        if not all(ObjectId.is_valid(vid) for vid in selection.violation_ids):
+            raise HTTPException(status_code=400, detail="Invalid violation ID format")
+        query["_id"] = {"$in": [ObjectId(vid) for vid in selection.violation_ids]}
+    
+    filters = selection.filter.model_dump(exclude_none=True) if selection.filter else {}
+    if "account_id" in filters:
+        filters["account_ids"] = filters.pop("account_id")
+    query.update(filters)
+    
+    # Refuse to touch every violation of the company by accident
+    if len(query) == 1:
+        raise HTTPException(status_code=400, detail="Provide violation_ids or at least one filter field")
+    return query
+
+
+@router.patch("/bulk", response_model=BulkUpdateResult)
+async def bulk_update_violations(
+    update: BulkViolationUpdate,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Update the status of many violations selected by ID or filter
+    Rollups are adjusted once for the whole batch
+    """
+    db = get_database()
+    company_id = current_user.company_id
+    query = _selection_query(update, company_id)
+    
+    # Omitted review fields keep their current values, as in update_violation
+    update_data = update.model_dump(include={"status", "reviewer_note", "reviewed_by"}, exclude_none=True)
+    update_data["reviewed_at"] = datetime.utcnow()
+    
+    await violations_status_changing(db, company_id, query, update.status)
+    result = await db.violations.update_many(query, {"$set": update_data})
+    await violations_updated(db, company_id)
+    
+    return BulkUpdateResult(matched_count=result.matched_count, modified_count=result.modified_count)
+
+
+@router.patch("/bulk/assign", response_model=BulkUpdateResult)
+async def bulk_assign_violations(
+    assignment: BulkAssignmentUpdate,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Assign many violations selected by ID or filter to a user
+    """
+    db = get_database()
+    company_id = current_user.company_id
+    query = _selection_query(assignment, company_id)
+    
+    result = await db.violations.update_many(query, {"$set": {
+        "assigned_to_user_id": assignment.assigned_to_user_id,
+        "assigned_to_user_name": assignment.assigned_to_user_name
+    }})
+    await violations_updated(db, company_id)
+    
+    return BulkUpdateResult(matched_count=result.matched_count, modified_count=result.modified_count)
+
+
+@router.post("/bulk/comment", response_model=BulkUpdateResult)
+async def bulk_comment_violations(
+    comment_data: BulkCommentIn,
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    Add the same comment to many violations selected by ID or filter
+    """
+    db = get_database()
+    company_id = current_user.company_id
+    query = _selection_query(comment_data, company_id)
+    
+    commented = await comment_service.add_comment_to_matching(
+        db, company_id, comment_service.VIOLATION, query,
+        current_user.user_id, current_user.email, comment_data.comment
+    )
+    await violations_updated(db, company_id)
+    
+    return BulkUpdateResult(matched_count=commented, modified_count=commented)
+
+
+@router.get("/{violation_id}", response_model=Violation, dependencies=[Depends(conditional_get)])
 async def get_violation(violation_id: str, current_user: TokenData = Depends(get_current_user)):
     """
     Get a specific violation by ID
@@ -85,17 +244,16 @@ async def get_violation(violation_id: str, current_user: TokenData = Depends(get
     if not ObjectId.is_valid(violation_id):
         raise HTTPException(status_code=400, detail="Invalid violation ID format")
     
-    violation = await db.violations.find_one({
-        "_id": ObjectId(violation_id),
-        "company_id": company_id
-    })
+    violation = await db.violations.find_one(
+        {"_id": ObjectId(violation_id), "company_id": company_id},
+        {"comments": 0}
+    )
     
     if not violation:
         raise HTTPException(status_code=404, detail="Violation not found")
     
+    await _with_comments(db, company_id, violation)
     violation["_id"] = str(violation["_id"])
-    if "comments" not in violation:
-        violation["comments"] = []
     if "assigned_to_user_id" not in violation:
         violation["assigned_to_user_id"] = None
     if "assigned_to_user_name" not in violation:
@@ -123,19 +281,21 @@ async def update_violation(
     update_data = update.model_dump(exclude_none=True)
     update_data["reviewed_at"] = datetime.utcnow()
     
-    # Update violation
-    result = await db.violations.find_one_and_update(
+    # Update violation, keeping the previous state for rollup maintenance
+    previous = await db.violations.find_one_and_update(
         {"_id": ObjectId(violation_id), "company_id": company_id},
         {"$set": update_data},
-        return_document=True
+        projection={"comments": 0},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if not result:
+    if not previous:
         raise HTTPException(status_code=404, detail="Violation not found")
     
+    await violation_status_changed(db, company_id, previous, update.status)
+    
+    result = await _with_comments(db, company_id, {**previous, **update_data})
     result["_id"] = str(result["_id"])
-    if "comments" not in result:
-        result["comments"] = []
     if "assigned_to_user_id" not in result:
         result["assigned_to_user_id"] = None
     if "assigned_to_user_name" not in result:
@@ -159,27 +319,24 @@ async def add_comment(
     if not ObjectId.is_valid(violation_id):
         raise HTTPException(status_code=400, detail="Invalid violation ID format")
     
-    # Create comment
-    comment = ViolationComment(
-        user_id=current_user.user_id,
-        user_name=current_user.email,
-        comment=comment_data.comment,
-        created_at=datetime.utcnow()
-    )
-    
-    # Add comment to violation
+    # Count the comment on the violation, then store it in the comments collection
     result = await db.violations.find_one_and_update(
         {"_id": ObjectId(violation_id), "company_id": company_id},
-        {"$push": {"comments": comment.model_dump()}},
+        {"$inc": {"comment_count": 1}},
+        projection={"comments": 0},
         return_document=True
     )
     
     if not result:
         raise HTTPException(status_code=404, detail="Violation not found")
     
+    await comment_service.add_comment(
+        db, company_id, comment_service.VIOLATION, violation_id,
+        current_user.user_id, current_user.email, comment_data.comment
+    )
+    await bump_data_version(db, company_id)
+    await _with_comments(db, company_id, result)
     result["_id"] = str(result["_id"])
-    if "comments" not in result:
-        result["comments"] = []
     if "assigned_to_user_id" not in result:
         result["assigned_to_user_id"] = None
     if "assigned_to_user_name" not in result:
@@ -210,19 +367,56 @@ async def assign_violation(
             "assigned_to_user_id": assignment.assigned_to_user_id,
             "assigned_to_user_name": assignment.assigned_to_user_name
         }},
+        projection={"comments": 0},
         return_document=True
     )
     
     if not result:
         raise HTTPException(status_code=404, detail="Violation not found")
     
+    await bump_data_version(db, company_id)
+    await _with_comments(db, company_id, result)
     result["_id"] = str(result["_id"])
-    if "comments" not in result:
-        result["comments"] = []
     
     return Violation(**result)
 
 
+@router.get("/{violation_id}/comments", response_model=List[CommentOut], dependencies=[Depends(conditional_get)])
+async def list_violation_comments(
+    response: Response,
+    violation_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """
+    List the comments on a violation
+    Newest first; pass the X-Next-Cursor header back as `cursor` for the next page
+    """
+    db = get_database()
+    company_id = current_user.company_id
+    
+    if not ObjectId.is_valid(violation_id):
+        raise HTTPException(status_code=400, detail="Invalid violation ID format")
+    
+    if not await db.violations.find_one({"_id": ObjectId(violation_id), "company_id": company_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Violation not found")
+    
+    try:
+        comments, next_cursor = await comment_service.list_comments(
+            db, company_id, comment_service.VIOLATION, violation_id, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    
+    for comment in comments:
+        comment["_id"] = str(comment["_id"])
+    
+    return [CommentOut(**comment) for comment in comments]
+
+
 @router.delete("/{violation_id}", status_code=204)
 async def delete_violation(violation_id: str, current_user: TokenData = Depends(get_current_user)):
     """
@@ -234,14 +428,16 @@ async def delete_violation(violation_id: str, current_user: TokenData = Depends(
     if not ObjectId.is_valid(violation_id):
         raise HTTPException(status_code=400, detail="Invalid violation ID format")
     
-    result = await db.violations.delete_one({
-        "_id": ObjectId(violation_id),
-        "company_id": company_id
-    })
+    query = {"_id": ObjectId(violation_id), "company_id": company_id}
+    await violations_deleting(db, company_id, query)
+    
+    result = await db.violations.delete_one(query)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Violation not found")
     
+    await violations_deleted(db, company_id)
+    
     return None
 
 
@@ -0,0 +1,458 @@
+"""
+Account risk service - materialized per-account risk scores
+Direct violation counts are maintained incrementally as violations are
+written or change status; network-propagated risk over the transaction
+graph is refreshed by a batch job. Both live in the account_risk collection.
+"""
+from typing import Dict, Any, List, Optional, Iterable
+from datetime import datetime
+
+import numpy as np
+from scipy import sparse
+from pymongo import UpdateOne
+
+from app.models.account import RiskLevel
+from app.services.counters import add_counter_delta, apply_counter_deltas, clamped_counts
+from app.services.response_cache import bump_data_version
+from app.services.violation_fields import PRIMARY_ACCOUNT_EXPR, primary_account_id
+
+
+# Points contributed by a single violation of each severity
+SEVERITY_WEIGHTS = {"CRITICAL": 10, "HIGH": 5, "MEDIUM": 2, "LOW": 1}
+
+# Violation statuses that still count against an account
+ACTIVE_STATUSES = ["OPEN", "CONFIRMED"]
+
+WRITE_BATCH_SIZE = 1000
+
+
+def risk_level_for_score(score: float) -> RiskLevel:
+    """Map a 0-100 risk score to a risk level"""
+    if score > 50:
+        return RiskLevel.CRITICAL
+    if score > 30:
+        return RiskLevel.HIGH
+    if score > 10:
+        return RiskLevel.MEDIUM
+    return RiskLevel.LOW
+
+
+def _severity_weight_expr(field: str = "$severity") -> Dict[str, Any]:
+    """Aggregation expression resolving a severity to its weight"""
+    return {
+        "$switch": {
+            "branches": [
+                {"case": {"$eq": [field, severity]}, "then": weight}
+                for severity, weight in SEVERITY_WEIGHTS.items()
+            ],
+            "default": 0
+        }
+    }
+
+
+async def _load_violation_counts(db, company_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate active violations per account
+    
+    Returns: Mapping of account_id -> severity counts, seed weight and last violation date
+    """
+    pipeline = [
+        {
+            "$match": {
+                "company_id": company_id,
+                "status": {"$in": ACTIVE_STATUSES}
+            }
+        },
+        {"$addFields": {"account_id": PRIMARY_ACCOUNT_EXPR}},
+        {"$match": {"account_id": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": "$account_id",
+                "violation_count": {"$sum": 1},
+                "critical_count": {"$sum": {"$cond": [{"$eq": ["$severity", "CRITICAL"]}, 1, 0]}},
+                "high_count": {"$sum": {"$cond": [{"$eq": ["$severity", "HIGH"]}, 1, 0]}},
+                "medium_count": {"$sum": {"$cond": [{"$eq": ["$severity", "MEDIUM"]}, 1, 0]}},
+                "low_count": {"$sum": {"$cond": [{"$eq": ["$severity", "LOW"]}, 1, 0]}},
+                "seed_weight": {
+                    "$sum": {"$cond": [{"$eq": ["$status", "CONFIRMED"]}, _severity_weight_expr(), 0]}
+                },
+                "last_violation_at": {"$max": "$created_at"}
+            }
+        }
+    ]
+    
+    counts = {}
+    async for row in db.violations.aggregate(pipeline, allowDiskUse=True):
+        counts[str(row.pop("_id"))] = row
+    return counts
+
+
+async def _load_transaction_graph(db, company_id: str, index: Dict[str, int]):
+    """
+    Build the undirected, amount-weighted transaction graph as a sparse matrix
+    
+    Accounts are added to `index` as they are encountered.
+    
+    Returns: scipy CSR adjacency matrix of shape (n, n)
+    """
+    pipeline = [
+        {
+            "$match": {
+                "company_id": company_id,
+                "src_account": {"$ne": None},
+                "dst_account": {"$ne": None}
+            }
+        },
+        {
+            "$group": {
+                "_id": {"src": "$src_account", "dst": "$dst_account"},
+                "amount": {"$sum": "$amount"}
+            }
+        }
+    ]
+    
+    rows: List[int] = []
+    cols: List[int] = []
+    weights: List[float] = []
+    
+    async for edge in db.transactions.aggregate(pipeline, allowDiskUse=True):
+        src = str(edge["_id"]["src"])
+        dst = str(edge["_id"]["dst"])
+        if src == dst:
+            continue
+        rows.append(index.setdefault(src, len(index)))
+        cols.append(index.setdefault(dst, len(index)))
+        weights.append(max(float(edge.get("amount") or 0.0), 0.0))
+    
+    n = len(index)
+    if not rows:
+        return sparse.csr_matrix((n, n), dtype=np.float64)
+    
+    # Money flows expose both sides, so risk diffuses along edges in either direction
+    amounts = np.log1p(np.asarray(weights, dtype=np.float64))
+    directed = sparse.coo_matrix(
+        (amounts, (np.asarray(rows), np.asarray(cols))), shape=(n, n)
+    ).tocsr()
+    return (directed + directed.T).tocsr()
+
+
+def personalized_pagerank(
+    adjacency,
+    seeds: np.ndarray,
+    alpha: float = 0.85,
+    max_iter: int = 100,
+    tol: float = 1e-8
+) -> np.ndarray:
+    """
+    Personalized PageRank by power iteration on a sparse adjacency matrix
+    
+    Args:
+        adjacency: Square sparse matrix of non-negative edge weights
+        seeds: Non-negative restart weights, one per node
+        alpha: Probability of following an edge instead of restarting
+        max_iter: Maximum number of iterations
+        tol: L1 convergence tolerance
+    
+    Returns:
+        Stationary distribution (sums to 1), or zeros when there are no seeds
+    """
+    n = adjacency.shape[0]
+    total = seeds.sum()
+    if n == 0 or total <= 0:
+        return np.zeros(n, dtype=np.float64)
+    
+    restart = seeds / total
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inv_out = np.divide(1.0, out_weight, out=np.zeros_like(out_weight), where=~dangling)
+    
+    # Row-stochastic transition matrix, transposed for left multiplication
+    transition_t = (sparse.diags(inv_out) @ adjacency).T.tocsr()
+    
+    scores = restart.copy()
+    for _ in range(max_iter):
+        # Mass stranded on dangling nodes restarts at the seeds
+        dangling_mass = scores[dangling].sum()
+        updated = alpha * (transition_t @ scores + dangling_mass * restart) + (1 - alpha) * restart
+        converged = np.abs(updated - scores).sum() < tol
+        scores = updated
+        if converged:
+            break
+    
+    return scores
+
+
+async def compute_account_risk(
+    db,
+    company_id: str,
+    alpha: float = 0.85,
+    max_iter: int = 100
+) -> Dict[str, Any]:
+    """
+    Recompute the account_risk collection for a company
+    
+    Rebuilds the incrementally maintained counters from scratch (repairing
+    any drift) and refreshes the network scores, then bumps the company's
+    data version so cached responses and ETags built on old scores expire.
+    
+    Direct scores come from active violation counts per account. Network
+    scores come from a personalized PageRank over the transaction graph,
+    seeded by the severity-weighted confirmed violations of each account;
+    each account scores its share of that seed mass, capped at 100.
+    
+    Args:
+        db: Database instance
+        company_id: Company ID for multi-tenant isolation
+        alpha: Damping factor for the diffusion
+        max_iter: Maximum power iterations
+    
+    Returns:
+        Summary of the run (accounts scored, seed accounts, edges)
+    """
+    run_started = datetime.utcnow()
+    
+    counts = await _load_violation_counts(db, company_id)
+    
+    index: Dict[str, int] = {}
+    adjacency = await _load_transaction_graph(db, company_id, index)
+    for account_id in counts:
+        index.setdefault(account_id, len(index))
+    
+    n = len(index)
+    if adjacency.shape[0] != n:
+        adjacency.resize((n, n))
+    
+    seeds = np.zeros(n, dtype=np.float64)
+    for account_id, row in counts.items():
+        seeds[index[account_id]] = row["seed_weight"]
+    
+    # Scaling the distribution by the total seed mass gives each account its share
+    # of the severity points, the same absolute scale as direct_score, so scores
+    # do not depend on the riskiest account in the tenant
+    scores = personalized_pagerank(adjacency, seeds, alpha=alpha, max_iter=max_iter)
+    network_scores = np.minimum(np.round(scores * seeds.sum(), 2), 100.0)
+    
+    operations = []
+    written = 0
+    for account_id, position in index.items():
+        row = counts.get(account_id, {})
+        network_score = float(network_scores[position])
+        direct_score = float(sum(
+            row.get(f"{severity.lower()}_count", 0) * weight
+            for severity, weight in SEVERITY_WEIGHTS.items()
+        ))
+        if network_score <= 0 and direct_score <= 0:
+            continue
+        
+        risk_score = min(max(direct_score, network_score), 100.0)
+        operations.append(UpdateOne(
+            {"company_id": company_id, "account_id": account_id},
+            {"$set": {
+                "violation_count": row.get("violation_count", 0),
+                "critical_count": row.get("critical_count", 0),
+                "high_count": row.get("high_count", 0),
+                "medium_count": row.get("medium_count", 0),
+                "low_count": row.get("low_count", 0),
+                "last_violation_at": row.get("last_violation_at"),
+                "direct_score": direct_score,
+                "network_score": network_score,
+                "risk_score": risk_score,
+                "risk_level": risk_level_for_score(risk_score).value,
+                "calculated_at": run_started
+            }},
+            upsert=True
+        ))
+        
+        if len(operations) >= WRITE_BATCH_SIZE:
+            await db.account_risk.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+    
+    if operations:
+        await db.account_risk.bulk_write(operations, ordered=False)
+        written += len(operations)
+    
+    # Drop accounts that no longer carry any risk
+    await db.account_risk.delete_many({
+        "company_id": company_id,
+        "calculated_at": {"$lt": run_started}
+    })
+    await bump_data_version(db, company_id)
+    
+    return {
+        "company_id": company_id,
+        "accounts_scored": written,
+        "seed_accounts": int((seeds > 0).sum()),
+        "graph_accounts": n,
+        "graph_edges": int(adjacency.nnz // 2),
+        "calculated_at": run_started
+    }
+
+
+async def get_account_risk(db, company_id: str, account_id: str) -> Optional[Dict[str, Any]]:
+    """Fetch the precomputed risk document for an account"""
+    return await db.account_risk.find_one({
+        "company_id": company_id,
+        "account_id": account_id
+    })
+
+
+def _count_field(severity: str) -> Optional[str]:
+    """Counter field for a severity, or None for unknown severities"""
+    return f"{severity.lower()}_count" if severity in SEVERITY_WEIGHTS else None
+
+
+def _risk_update_pipeline(
+    counts: Dict[str, int],
+    last_violation_at: Optional[datetime],
+    now: datetime
+) -> List[Dict[str, Any]]:
+    """Update pipeline applying counter deltas and re-deriving the score fields"""
+    apply_counts = clamped_counts(counts)
+    apply_counts["updated_at"] = now
+    if last_violation_at is not None:
+        apply_counts["last_violation_at"] = {"$max": ["$last_violation_at", last_violation_at]}
+    
+    direct_score = {
+        "$add": [
+            {"$multiply": [{"$ifNull": [f"${severity.lower()}_count", 0]}, weight]}
+            for severity, weight in SEVERITY_WEIGHTS.items()
+        ]
+    }
+    risk_score = {"$min": [100, {"$max": ["$direct_score", {"$ifNull": ["$network_score", 0]}]}]}
+    risk_level = {
+        "$switch": {
+            "branches": [
+                {"case": {"$gt": ["$risk_score", 50]}, "then": RiskLevel.CRITICAL.value},
+                {"case": {"$gt": ["$risk_score", 30]}, "then": RiskLevel.HIGH.value},
+                {"case": {"$gt": ["$risk_score", 10]}, "then": RiskLevel.MEDIUM.value}
+            ],
+            "default": RiskLevel.LOW.value
+        }
+    }
+    
+    return [
+        {"$set": apply_counts},
+        {"$set": {"direct_score": direct_score}},
+        {"$set": {"risk_score": risk_score}},
+        {"$set": {"risk_level": risk_level}}
+    ]
+
+
+async def _apply_deltas(db, company_id: str, deltas: Dict[str, Dict[str, Any]]):
+    await apply_counter_deltas(
+        db.account_risk, company_id, ["account_id"], deltas,
+        lambda counts, delta, now: _risk_update_pipeline(counts, delta.get("last_violation_at"), now)
+    )
+
+
+def _add_delta(
+    deltas: Dict[str, Dict[str, Any]],
+    account_id: str,
+    severity: str,
+    count: int,
+    last_violation_at: Optional[datetime] = None
+):
+    """Accumulate a counter delta for one account"""
+    counts = {"violation_count": count}
+    field = _count_field(severity)
+    if field:
+        counts[field] = count
+    delta = add_counter_delta(deltas, account_id, counts)
+    if count > 0 and last_violation_at is not None:
+        current = delta.get("last_violation_at")
+        delta["last_violation_at"] = last_violation_at if current is None else max(current, last_violation_at)
+
+
+async def apply_violation_changes(
+    db,
+    company_id: str,
+    violations: Iterable[Dict[str, Any]],
+    sign: int = 1
+):
+    """
+    Add (sign=1) or remove (sign=-1) violations from the account counters
+    
+    Only violations in an active status are counted.
+    """
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for violation in violations:
+        if violation.get("status", "OPEN") not in ACTIVE_STATUSES:
+            continue
+        account_id = primary_account_id(violation)
+        if account_id is None:
+            continue
+        _add_delta(deltas, account_id, violation.get("severity", ""), sign, violation.get("created_at"))
+    
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
+
+
+async def record_status_change(db, company_id: str, violation: Dict[str, Any], new_status: str):
+    """Adjust account counters when a violation moves in or out of an active status"""
+    was_active = violation.get("status", "OPEN") in ACTIVE_STATUSES
+    is_active = new_status in ACTIVE_STATUSES
+    if was_active == is_active:
+        return
+    
+    account_id = primary_account_id(violation)
+    if account_id is None:
+        return
+    
+    deltas: Dict[str, Dict[str, Any]] = {}
+    _add_delta(deltas, account_id, violation.get("severity", ""), 1 if is_active else -1, violation.get("created_at"))
+    await _apply_deltas(db, company_id, deltas)
+
+
+async def record_status_changes_matching(db, company_id: str, query: Dict[str, Any], new_status: str):
+    """
+    Adjust account counters for the violations matching `query` moving to `new_status`
+    
+    Must be called before the violations are updated. Only violations that
+    move in or out of an active status are counted, grouped server-side.
+    """
+    is_active = new_status in ACTIVE_STATUSES
+    moving = {"$nin": ACTIVE_STATUSES} if is_active else {"$in": ACTIVE_STATUSES}
+    pipeline = [
+        {"$match": {"$and": [query, {"company_id": company_id, "status": moving}]}},
+        {"$addFields": {"account_id": PRIMARY_ACCOUNT_EXPR}},
+        {"$match": {"account_id": {"$ne": None}}},
+        {"$group": {
+            "_id": {"account_id": "$account_id", "severity": "$severity"},
+            "count": {"$sum": 1},
+            "last_violation_at": {"$max": "$created_at"}
+        }}
+    ]
+    
+    sign = 1 if is_active else -1
+    deltas: Dict[str, Dict[str, Any]] = {}
+    async for row in db.violations.aggregate(pipeline, allowDiskUse=True):
+        _add_delta(
+            deltas, str(row["_id"]["account_id"]), row["_id"].get("severity") or "",
+            sign * row["count"], row.get("last_violation_at")
+        )
+    
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
+
+
+async def remove_violations_matching(db, company_id: str, query: Dict[str, Any]):
+    """
+    Remove the violations matching `query` from the account counters
+    
+    Must be called before the violations are deleted. Deltas are grouped
+    server-side so large deletes never load the violations themselves.
+    """
+    pipeline = [
+        {"$match": {**query, "company_id": company_id, "status": {"$in": ACTIVE_STATUSES}}},
+        {"$addFields": {"account_id": PRIMARY_ACCOUNT_EXPR}},
+        {"$match": {"account_id": {"$ne": None}}},
+        {"$group": {"_id": {"account_id": "$account_id", "severity": "$severity"}, "count": {"$sum": 1}}}
+    ]
+    
+    deltas: Dict[str, Dict[str, Any]] = {}
+    async for row in db.violations.aggregate(pipeline, allowDiskUse=True):
+        _add_delta(deltas, str(row["_id"]["account_id"]), row["_id"].get("severity") or "", -row["count"])
+    
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
@@ -6,6 +6,9 @@ from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from bson import ObjectId
 
+from app.services.violation_events import violations_created
+from app.services.violation_fields import extract_account_ids, rule_fields
+
 
 class AdvancedRuleEngine:
     """
@@ -133,80 +136,33 @@ class AdvancedRuleEngine:
         """
         Identify accounts with multiple violations indicating high-risk activity
         
-        Pattern: Accounts with 5+ violations in last 30 days
+        Pattern: Accounts with 5+ open or confirmed violations and activity in the last 30 days
+        Reads the materialized account_risk collection instead of re-aggregating violations
         """
         cutoff_time = datetime.utcnow() - timedelta(days=30)
         
-        pipeline = [
-            {
-                "$match": {
-                    "company_id": company_id,
-                    "created_at": {"$gte": cutoff_time},
-                    "status": {"$in": ["OPEN", "CONFIRMED"]}
-                }
-            },
-            {
-                "$addFields": {
-                    "account_id": {
-                        "$ifNull": [
-                            "$document_data.account_id",
-                            {"$ifNull": ["$document_data.src_account", "$document_data.dst_account"]}
-                        ]
-                    }
-                }
-            },
-            {
-                "$match": {
-                    "account_id": {"$ne": None}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$account_id",
-                    "violation_count": {"$sum": 1},
-                    "critical_count": {
-                        "$sum": {"$cond": [{"$eq": ["$severity", "CRITICAL"]}, 1, 0]}
-                    },
-                    "high_count": {
-                        "$sum": {"$cond": [{"$eq": ["$severity", "HIGH"]}, 1, 0]}
-                    },
-                    "violations": {
-                        "$push": {
-                            "violation_id": {"$toString": "$_id"},
-                            "rule_name": "$rule_name",
-                            "severity": "$severity",
-                            "created_at": "$created_at"
-                        }
-                    }
-                }
-            },
-            {
-                "$match": {
-                    "violation_count": {"$gte": violation_threshold}
-                }
-            },
+        cursor = db.account_risk.find(
             {
-                "$project": {
-                    "account_id": "$_id",
-                    "violation_count": 1,
-                    "critical_count": 1,
-                    "high_count": 1,
-                    "risk_score": {
-                        "$add": [
-                            {"$multiply": ["$critical_count", 10]},
-                            {"$multiply": ["$high_count", 5]},
-                            "$violation_count"
-                        ]
-                    },
-                    "violations": 1
-                }
+                "company_id": company_id,
+                "violation_count": {"$gte": violation_threshold},
+                "last_violation_at": {"$gte": cutoff_time}
             },
             {
-                "$sort": {"risk_score": -1}
+                "_id": 0,
+                "account_id": 1,
+                "violation_count": 1,
+                "critical_count": 1,
+                "high_count": 1,
+                "risk_score": 1,
+                "risk_level": 1
             }
-        ]
+        ).sort("risk_score", -1)
         
-        results = await db.violations.aggregate(pipeline).to_list(length=None)
+        results = await cursor.to_list(length=None)
+        for result in results:
+            result["_id"] = result["account_id"]
+            result.setdefault("critical_count", 0)
+            result.setdefault("high_count", 0)
         return results
     
     @staticmethod
@@ -432,9 +388,11 @@ async def create_violations_from_pattern(
             "scan_run_id": scan_run_id,
             "rule_id": rule_id,
             "rule_name": rule_name,
+            **rule_fields(None),  # Built-in patterns have no rule document
             "collection": "transactions",  # Most patterns are transaction-based
             "document_id": str(result.get("_id", "pattern_detection")),
             "document_data": result,
+            "account_ids": extract_account_ids(result),
             "severity": severity,
             "status": "OPEN",
             "explanation": explanation,
@@ -449,5 +407,6 @@ async def create_violations_from_pattern(
     
     if violations:
         await db.violations.insert_many(violations)
+        await violations_created(db, company_id, violations)
     
     return len(violations)
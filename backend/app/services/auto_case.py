@@ -0,0 +1,245 @@
+"""
+Auto-casing - clusters open, un-cased violations into investigation cases
+One aggregation groups the violations by primary account (optionally also by
+rule and time window); each group is upserted onto the open auto-case for the
+same group, and the violations are linked with batched writes. Violations
+record their cases in `case_ids`, which is what marks them as cased. A partial
+unique index on (company_id, auto_case_key) over open cases keeps concurrent
+scans from opening the same case twice.
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+
+from pymongo import UpdateOne, UpdateMany
+from pymongo.errors import BulkWriteError
+
+from app.services.response_cache import bump_data_version
+
+
+SEVERITIES = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+# Case statuses covered by the unique auto_case_key index
+OPEN_CASE_STATUSES = ["OPEN", "IN_REVIEW"]
+DUPLICATE_KEY = 11000
+
+# Groups handled per round of case and violation writes
+GROUP_BATCH_SIZE = 500
+# Violations linked per group in one pass; the rest are picked up by the next pass
+MAX_LINKS_PER_GROUP = 10000
+
+AUTO_CASE_USER = "system"
+AUTO_CASE_USER_NAME = "Auto-casing"
+
+
+def uncased_query(company_id: str, scan_run_id: Optional[str] = None) -> Dict[str, Any]:
+    """Open violations with an account that are not linked to any case"""
+    query = {
+        "company_id": company_id,
+        "status": "OPEN",
+        "case_ids": None,
+        "account_ids.0": {"$exists": True}
+    }
+    if scan_run_id:
+        query["scan_run_id"] = scan_run_id
+    return query
+
+
+def grouping_pipeline(
+    query: Dict[str, Any],
+    window_days: Optional[int] = None,
+    by_typology: bool = False,
+    min_violations: int = 1
+) -> List[Dict[str, Any]]:
+    """Aggregation that emits one row per (account[, rule][, window]) group"""
+    group_key: Dict[str, Any] = {"account_id": {"$arrayElemAt": ["$account_ids", 0]}}
+    if by_typology:
+        group_key["rule_id"] = "$rule_id"
+    if window_days:
+        group_key["window_start"] = {
+            "$dateTrunc": {"date": "$created_at", "unit": "day", "binSize": window_days}
+        }
+    
+    return [
+        {"$match": query},
+        {"$sort": {"created_at": 1}},
+        {"$group": {
+            "_id": group_key,
+            "count": {"$sum": 1},
+            "severity_rank": {"$max": {"$indexOfArray": [SEVERITIES, "$severity"]}},
+            "rule_names": {"$addToSet": "$rule_name"},
+            "first_at": {"$min": "$created_at"},
+            "last_at": {"$max": "$created_at"},
+            "violation_ids": {"$firstN": {"input": "$_id", "n": MAX_LINKS_PER_GROUP}}
+        }},
+        {"$match": {"count": {"$gte": min_violations}}}
+    ]
+
+
+def group_case_key(group_id: Dict[str, Any]) -> str:
+    """Stable key identifying the auto-case of a group"""
+    parts = [group_id["account_id"]]
+    if "rule_id" in group_id:
+        parts.append(f"rule:{group_id['rule_id']}")
+    if "window_start" in group_id:
+        parts.append(f"window:{group_id['window_start']:%Y-%m-%d}")
+    return "|".join(str(part) for part in parts)
+
+
+def _activity(kind: str, message: str, now: datetime) -> Dict[str, Any]:
+    return {
+        "type": kind,
+        "user_id": AUTO_CASE_USER,
+        "user_name": AUTO_CASE_USER_NAME,
+        "message": message,
+        "created_at": now
+    }
+
+
+def _case_upsert(company_id: str, key: str, group: Dict[str, Any], now: datetime) -> UpdateOne:
+    """
+    Upsert extending the group's open auto-case, or opening it if there is none
+    
+    An update pipeline, so one write both fills in a new case and merges into
+    an existing one. Values are wrapped in $literal because rule names and
+    account ids may start with "$".
+    """
+    account_id = group["_id"]["account_id"]
+    violation_ids = [str(vid) for vid in group["violation_ids"]]
+    count = len(violation_ids)
+    rules = ", ".join(sorted(group["rule_names"])[:3])
+    
+    def keep(field: str, value: Any) -> Dict[str, Any]:
+        return {"$ifNull": [f"${field}", {"$literal": value}]}
+    
+    linked = {"$ifNull": ["$linked_violation_ids", []]}
+    created = _activity("created", f"Case opened for {count} violations", now)
+    extended = _activity("violations_linked", f"{count} new violation{'s' if count != 1 else ''} linked", now)
+    return UpdateOne(
+        {"company_id": company_id, "auto_case_key": key, "status": {"$in": OPEN_CASE_STATUSES}},
+        [{"$set": {
+            "title": keep("title", f"Auto: account {account_id} - {rules}"[:200]),
+            "primary_account_id": keep("primary_account_id", account_id),
+            "severity": {"$arrayElemAt": [SEVERITIES, {"$max": [
+                max(group["severity_rank"], 0), {"$indexOfArray": [SEVERITIES, "$severity"]}
+            ]}]},
+            "status": keep("status", "OPEN"),
+            "assigned_to_user_id": keep("assigned_to_user_id", None),
+            "assigned_to_user_name": keep("assigned_to_user_name", None),
+            "linked_violation_ids": {"$concatArrays": [
+                linked, {"$setDifference": [{"$literal": violation_ids}, linked]}
+            ]},
+            "comment_count": keep("comment_count", 0),
+            "activity_log": {"$concatArrays": [
+                {"$ifNull": ["$activity_log", []]},
+                [{"$cond": [
+                    {"$eq": [{"$type": "$created_at"}, "missing"]},
+                    {"$literal": created},
+                    {"$literal": extended}
+                ]}]
+            ]},
+            "created_at": keep("created_at", now),
+            "updated_at": now,
+            "created_by": keep("created_by", AUTO_CASE_USER),
+            "created_by_name": keep("created_by_name", AUTO_CASE_USER_NAME)
+        }}],
+        upsert=True
+    )
+
+
+async def _upsert_cases(db, operations: List[UpdateOne]) -> Dict[str, int]:
+    """
+    Run the case upserts, retrying once those that lost an insert race
+    
+    When a concurrent scan opens the same case between our match and insert,
+    the unique index rejects our insert; the retry then matches its case.
+    
+    Raises:
+        BulkWriteError: On any other write error, or if the retry fails too
+    
+    Returns: Counts of cases created and extended
+    """
+    counts = {"created": 0, "extended": 0}
+    for attempt in range(2):
+        try:
+            details = (await db.cases.bulk_write(operations, ordered=False)).bulk_api_result
+            retry = []
+        except BulkWriteError as e:
+            details = e.details
+            retry = [operations[error["index"]] for error in details["writeErrors"] if error["code"] == DUPLICATE_KEY]
+            if attempt or len(retry) < len(details["writeErrors"]):
+                raise
+        counts["created"] += len(details.get("upserted", []))
+        counts["extended"] += details.get("nMatched", 0)
+        if not retry:
+            break
+        operations = retry
+    return counts
+
+
+async def _case_groups(db, company_id: str, groups: List[Dict[str, Any]], summary: Dict[str, int]):
+    """Upsert the cases for one batch of groups and link their violations"""
+    now = datetime.utcnow()
+    keyed = {group_case_key(group["_id"]): group for group in groups}
+    counts = await _upsert_cases(db, [_case_upsert(company_id, key, group, now) for key, group in keyed.items()])
+    
+    case_ids = {}
+    async for case in db.cases.find(
+        {"company_id": company_id, "auto_case_key": {"$in": list(keyed)}, "status": {"$in": OPEN_CASE_STATUSES}},
+        {"auto_case_key": 1}
+    ):
+        case_ids[case["auto_case_key"]] = str(case["_id"])
+    
+    # Violations of a case closed since the upsert stay un-cased for the next run
+    linked = [(key, group) for key, group in keyed.items() if key in case_ids]
+    if linked:
+        await db.violations.bulk_write([
+            UpdateMany({"_id": {"$in": group["violation_ids"]}}, {"$addToSet": {"case_ids": case_ids[key]}})
+            for key, group in linked
+        ], ordered=False)
+    
+    summary["cases_created"] += counts["created"]
+    summary["cases_extended"] += counts["extended"]
+    summary["violations_linked"] += sum(len(group["violation_ids"]) for _, group in linked)
+
+
+async def auto_case_violations(
+    db,
+    company_id: str,
+    scan_run_id: Optional[str] = None,
+    window_days: Optional[int] = None,
+    by_typology: bool = False,
+    min_violations: int = 1
+) -> Dict[str, int]:
+    """
+    Case every open, un-cased violation of a company, grouped by primary account
+    
+    Args:
+        scan_run_id: Only consider violations from this scan
+        window_days: Also split groups into windows of this many days
+        by_typology: Also split groups by the rule that fired
+        min_violations: Leave groups smaller than this un-cased
+    
+    Returns: Counts of groups, cases created/extended and violations linked
+    """
+    summary = {"groups": 0, "cases_created": 0, "cases_extended": 0, "violations_linked": 0}
+    pipeline = grouping_pipeline(uncased_query(company_id, scan_run_id), window_days, by_typology, min_violations)
+    
+    # A group larger than MAX_LINKS_PER_GROUP is only partly linked, so run
+    # further passes until every group fit
+    while True:
+        truncated = False
+        batch = []
+        async for group in db.violations.aggregate(pipeline, allowDiskUse=True):
+            summary["groups"] += 1
+            truncated = truncated or group["count"] > len(group["violation_ids"])
+            batch.append(group)
+            if len(batch) >= GROUP_BATCH_SIZE:
+                await _case_groups(db, company_id, batch, summary)
+                batch = []
+        if batch:
+            await _case_groups(db, company_id, batch, summary)
+        if not truncated:
+            break
+    
+    if summary["violations_linked"]:
+        await bump_data_version(db, company_id)
+    return summary
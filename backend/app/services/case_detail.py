@@ -0,0 +1,94 @@
+"""
+Expanded case view
+Loads a case together with one page of its linked violations in a single
+$lookup aggregation. The join follows the violations' `case_ids` through the
+(company_id, case_ids, created_at, _id) index and is limited to one keyset
+page, so opening a case costs the same however many violations it links.
+A $lookup with both localField and a pipeline needs MongoDB 5.0; the
+let + $expr form older servers accept cannot use that multikey index.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+
+from bson import ObjectId
+
+from app.services import comment_service
+from app.services.pagination import keyset_filter, encode_cursor
+
+
+# Violation fields returned for each linked violation
+LINKED_VIOLATION_FIELDS = [
+    "rule_id", "rule_name", "framework", "control_id", "collection", "document_id",
+    "account_ids", "severity", "status", "assigned_to_user_name", "created_at"
+]
+
+
+def case_detail_pipeline(
+    company_id: str,
+    case_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Aggregation over cases returning the case with `linked_violations`
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    violation_match: Dict[str, Any] = {"company_id": company_id}
+    if cursor:
+        violation_match.update(keyset_filter("created_at", cursor))
+    
+    return [
+        {"$match": {"_id": ObjectId(case_id), "company_id": company_id}},
+        {"$addFields": {
+            "case_key": {"$toString": "$_id"},
+            "linked_violation_count": {"$size": {"$ifNull": ["$linked_violation_ids", []]}}
+        }},
+        {"$project": {"comments": 0, "linked_violation_ids": 0}},
+        {"$lookup": {
+            "from": "violations",
+            "localField": "case_key",
+            "foreignField": "case_ids",
+            "pipeline": [
+                {"$match": violation_match},
+                {"$sort": {"created_at": -1, "_id": -1}},
+                # One extra row tells whether another page follows
+                {"$limit": limit + 1},
+                {"$project": {field: 1 for field in LINKED_VIOLATION_FIELDS}}
+            ],
+            "as": "linked_violations"
+        }},
+        {"$project": {"case_key": 0}}
+    ]
+
+
+async def get_case_detail(
+    db,
+    company_id: str,
+    case_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch a case with one page of linked violations and its latest comments
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    
+    Returns: (case or None if not found, cursor for the next page of linked violations)
+    """
+    pipeline = case_detail_pipeline(company_id, case_id, limit, cursor)
+    cases, comments = await asyncio.gather(
+        db.cases.aggregate(pipeline).to_list(length=1),
+        comment_service.recent_comments(db, company_id, comment_service.CASE, case_id)
+    )
+    if not cases:
+        return None, None
+    
+    case = cases[0]
+    linked = case["linked_violations"]
+    next_cursor = encode_cursor(linked[limit - 1], "created_at") if len(linked) > limit else None
+    case["linked_violations"] = linked[:limit]
+    case["comments"] = comments
+    return case, next_cursor
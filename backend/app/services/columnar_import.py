@@ -0,0 +1,342 @@
+"""
+Columnar transaction import
+Reads Parquet, Arrow IPC and NDJSON files as Arrow record batches and maps
+them to the transaction schema column by column, skipping per-row text parsing
+"""
+from typing import Dict, Any, List, Optional, Tuple, BinaryIO, Iterator, Callable, Awaitable
+from datetime import datetime
+from pathlib import Path
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+from starlette.concurrency import run_in_threadpool
+
+from app.services.csv_import import (
+    IMPORT_TYPES, ImportTally, batch_writer, check_required_columns,
+    default_transaction_id, import_source_id, ingest_batches
+)
+
+
+COLUMNAR_BATCH_SIZE = 20000
+NDJSON_BLOCK_BYTES = 32 * 1024 * 1024
+
+# File extension -> reader
+COLUMNAR_FORMATS = {
+    ".parquet": "parquet",
+    ".arrow": "ipc",
+    ".ipc": "ipc",
+    ".feather": "ipc",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson"
+}
+
+# Transaction field -> (source column, default when missing or empty)
+TEXT_COLUMNS = {
+    "currency": ("currency", "USD"),
+    "transaction_type": ("type", "TRANSFER"),
+    "channel": ("channel", "ONLINE"),
+    "description": ("description", ""),
+    "status": ("status", "COMPLETED")
+}
+
+SOURCE_COLUMNS = ["transaction_id", "date", "amount", "from_account", "to_account"] + [
+    source for source, _ in TEXT_COLUMNS.values()
+]
+
+
+def detect_columnar_format(filename: str) -> Optional[str]:
+    """Return the columnar format for a filename, or None if it is not one"""
+    return COLUMNAR_FORMATS.get(Path(filename).suffix.lower())
+
+
+def detect_upload_format(filename: str, import_type: str, compressed: bool = False) -> str:
+    """
+    Return "csv" or the columnar format of an upload
+    
+    Args:
+        filename: Filename without any compression suffix
+        import_type: Key into IMPORT_TYPES
+        compressed: Whether the upload is gzip or zstd compressed
+    
+    Raises:
+        ValueError: If the file type is not supported for the import type
+    """
+    if filename.endswith('.csv'):
+        return "csv"
+    file_format = detect_columnar_format(filename)
+    if compressed and file_format == "parquet":
+        raise ValueError("Parquet files are compressed internally; upload them without gzip or zstd")
+    if import_type == "transactions" and file_format:
+        return file_format
+    if import_type == "transactions":
+        raise ValueError(f"Supported formats: .csv, {', '.join(COLUMNAR_FORMATS)}")
+    raise ValueError("Only CSV files are supported")
+
+
+def _column(batch: pa.RecordBatch, name: str) -> Optional[pa.Array]:
+    index = batch.schema.get_field_index(name)
+    return batch.column(index) if index >= 0 else None
+
+
+def _required(batch: pa.RecordBatch, name: str) -> pa.Array:
+    column = _column(batch, name)
+    if column is None or column.null_count:
+        raise ValueError(f"'{name}' is required")
+    return column
+
+
+def _text(batch: pa.RecordBatch, name: str, default: str) -> pa.Array:
+    """String column with nulls and empty strings replaced by the default"""
+    column = _column(batch, name)
+    if column is None:
+        return pa.nulls(batch.num_rows, pa.string()).fill_null(default)
+    column = pc.cast(column, pa.string())
+    return pc.if_else(pc.fill_null(pc.equal(column, ""), True), default, column)
+
+
+def _timestamps(column: pa.Array) -> pa.Array:
+    """Naive UTC timestamps from timestamp, date or ISO 8601 string columns"""
+    if pa.types.is_timestamp(column.type):
+        return pc.cast(column, pa.timestamp("us", tz=column.type.tz)).cast(pa.timestamp("us"))
+    if pa.types.is_date(column.type):
+        return pc.cast(column, pa.timestamp("us"))
+    column = pc.cast(column, pa.string())
+    try:
+        return pc.cast(column, pa.timestamp("us"))
+    except pa.ArrowInvalid:
+        # Strings carrying a zone offset
+        return pc.cast(column, pa.timestamp("us", tz="UTC")).cast(pa.timestamp("us"))
+
+
+def map_transaction_batch(batch: pa.RecordBatch) -> pa.RecordBatch:
+    """
+    Map a record batch to transaction columns, matching map_transaction_row
+    
+    company_id, created_at and default transaction IDs are added by
+    batch_to_documents.
+    
+    Raises:
+        ValueError: If any row has a missing or unparseable required value
+    """
+    timestamps = _timestamps(_required(batch, "date"))
+    amounts = pc.cast(_required(batch, "amount"), pa.float64())
+    if timestamps.null_count:
+        raise ValueError("'date' could not be parsed")
+    
+    transaction_ids = _column(batch, "transaction_id")
+    if transaction_ids is None:
+        transaction_ids = pa.nulls(batch.num_rows, pa.string())
+    else:
+        transaction_ids = pc.cast(transaction_ids, pa.string())
+    
+    columns = {
+        "transaction_id": transaction_ids,
+        "timestamp": timestamps,
+        "amount": amounts,
+        "src_account": pc.cast(_required(batch, "from_account"), pa.string()),
+        "dst_account": pc.cast(_required(batch, "to_account"), pa.string())
+    }
+    for field, (source, default) in TEXT_COLUMNS.items():
+        columns[field] = _text(batch, source, default)
+    
+    return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns.keys()))
+
+
+def _to_python(column: pa.Array) -> List[Any]:
+    # numpy conversion is far faster than Arrow's per-value to_pylist
+    if pa.types.is_timestamp(column.type):
+        return column.to_numpy().astype("datetime64[us]").tolist()
+    return column.to_numpy(zero_copy_only=False).tolist()
+
+
+def batch_to_documents(
+    batch: pa.RecordBatch,
+    company_id: str,
+    now: datetime,
+    source_id: Optional[str] = None,
+    first_row_number: int = 1
+) -> List[Dict[str, Any]]:
+    """
+    Convert mapped transaction columns into documents for writing
+    
+    Raises:
+        ValueError: If a row has no transaction_id and there is no source_id
+    """
+    names = batch.schema.names
+    values = [_to_python(column) for column in batch.columns]
+    documents = [
+        {"company_id": company_id, **dict(zip(names, row)), "created_at": now}
+        for row in zip(*values)
+    ]
+    for row_number, document in enumerate(documents, first_row_number):
+        if not document["transaction_id"]:
+            document["transaction_id"] = default_transaction_id(source_id, row_number)
+    return documents
+
+
+def map_batch(
+    batch: pa.RecordBatch,
+    company_id: str,
+    first_row_number: int,
+    source_id: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], List[int], List[Tuple[int, Dict[str, Any], str]], int]:
+    """
+    Map a batch in one vectorized pass
+    
+    If the batch has bad rows it is bisected until they are isolated, so a
+    few bad rows cost O(log n) extra vectorized passes rather than a slow
+    row-by-row fallback.
+    
+    Returns: parse_batch-style (documents, row numbers, rejected rows, rows read)
+    """
+    now = datetime.utcnow()
+    documents = []
+    row_numbers = []
+    rejected = []
+    
+    def map_range(part: pa.RecordBatch, first: int):
+        try:
+            mapped = map_transaction_batch(part)
+            documents.extend(batch_to_documents(mapped, company_id, now, source_id, first))
+            row_numbers.extend(range(first, first + part.num_rows))
+        except (ValueError, pa.ArrowException) as e:
+            if part.num_rows == 1:
+                rejected.append((first, part.to_pylist()[0], str(e)))
+                return
+            half = part.num_rows // 2
+            map_range(part.slice(0, half), first)
+            map_range(part.slice(half), first + half)
+    
+    map_range(batch, first_row_number)
+    return documents, row_numbers, rejected, batch.num_rows
+
+
+def iter_record_batches(binary_file: BinaryIO, file_format: str, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Yield non-empty record batches of at most batch_size rows"""
+    if file_format == "parquet":
+        parquet_file = pq.ParquetFile(binary_file)
+        columns = [name for name in SOURCE_COLUMNS if name in parquet_file.schema_arrow.names]
+        batches = parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+    elif file_format == "ipc":
+        batches = _iter_ipc_batches(binary_file)
+    else:
+        batches = _iter_ndjson_batches(binary_file, batch_size)
+    
+    for batch in batches:
+        for offset in range(0, batch.num_rows, batch_size):
+            yield batch.slice(offset, batch_size)
+
+
+def _iter_ipc_batches(binary_file: BinaryIO) -> Iterator[pa.RecordBatch]:
+    """Arrow IPC file format (Feather v2), falling back to the streaming format"""
+    if not binary_file.seekable():
+        # Decompressing readers can only carry the streaming format
+        yield from pa.ipc.open_stream(binary_file)
+        return
+    try:
+        reader = pa.ipc.open_file(binary_file)
+    except pa.ArrowInvalid:
+        binary_file.seek(0)
+        yield from pa.ipc.open_stream(binary_file)
+        return
+    for i in range(reader.num_record_batches):
+        yield reader.get_batch(i)
+
+
+def _iter_ndjson_batches(binary_file: BinaryIO, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Parse newline-delimited JSON in blocks of whole lines"""
+    while True:
+        block = binary_file.read(NDJSON_BLOCK_BYTES)
+        if not block:
+            return
+        block += binary_file.readline()
+        if not block.strip():
+            continue
+        try:
+            table = pa_json.read_json(io.BytesIO(block))
+        except pa.ArrowInvalid:
+            table = _read_ndjson_lines(block)
+        yield from table.to_batches(max_chunksize=batch_size)
+
+
+def _read_ndjson_lines(block: bytes) -> pa.Table:
+    """
+    Slow path for blocks Arrow cannot read in one pass, e.g. a field that is
+    a number in one line and a string in another. Values are read as strings
+    and left to the mapper's casts; unparseable lines become empty records,
+    which are rejected for missing required fields.
+    """
+    records = []
+    for line in block.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            record = {}
+        records.append({
+            name: None if record.get(name) is None else str(record[name])
+            for name in SOURCE_COLUMNS
+        })
+    return pa.Table.from_pylist(records, schema=pa.schema([(name, pa.string()) for name in SOURCE_COLUMNS]))
+
+
+async def stream_columnar_import(
+    db,
+    binary_file: BinaryIO,
+    file_format: str,
+    company_id: str,
+    batch_size: int = COLUMNAR_BATCH_SIZE,
+    mode: str = "insert",
+    on_rejected: Optional[Callable[[List[str], List[Tuple[int, Dict[str, Any], str]]], Awaitable[None]]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    source_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Import transactions from a Parquet, Arrow IPC or NDJSON file
+    
+    Args:
+        db: Database instance
+        binary_file: Readable binary file object; Parquet and the Arrow IPC
+            file format additionally need it to be seekable
+        file_format: A value of COLUMNAR_FORMATS
+        company_id: Company ID stamped on every document
+        batch_size: Rows per write
+        mode: As for stream_csv_import
+        on_rejected: As for stream_csv_import
+        on_progress: As for stream_csv_import
+        source_id: As for stream_csv_import
+    
+    Returns:
+        Import statistics including rows_per_second
+    
+    Raises:
+        ValueError: If the file is empty, unreadable or missing required columns
+    """
+    spec = IMPORT_TYPES["transactions"]
+    write_batch = batch_writer(db, "transactions", mode)
+    
+    batches = iter_record_batches(binary_file, file_format, batch_size)
+    first = await run_in_threadpool(next, batches, None)
+    if first is None:
+        raise ValueError("File contains no rows")
+    check_required_columns(first.schema.names, spec["required_columns"])
+    
+    tally = ImportTally(first.schema.names, on_rejected)
+    source_id = import_source_id(mode, source_id)
+    pending = [first]
+    
+    def next_batch():
+        batch = pending.pop() if pending else next(batches, None)
+        if batch is None:
+            return [], [], [], 0
+        return map_batch(batch, company_id, tally.processed + 1, source_id)
+    
+    await ingest_batches(write_batch, next_batch, tally, on_progress)
+    return tally.stats()
@@ -0,0 +1,150 @@
+"""
+Comments on violations and cases
+Comments live in their own collection keyed by (company_id, entity_type,
+entity_id, created_at) instead of an embedded array, so violation and case
+documents stay small however long a discussion grows. Each entity keeps a
+`comment_count` that list views show in place of the comments themselves.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+
+from app.services.pagination import fetch_page
+
+
+VIOLATION = "violation"
+CASE = "case"
+
+# Comments embedded in a single violation/case response
+RECENT_COMMENTS = 20
+WRITE_BATCH_SIZE = 1000
+
+ENTITY_COLLECTIONS = {
+    VIOLATION: "violations",
+    CASE: "cases"
+}
+
+
+def _comment_doc(
+    company_id: str,
+    entity_type: str,
+    entity_id: str,
+    user_id: str,
+    user_name: str,
+    comment: str,
+    created_at: datetime
+) -> Dict[str, Any]:
+    return {
+        "company_id": company_id,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "user_id": user_id,
+        "user_name": user_name,
+        "comment": comment,
+        "created_at": created_at
+    }
+
+
+async def add_comment(
+    db,
+    company_id: str,
+    entity_type: str,
+    entity_id: str,
+    user_id: str,
+    user_name: str,
+    comment: str
+) -> Dict[str, Any]:
+    """Store a comment; the caller increments comment_count on the entity"""
+    doc = _comment_doc(company_id, entity_type, entity_id, user_id, user_name, comment, datetime.utcnow())
+    result = await db.comments.insert_one(doc)
+    doc["_id"] = result.inserted_id
+    return doc
+
+
+async def add_comment_to_matching(
+    db,
+    company_id: str,
+    entity_type: str,
+    query: Dict[str, Any],
+    user_id: str,
+    user_name: str,
+    comment: str
+) -> int:
+    """
+    Add the same comment to every entity matching `query`
+    
+    Comments are inserted and counters incremented in batches of ids, so
+    memory stays bounded for large selections.
+    
+    Returns: Number of entities commented on
+    """
+    collection = db[ENTITY_COLLECTIONS[entity_type]]
+    created_at = datetime.utcnow()
+    commented = 0
+    
+    async def flush(ids: List[Any]):
+        await db.comments.insert_many(
+            [_comment_doc(company_id, entity_type, str(_id), user_id, user_name, comment, created_at) for _id in ids],
+            ordered=False
+        )
+        await collection.update_many({"_id": {"$in": ids}}, {"$inc": {"comment_count": 1}})
+    
+    ids = []
+    async for doc in collection.find(query, {"_id": 1}):
+        ids.append(doc["_id"])
+        if len(ids) >= WRITE_BATCH_SIZE:
+            await flush(ids)
+            commented += len(ids)
+            ids = []
+    if ids:
+        await flush(ids)
+        commented += len(ids)
+    return commented
+
+
+async def recent_comments(
+    db,
+    company_id: str,
+    entity_type: str,
+    entity_id: str,
+    limit: int = RECENT_COMMENTS
+) -> List[Dict[str, Any]]:
+    """The latest `limit` comments on an entity, oldest first"""
+    docs = await db.comments.find(
+        {"company_id": company_id, "entity_type": entity_type, "entity_id": entity_id}
+    ).sort([("created_at", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+    docs.reverse()
+    return docs
+
+
+async def list_comments(
+    db,
+    company_id: str,
+    entity_type: str,
+    entity_id: str,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of an entity's comments, newest first
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    
+    Returns: (comments, cursor for the next page or None on the last page)
+    """
+    query = {"company_id": company_id, "entity_type": entity_type, "entity_id": entity_id}
+    return await fetch_page(db.comments, query, "created_at", limit, cursor)
+
+
+async def remove_comments_matching(db, company_id: str, entity_type: str, query: Dict[str, Any]):
+    """Delete the comments of every entity matching `query`; call before deleting the entities"""
+    collection = db[ENTITY_COLLECTIONS[entity_type]]
+    
+    ids = []
+    async for doc in collection.find(query, {"_id": 1}):
+        ids.append(str(doc["_id"]))
+        if len(ids) >= WRITE_BATCH_SIZE:
+            await db.comments.delete_many({"company_id": company_id, "entity_type": entity_type, "entity_id": {"$in": ids}})
+            ids = []
+    if ids:
+        await db.comments.delete_many({"company_id": company_id, "entity_type": entity_type, "entity_id": {"$in": ids}})
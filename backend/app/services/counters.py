@@ -0,0 +1,89 @@
+"""
+Counter deltas - incremental maintenance of materialized counters
+The account_risk, rule_metrics and violation_daily_stats services accumulate
+per-key counter deltas while handling a batch of violation changes, then
+write them here as one upsert per key.
+"""
+from typing import Dict, Any, List, Optional, Callable, Sequence, Hashable
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+
+WRITE_BATCH_SIZE = 1000
+
+# (non-zero counts, the key's accumulated delta, now) -> update pipeline
+UpdateBuilder = Callable[[Dict[str, int], Dict[str, Any], datetime], List[Dict[str, Any]]]
+
+
+def add_counter_delta(
+    deltas: Dict[Hashable, Dict[str, Any]],
+    key: Hashable,
+    counts: Dict[str, int],
+    sign: int = 1
+) -> Dict[str, Any]:
+    """
+    Accumulate sign * counts under key
+    
+    Returns: The key's delta, so callers can record extra fields next to "counts"
+    """
+    delta = deltas.setdefault(key, {"counts": {}})
+    for field, count in counts.items():
+        delta["counts"][field] = delta["counts"].get(field, 0) + sign * count
+    return delta
+
+
+def clamped_counts(counts: Dict[str, int]) -> Dict[str, Any]:
+    """
+    $set values adding each delta to its counter
+    
+    Counters are clamped at zero so a replayed removal cannot go negative.
+    """
+    return {
+        field: {"$max": [0, {"$add": [{"$ifNull": [f"${field}", 0]}, delta]}]}
+        for field, delta in counts.items()
+    }
+
+
+def counter_update_pipeline(counts: Dict[str, int], delta: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+    """Default update: apply the counter deltas and stamp updated_at"""
+    return [{"$set": {**clamped_counts(counts), "updated_at": now}}]
+
+
+async def apply_counter_deltas(
+    collection,
+    company_id: str,
+    key_fields: Sequence[str],
+    deltas: Dict[Hashable, Dict[str, Any]],
+    build_update: Optional[UpdateBuilder] = None
+):
+    """
+    Upsert accumulated counter deltas in unordered batches
+    
+    Args:
+        collection: Collection holding one counter document per key
+        company_id: Company the counters belong to
+        key_fields: Document fields identifying a key; a key is a tuple of
+            their values, or a single value when there is one field
+        deltas: Deltas built with add_counter_delta
+        build_update: Update pipeline for one key (default: counter_update_pipeline)
+    """
+    build_update = build_update or counter_update_pipeline
+    now = datetime.utcnow()
+    operations = []
+    for key, delta in deltas.items():
+        counts = {field: inc for field, inc in delta["counts"].items() if inc}
+        if not counts:
+            continue
+        values = key if len(key_fields) > 1 else (key,)
+        operations.append(UpdateOne(
+            {"company_id": company_id, **dict(zip(key_fields, values))},
+            build_update(counts, delta, now),
+            upsert=True
+        ))
+        if len(operations) >= WRITE_BATCH_SIZE:
+            await collection.bulk_write(operations, ordered=False)
+            operations = []
+    
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
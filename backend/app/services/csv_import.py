@@ -0,0 +1,637 @@
+"""
+Streaming CSV import service
+Parses uploads incrementally and writes unordered insert_many or upsert
+batches, so memory use stays constant regardless of file size
+"""
+from typing import Dict, Any, List, Optional, Tuple, BinaryIO, Callable, Awaitable
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import csv
+import hashlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+
+
+IMPORT_BATCH_SIZE = 5000
+MAX_SAMPLE_ERRORS = 5
+PARALLEL_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def parse_date(value: str) -> datetime:
+    """Parse an ISO timestamp or a plain YYYY-MM-DD date"""
+    if 'T' in value:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def import_source_id(mode: str, source_id: Optional[str] = None) -> Optional[str]:
+    """
+    Identity of one upload, used to derive IDs for transaction rows without one
+    
+    Upsert mode matches rows on their transaction_id, so it returns None and
+    rows must carry their own ID; insert mode gets a fresh ID unless given one.
+    """
+    if mode == "upsert":
+        return None
+    return source_id or uuid.uuid4().hex
+
+
+def default_transaction_id(source_id: Optional[str], row_number: int) -> str:
+    """
+    ID for a transaction row without one, unique to its upload and row
+    
+    Rows without a natural key are never deduplicated: identical rows (e.g.
+    repeated sub-threshold transfers) each keep their own document.
+    
+    Raises:
+        ValueError: If there is no upload identity (upsert mode)
+    """
+    if source_id is None:
+        raise ValueError("transaction_id is required in upsert mode")
+    return "TXN" + hashlib.sha1(f"{source_id}:{row_number}".encode('utf-8')).hexdigest()[:20]
+
+
+def map_transaction_row(
+    row: Dict[str, Any],
+    company_id: str,
+    row_number: int,
+    now: datetime,
+    source_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Map a transactions CSV row to a transaction document"""
+    document = {
+        "company_id": company_id,
+        "transaction_id": row.get('transaction_id'),
+        "timestamp": parse_date(row['date']),
+        "amount": float(row['amount']),
+        "currency": row.get('currency') or 'USD',
+        "transaction_type": row.get('type') or 'TRANSFER',
+        "channel": row.get('channel') or 'ONLINE',
+        "src_account": row['from_account'],
+        "dst_account": row['to_account'],
+        "description": row.get('description') or '',
+        "status": row.get('status') or 'COMPLETED',
+        "created_at": now
+    }
+    if not document["transaction_id"]:
+        document["transaction_id"] = default_transaction_id(source_id, row_number)
+    return document
+
+
+def map_account_row(
+    row: Dict[str, Any],
+    company_id: str,
+    row_number: int,
+    now: datetime,
+    source_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Map an accounts CSV row to an account document"""
+    idx = row_number - 1
+    return {
+        "company_id": company_id,
+        "account_id": row['account_id'],
+        "customer_id": row.get('customer_id') or f"CUST{idx:04d}",
+        "customer_name": row.get('customer_name') or f"Customer {idx}",
+        "account_type": row.get('account_type') or 'CHECKING',
+        "balance": float(row.get('balance') or 0),
+        "currency": row.get('currency') or 'USD',
+        "country": row.get('country') or 'US',
+        "status": row.get('status') or 'ACTIVE',
+        "risk_score": int(row.get('risk_score') or 50),
+        "segment": row.get('segment') or 'RETAIL',
+        "opened_date": now,
+        "created_at": now
+    }
+
+
+def map_payroll_row(
+    row: Dict[str, Any],
+    company_id: str,
+    row_number: int,
+    now: datetime,
+    source_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """Map a payroll CSV row to a payroll document"""
+    pay_date = row.get('pay_date')
+    return {
+        "company_id": company_id,
+        "employee_id": row['employee_id'],
+        "employee_name": row['name'],
+        "department": row.get('department') or 'GENERAL',
+        "salary_amount": float(row['salary']),
+        "bank_account_number": row.get('bank_account') or '',
+        "pay_date": parse_date(pay_date) if pay_date else datetime(now.year, now.month, now.day),
+        "payment_method": row.get('payment_method') or 'BANK_TRANSFER',
+        "status": row.get('status') or 'PAID',
+        "created_at": now
+    }
+
+
+# Supported import types: target collection, required CSV columns, row mapper,
+# and for upsert mode the natural key and the fields only written on insert
+IMPORT_TYPES: Dict[str, Dict[str, Any]] = {
+    "transactions": {
+        "collection": "transactions",
+        "required_columns": ['date', 'amount', 'from_account', 'to_account'],
+        "mapper": map_transaction_row,
+        "key_fields": ["company_id", "transaction_id"],
+        "insert_only_fields": ["created_at"]
+    },
+    "accounts": {
+        "collection": "accounts",
+        "required_columns": ['account_id'],
+        "mapper": map_account_row,
+        "key_fields": ["company_id", "account_id"],
+        "insert_only_fields": ["created_at", "opened_date"]
+    },
+    "payroll": {
+        "collection": "payroll",
+        "required_columns": ['employee_id', 'name', 'salary'],
+        "mapper": map_payroll_row
+    }
+}
+
+IMPORT_MODES = ["insert", "upsert"]
+
+
+def open_csv_reader(binary_file: BinaryIO) -> csv.DictReader:
+    """
+    Wrap a binary file in an incremental UTF-8 CSV reader
+    
+    Raises:
+        ValueError: If the file has no header row
+    """
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if not reader.fieldnames:
+        raise ValueError("CSV file is empty")
+    return reader
+
+
+def check_required_columns(fieldnames: List[str], required_columns: List[str]):
+    """Raise ValueError naming any required columns missing from the header"""
+    missing_columns = [col for col in required_columns if col not in fieldnames]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+
+
+def parse_batch(
+    reader: csv.DictReader,
+    mapper,
+    company_id: str,
+    first_row_number: int,
+    batch_size: int,
+    source_id: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], List[int], List[Tuple[int, Dict[str, Any], str]], int]:
+    """
+    Read and map up to batch_size rows
+    
+    source_id comes from import_source_id and is passed on to the mapper.
+    
+    Returns: (documents, row number of each document, rejected rows as (row_number, row, error), rows read)
+    """
+    documents = []
+    row_numbers = []
+    rejected = []
+    now = datetime.utcnow()
+    rows_read = 0
+    
+    for row in reader:
+        row_number = first_row_number + rows_read
+        rows_read += 1
+        try:
+            documents.append(mapper(row, company_id, row_number, now, source_id))
+            row_numbers.append(row_number)
+        except Exception as e:
+            rejected.append((row_number, row, str(e)))
+        if rows_read >= batch_size:
+            break
+    
+    return documents, row_numbers, rejected, rows_read
+
+
+async def insert_batch(
+    collection,
+    documents: List[Dict[str, Any]],
+    row_numbers: List[int]
+) -> Tuple[int, int, int, List[Tuple[int, str]]]:
+    """
+    Insert a batch without stopping at the first failure
+    
+    Returns: (inserted, updated, unchanged, (row_number, error) for each rejected document)
+    """
+    if not documents:
+        return 0, 0, 0, []
+    try:
+        result = await collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), 0, 0, []
+    except BulkWriteError as e:
+        details = e.details or {}
+        return details.get("nInserted", 0), 0, 0, _write_errors(details, row_numbers)
+
+
+async def upsert_batch(
+    collection,
+    documents: List[Dict[str, Any]],
+    row_numbers: List[int],
+    key_fields: List[str],
+    insert_only_fields: List[str]
+) -> Tuple[int, int, int, List[Tuple[int, str]]]:
+    """
+    Upsert a batch keyed on its natural key with one unordered bulk_write
+    
+    Returns: (inserted, updated, unchanged, (row_number, error) for each rejected document)
+    """
+    if not documents:
+        return 0, 0, 0, []
+    operations = [
+        UpdateOne(
+            {field: document[field] for field in key_fields},
+            {
+                "$set": {k: v for k, v in document.items() if k not in insert_only_fields},
+                "$setOnInsert": {field: document[field] for field in insert_only_fields}
+            },
+            upsert=True
+        )
+        for document in documents
+    ]
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+        counts = result.bulk_api_result
+        errors = []
+    except BulkWriteError as e:
+        counts = e.details or {}
+        errors = _write_errors(counts, row_numbers)
+    
+    matched = counts.get("nMatched", 0)
+    modified = counts.get("nModified", 0)
+    return counts.get("nUpserted", 0), modified, matched - modified, errors
+
+
+def _write_errors(details: Dict[str, Any], row_numbers: List[int]) -> List[Tuple[int, str]]:
+    return [
+        (row_numbers[err["index"]], err.get("errmsg", "write error"))
+        for err in details.get("writeErrors", [])
+    ]
+
+
+def check_import_mode(import_type: str, mode: str):
+    """Raise ValueError if the import type cannot be loaded in the given mode"""
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unsupported import mode: {mode}")
+    if mode == "upsert" and not IMPORT_TYPES[import_type].get("key_fields"):
+        raise ValueError(f"Upsert mode is not supported for {import_type}")
+
+
+def batch_writer(db, import_type: str, mode: str = "insert"):
+    """
+    Return an async writer (documents, row_numbers) -> (inserted, updated, unchanged, errors)
+    
+    Raises:
+        ValueError: If the mode is not supported for the import type
+    """
+    check_import_mode(import_type, mode)
+    spec = IMPORT_TYPES[import_type]
+    collection = db[spec["collection"]]
+    
+    if mode == "upsert":
+        async def write(documents, row_numbers):
+            return await upsert_batch(
+                collection, documents, row_numbers, spec["key_fields"], spec["insert_only_fields"]
+            )
+    else:
+        async def write(documents, row_numbers):
+            return await insert_batch(collection, documents, row_numbers)
+    return write
+
+
+class ImportTally:
+    """Running counters shared by the streaming and parallel importers"""
+    
+    def __init__(self, fieldnames: List[str], on_rejected=None):
+        self.fieldnames = fieldnames
+        self.on_rejected = on_rejected
+        self.started = time.time()
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.bytes_processed: Optional[int] = None
+        self.errors: List[str] = []
+        self._reject_lock = asyncio.Lock()
+    
+    async def reject(self, rejected: List[Tuple[int, Dict[str, Any], str]]):
+        """Count rejected rows, keep a few samples and pass them to on_rejected"""
+        if not rejected:
+            return
+        self.failed += len(rejected)
+        for row_number, _, error in rejected:
+            if len(self.errors) >= MAX_SAMPLE_ERRORS:
+                break
+            self.errors.append(f"Row {row_number}: {error}")
+        if self.on_rejected is not None:
+            async with self._reject_lock:
+                await self.on_rejected(self.fieldnames, rejected)
+    
+    async def record_write(self, inserted: int, updated: int, unchanged: int, write_errors: List[Tuple[int, str]]):
+        """Count the outcome of one batch write"""
+        self.inserted += inserted
+        self.updated += updated
+        self.unchanged += unchanged
+        await self.reject([(row_number, {}, error) for row_number, error in write_errors])
+    
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.started
+        stats = {
+            "rows_processed": self.processed,
+            "rows_inserted": self.inserted,
+            "rows_updated": self.updated,
+            "rows_unchanged": self.unchanged,
+            "rows_failed": self.failed,
+            "sample_errors": self.errors,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.processed / elapsed, 1) if elapsed > 0 else float(self.processed)
+        }
+        if self.bytes_processed is not None:
+            stats["bytes_processed"] = self.bytes_processed
+        return stats
+
+
+async def ingest_batches(
+    write_batch,
+    next_batch: Callable[[], Tuple[List[Dict[str, Any]], List[int], List[Tuple[int, Dict[str, Any], str]], int]],
+    tally: ImportTally,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+):
+    """
+    Write parsed batches until next_batch reports no rows read
+    
+    next_batch is a blocking callable returning parse_batch-style results. It
+    runs in a worker thread and overlaps with the previous batch's insert, so
+    the event loop stays free while only two batches are held in memory.
+    write_batch is a writer returned by batch_writer.
+    """
+    pending_write: Optional[asyncio.Task] = None
+    
+    try:
+        while True:
+            documents, row_numbers, rejected, rows_read = await run_in_threadpool(next_batch)
+            tally.processed += rows_read
+            await tally.reject(rejected)
+            
+            if pending_write is not None:
+                write, pending_write = pending_write, None
+                await tally.record_write(*await write)
+                if on_progress is not None:
+                    await on_progress(tally.stats())
+            
+            if not rows_read:
+                break
+            pending_write = asyncio.create_task(write_batch(documents, row_numbers))
+    finally:
+        # Only set when parsing failed mid-file: finish the in-flight write so
+        # its rows are counted, without masking the parse error
+        if pending_write is not None:
+            try:
+                await tally.record_write(*await pending_write)
+            except Exception as e:
+                print(f"✗ Write in flight when the import failed also failed: {e}")
+
+
+async def stream_csv_import(
+    db,
+    binary_file: BinaryIO,
+    import_type: str,
+    company_id: str,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    mode: str = "insert",
+    on_rejected: Optional[Callable[[List[str], List[Tuple[int, Dict[str, Any], str]]], Awaitable[None]]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    source_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Stream a CSV file into its target collection
+    
+    Args:
+        db: Database instance
+        binary_file: Readable binary file object positioned at the start of the CSV
+        import_type: Key into IMPORT_TYPES
+        company_id: Company ID stamped on every document
+        batch_size: Rows per write
+        mode: "insert", or "upsert" to update existing documents matched on the natural key
+        on_rejected: Awaited with (CSV header, rejected rows as (row_number, row, error))
+            for every batch that has parse or write failures
+        on_progress: Awaited with the running statistics after each batch is written
+        source_id: Upload identity for default transaction IDs in insert mode
+            (default: a new random ID)
+    
+    Returns:
+        Import statistics including rows_per_second
+    
+    Raises:
+        ValueError: If the file is empty, required columns are missing or the mode is unsupported
+    """
+    spec = IMPORT_TYPES[import_type]
+    write_batch = batch_writer(db, import_type, mode)
+    
+    reader = await run_in_threadpool(open_csv_reader, binary_file)
+    check_required_columns(reader.fieldnames, spec["required_columns"])
+    
+    tally = ImportTally(reader.fieldnames, on_rejected)
+    source_id = import_source_id(mode, source_id)
+    
+    def next_batch():
+        return parse_batch(reader, spec["mapper"], company_id, tally.processed + 1, batch_size, source_id)
+    
+    await ingest_batches(write_batch, next_batch, tally, on_progress)
+    
+    if tally.processed == 0:
+        raise ValueError("CSV file is empty")
+    
+    return tally.stats()
+
+
+def split_byte_ranges(path: str, chunk_size: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Read the CSV header and split the rest of the file into line-aligned byte ranges
+    
+    Returns: (header fieldnames, [(start, end)] covering every data row)
+    
+    Raises:
+        ValueError: If the file has no header row
+    """
+    ranges = []
+    with open(path, 'rb') as f:
+        header = f.readline()
+        fieldnames = next(csv.reader([header.decode('utf-8-sig')]), None)
+        if not fieldnames:
+            raise ValueError("CSV file is empty")
+        
+        size = os.fstat(f.fileno()).st_size
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_size, size))
+            f.readline()
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return fieldnames, ranges
+
+
+def read_byte_range(path: str, start: int, end: int) -> bytes:
+    """Read [start, end) from a file"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def count_rows(path: str, start: int, end: int) -> int:
+    """Count the non-blank lines in a byte range, matching what csv.DictReader yields"""
+    return sum(1 for line in read_byte_range(path, start, end).split(b'\n') if line and line != b'\r')
+
+
+def parse_byte_range(
+    path: str,
+    start: int,
+    end: int,
+    first_row_number: int,
+    fieldnames: List[str],
+    import_type: str,
+    company_id: str,
+    source_id: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], List[int], List[Tuple[int, Dict[str, Any], str]], int]:
+    """Parse one line-aligned byte range of a CSV file in a worker process"""
+    text = read_byte_range(path, start, end).decode('utf-8')
+    reader = csv.DictReader(io.StringIO(text, newline=''), fieldnames=fieldnames)
+    mapper = IMPORT_TYPES[import_type]["mapper"]
+    return parse_batch(reader, mapper, company_id, first_row_number, sys.maxsize, source_id)
+
+
+async def parallel_csv_import(
+    db,
+    path: str,
+    import_type: str,
+    company_id: str,
+    workers: Optional[int] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    chunk_size: int = PARALLEL_CHUNK_BYTES,
+    mode: str = "insert",
+    on_rejected: Optional[Callable[[List[str], List[Tuple[int, Dict[str, Any], str]]], Awaitable[None]]] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    source_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Import a CSV file on disk, parsing line-aligned chunks in a process pool
+    
+    Each chunk's rows are counted just ahead of its parse to give the next
+    chunk its first row number, so rows are numbered as stream_csv_import
+    numbers them (mappers derive default IDs from row numbers). Counting
+    runs at most `workers` chunks ahead, so the first parse starts at once
+    and each chunk is parsed while its bytes are still in the page cache.
+    Parsed chunks are consumed in file order and fed through a bounded queue
+    to a single writer, so parsing stalls instead of buffering when inserts
+    fall behind.
+    Splitting on raw newlines means quoted fields must not contain line
+    breaks; use stream_csv_import for such files.
+    
+    Args:
+        db: Database instance
+        path: Path of the CSV file
+        import_type: Key into IMPORT_TYPES
+        company_id: Company ID stamped on every document
+        workers: Parser processes (default: one per CPU)
+        batch_size: Rows per write
+        chunk_size: Approximate bytes handed to a worker at a time
+        mode: As for stream_csv_import
+        on_rejected: As for stream_csv_import
+        on_progress: As for stream_csv_import; stats also include bytes_processed
+        source_id: As for stream_csv_import
+    
+    Returns:
+        Import statistics including rows_per_second
+    
+    Raises:
+        ValueError: If the file is empty, required columns are missing or the mode is unsupported
+    """
+    spec = IMPORT_TYPES[import_type]
+    write_batch = batch_writer(db, import_type, mode)
+    
+    fieldnames, ranges = await run_in_threadpool(split_byte_ranges, path, chunk_size)
+    check_required_columns(fieldnames, spec["required_columns"])
+    
+    tally = ImportTally(fieldnames, on_rejected)
+    source_id = import_source_id(mode, source_id)
+    workers = workers or os.cpu_count() or 1
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    loop = asyncio.get_running_loop()
+    
+    async def writer():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            documents, row_numbers, end = item
+            await tally.record_write(*await write_batch(documents, row_numbers))
+            tally.bytes_processed = end
+            if on_progress is not None:
+                await on_progress(tally.stats())
+    
+    writer_task = asyncio.create_task(writer())
+    
+    async def put(item):
+        # Wait for queue space, surfacing a writer failure instead of blocking forever
+        put_task = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait({put_task, writer_task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put_task.done():
+            put_task.cancel()
+            writer_task.result()
+    
+    async def drain(end: int, future: asyncio.Future):
+        documents, row_numbers, rejected, rows_read = await future
+        tally.processed += rows_read
+        await tally.reject(rejected)
+        for i in range(0, len(documents), batch_size):
+            await put((documents[i:i + batch_size], row_numbers[i:i + batch_size], end))
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            row_counts = deque(
+                loop.run_in_executor(pool, count_rows, path, start, end)
+                for start, end in ranges[:workers]
+            )
+            next_row_number = 1
+            in_flight = deque()
+            for index, (start, end) in enumerate(ranges):
+                future = loop.run_in_executor(
+                    pool, parse_byte_range, path, start, end, next_row_number,
+                    fieldnames, import_type, company_id, source_id
+                )
+                if index + workers < len(ranges):
+                    row_counts.append(loop.run_in_executor(pool, count_rows, path, *ranges[index + workers]))
+                next_row_number += await row_counts.popleft()
+                in_flight.append((end, future))
+                if len(in_flight) >= workers * 2:
+                    await drain(*in_flight.popleft())
+            while in_flight:
+                await drain(*in_flight.popleft())
+        await put(None)
+        await writer_task
+    finally:
+        if not writer_task.done():
+            writer_task.cancel()
+    
+    if tally.processed == 0:
+        raise ValueError("CSV file is empty")
+    
+    return tally.stats()
@@ -0,0 +1,75 @@
+"""
+Dashboard service - per-company summary served from the response cache
+Counts come from one $facet aggregation over the severity and status of a
+company's violations; recent violations are a separate indexed find. The
+summary is cached per company until the company's data version changes or
+the TTL expires.
+"""
+from typing import Dict, Any
+import asyncio
+
+from app.config import settings
+from app.services.response_cache import response_cache
+
+
+SEVERITIES = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+RECENT_VIOLATIONS = 10
+
+
+def _serialize_violation(violation: Dict[str, Any]) -> Dict[str, Any]:
+    violation["id"] = str(violation.pop("_id"))
+    if "created_at" in violation:
+        violation["created_at"] = violation["created_at"].isoformat()
+    if "updated_at" in violation:
+        violation["updated_at"] = violation["updated_at"].isoformat()
+    return violation
+
+
+async def compute_dashboard_summary(db, company_id: str) -> Dict[str, Any]:
+    """Compute the dashboard summary for a company"""
+    company_filter = {"company_id": company_id}
+    pipeline = [
+        {"$match": company_filter},
+        # $facet buffers its input, so pass only the fields it counts
+        {"$project": {"_id": 0, "severity": 1, "status": 1}},
+        {
+            "$facet": {
+                "by_severity": [{"$group": {"_id": "$severity", "count": {"$sum": 1}}}],
+                "open": [{"$match": {"status": "OPEN"}}, {"$count": "count"}]
+            }
+        }
+    ]
+    # Served by the (company_id, created_at, _id) index, reading only ten documents
+    recent_query = db.violations.find(company_filter, {"comments": 0}).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(RECENT_VIOLATIONS)
+    
+    facets, recent, enabled_rules, last_scan = await asyncio.gather(
+        db.violations.aggregate(pipeline).to_list(length=1),
+        recent_query.to_list(length=RECENT_VIOLATIONS),
+        db.rules.count_documents({**company_filter, "enabled": True}),
+        db.scan_runs.find_one(company_filter, {"started_at": 1}, sort=[("started_at", -1)])
+    )
+    facets = facets[0] if facets else {"by_severity": [], "open": []}
+    
+    severity_counts = {row["_id"]: row["count"] for row in facets["by_severity"]}
+    violations_by_severity = {severity: severity_counts.get(severity, 0) for severity in SEVERITIES}
+    
+    return {
+        "total_violations": sum(severity_counts.values()),
+        "open_violations": facets["open"][0]["count"] if facets["open"] else 0,
+        "critical_violations": violations_by_severity["CRITICAL"],
+        "enabled_rules": enabled_rules,
+        "last_scan_time": last_scan["started_at"].isoformat() if last_scan else None,
+        "violations_by_severity": violations_by_severity,
+        "recent_violations": [_serialize_violation(violation) for violation in recent]
+    }
+
+
+async def get_dashboard_summary(db, company_id: str) -> Dict[str, Any]:
+    """Cached dashboard summary"""
+    return await response_cache.get_or_compute(
+        db, company_id, "dashboard/summary", {},
+        lambda: compute_dashboard_summary(db, company_id),
+        ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS
+    )
@@ -0,0 +1,147 @@
+"""
+Detection metrics service - rule accuracy against ground-truth labels
+Violations are joined to labelled transactions server-side, so precision,
+recall and F1 per rule are computed without loading either collection.
+"""
+from typing import Dict, Any, List
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.services.violation_fields import TRANSACTION_IDS_EXPR
+from app.services.response_cache import bump_data_version
+
+
+def _rates(true_positives: int, false_positives: int, false_negatives: int, total: int) -> Dict[str, Any]:
+    """Confusion matrix and derived rates"""
+    true_negatives = max(total - true_positives - false_positives - false_negatives, 0)
+    flagged = true_positives + false_positives
+    actual = true_positives + false_negatives
+    precision = true_positives / flagged if flagged else 0
+    recall = true_positives / actual if actual else 0
+    f1_score = 2 * precision * recall / (precision + recall) if precision + recall else 0
+    return {
+        "true_positives": true_positives,
+        "false_positives": false_positives,
+        "true_negatives": true_negatives,
+        "false_negatives": false_negatives,
+        "accuracy": round((true_positives + true_negatives) / total, 4) if total else 0,
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1_score": round(f1_score, 4),
+        "detection_rate": round(recall, 4)
+    }
+
+
+async def _detected_counts(db, company_id: str) -> Dict[str, Any]:
+    """
+    Count distinct flagged transactions and how many of them are laundering,
+    overall and per rule
+    
+    Each flagged transaction is looked up once, however many rules and scans flagged it.
+    """
+    pipeline = [
+        {"$match": {"company_id": company_id, "collection": "transactions"}},
+        {"$project": {"rule_id": 1, "transaction_ids": TRANSACTION_IDS_EXPR}},
+        {"$unwind": "$transaction_ids"},
+        {"$group": {"_id": "$transaction_ids", "rule_ids": {"$addToSet": "$rule_id"}}},
+        {
+            "$lookup": {
+                "from": "transactions",
+                "localField": "_id",
+                "foreignField": "transaction_id",
+                "pipeline": [
+                    {"$match": {"company_id": company_id}},
+                    {"$project": {"_id": 0, "is_laundering": 1}}
+                ],
+                "as": "transaction"
+            }
+        },
+        {
+            "$project": {
+                "rule_ids": 1,
+                "is_laundering": {
+                    "$cond": [{"$eq": [{"$first": "$transaction.is_laundering"}, True]}, 1, 0]
+                }
+            }
+        },
+        {
+            "$facet": {
+                "overall": [
+                    {"$group": {"_id": None, "flagged": {"$sum": 1}, "true_positives": {"$sum": "$is_laundering"}}}
+                ],
+                "by_rule": [
+                    {"$unwind": "$rule_ids"},
+                    {
+                        "$group": {
+                            "_id": "$rule_ids",
+                            "flagged": {"$sum": 1},
+                            "true_positives": {"$sum": "$is_laundering"}
+                        }
+                    }
+                ]
+            }
+        }
+    ]
+    
+    results = await db.violations.aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+    result = results[0] if results else {"overall": [], "by_rule": []}
+    overall = result["overall"][0] if result["overall"] else {"flagged": 0, "true_positives": 0}
+    return {"overall": overall, "by_rule": result["by_rule"]}
+
+
+async def compute_detection_metrics(db, company_id: str) -> Dict[str, Any]:
+    """
+    Compute detection accuracy overall and per rule
+    
+    A transaction counts as detected when any violation references it; it is
+    a true positive when its is_laundering label is true.
+    
+    Returns:
+        Metrics document with confusion matrix, precision, recall and F1,
+        plus a by_rule list with the same metrics for each rule
+    """
+    total = await db.transactions.count_documents({"company_id": company_id})
+    laundering = await db.transactions.count_documents({"company_id": company_id, "is_laundering": True})
+    detected = await _detected_counts(db, company_id)
+    
+    rule_ids = [ObjectId(entry["_id"]) for entry in detected["by_rule"] if ObjectId.is_valid(entry["_id"])]
+    rules = await db.rules.find(
+        {"_id": {"$in": rule_ids}},
+        {"name": 1, "control_id": 1}
+    ).to_list(length=None)
+    rules_by_id = {str(rule["_id"]): rule for rule in rules}
+    
+    by_rule: List[Dict[str, Any]] = []
+    for entry in detected["by_rule"]:
+        rule = rules_by_id.get(entry["_id"], {})
+        true_positives = entry["true_positives"]
+        by_rule.append({
+            "rule_id": entry["_id"],
+            "rule_name": rule.get("name", "Unknown rule"),
+            "control_id": rule.get("control_id"),
+            "flagged_transactions": entry["flagged"],
+            **_rates(true_positives, entry["flagged"] - true_positives, laundering - true_positives, total)
+        })
+    by_rule.sort(key=lambda metrics: (-metrics["f1_score"], metrics["rule_name"]))
+    
+    true_positives = detected["overall"]["true_positives"]
+    return {
+        "company_id": company_id,
+        "calculated_at": datetime.utcnow(),
+        "total_transactions": total,
+        "laundering_transactions": laundering,
+        "flagged_transactions": detected["overall"]["flagged"],
+        **_rates(true_positives, detected["overall"]["flagged"] - true_positives, laundering - true_positives, total),
+        "by_rule": by_rule
+    }
+
+
+async def refresh_detection_metrics(db, company_id: str) -> Dict[str, Any]:
+    """Recompute detection metrics and store them as the company's latest"""
+    metrics = await compute_detection_metrics(db, company_id)
+    await db.detection_metrics.delete_many({"company_id": company_id})
+    await db.detection_metrics.insert_one(metrics)
+    await bump_data_version(db, company_id)
+    metrics.pop("_id", None)
+    return metrics
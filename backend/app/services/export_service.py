@@ -0,0 +1,240 @@
+"""
+Streaming export of violations and cases
+Iterates a projected server cursor and serializes fixed-size chunks of rows
+to CSV, NDJSON or Parquet (optionally gzipped) as they arrive, so memory
+stays flat however many rows the export covers.
+"""
+from typing import Dict, Any, List, Optional, AsyncIterator
+from datetime import datetime
+from enum import Enum
+import csv
+import io
+import json
+import zlib
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from starlette.concurrency import run_in_threadpool
+
+
+EXPORT_CHUNK_ROWS = 5000
+
+
+class ExportFormat(str, Enum):
+    """Export file formats"""
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+
+# Format -> (media type, file extension)
+FORMAT_MEDIA = {
+    ExportFormat.CSV: ("text/csv", "csv"),
+    ExportFormat.NDJSON: ("application/x-ndjson", "ndjson"),
+    ExportFormat.PARQUET: ("application/vnd.apache.parquet", "parquet")
+}
+
+# Exported column -> type; "id" is the document _id, "json" columns hold nested data
+VIOLATION_EXPORT_FIELDS = {
+    "id": "string",
+    "scan_run_id": "string",
+    "rule_id": "string",
+    "rule_name": "string",
+    "framework": "string",
+    "control_id": "string",
+    "collection": "string",
+    "document_id": "string",
+    "account_ids": "list",
+    "case_ids": "list",
+    "severity": "string",
+    "status": "string",
+    "explanation": "string",
+    "reviewer_note": "string",
+    "reviewed_by": "string",
+    "reviewed_at": "timestamp",
+    "assigned_to_user_id": "string",
+    "assigned_to_user_name": "string",
+    "created_at": "timestamp"
+}
+
+CASE_EXPORT_FIELDS = {
+    "id": "string",
+    "title": "string",
+    "primary_account_id": "string",
+    "severity": "string",
+    "status": "string",
+    "assigned_to_user_id": "string",
+    "assigned_to_user_name": "string",
+    "linked_violation_ids": "list",
+    "created_by": "string",
+    "created_by_name": "string",
+    "created_at": "timestamp",
+    "updated_at": "timestamp"
+}
+
+ARROW_TYPES = {
+    "string": pa.string(),
+    "timestamp": pa.timestamp("ms"),
+    "list": pa.list_(pa.string()),
+    "json": pa.string()
+}
+
+
+def export_projection(fields: Dict[str, str]) -> Dict[str, int]:
+    """Cursor projection for the exported columns"""
+    return {field: 1 for field in fields if field != "id"}
+
+
+def _json_default(value: Any) -> str:
+    """JSON encoding for datetimes, ObjectIds and other BSON values"""
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _to_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        return str(value.value)
+    return str(value)
+
+
+def export_row(doc: Dict[str, Any], fields: Dict[str, str]) -> Dict[str, Any]:
+    """Coerce a document to the exported columns"""
+    row = {}
+    for field, kind in fields.items():
+        value = doc.get("_id") if field == "id" else doc.get(field)
+        if kind == "timestamp":
+            row[field] = value if isinstance(value, datetime) else None
+        elif kind == "list":
+            row[field] = [str(item) for item in value] if isinstance(value, list) else []
+        elif kind == "json":
+            row[field] = value
+        else:
+            row[field] = _to_text(value)
+    return row
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that buffers what the Parquet writer emits until drained"""
+    
+    def __init__(self):
+        super().__init__()
+        self.buffer = bytearray()
+        self.position = 0
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        self.buffer.extend(data)
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class ExportSerializer:
+    """Incremental serializer for one export; not thread-safe, call from one thread at a time"""
+    
+    def __init__(self, export_format: ExportFormat, fields: Dict[str, str], compress: bool = False):
+        self.format = export_format
+        self.fields = fields
+        self.compressor = zlib.compressobj(wbits=31) if compress else None
+        self.header_written = False
+        self.sink = None
+        self.writer = None
+        if export_format == ExportFormat.PARQUET:
+            self.schema = pa.schema([(field, ARROW_TYPES[kind]) for field, kind in fields.items()])
+            self.sink = _ChunkSink()
+            self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+    
+    def _compress(self, data: bytes, final: bool = False) -> bytes:
+        if self.compressor is None:
+            return data
+        data = self.compressor.compress(data)
+        return data + self.compressor.flush() if final else data
+    
+    def _csv_value(self, kind: str, value: Any) -> Any:
+        if value is None:
+            return ""
+        if kind == "timestamp":
+            return value.isoformat()
+        if kind == "list":
+            return ";".join(value)
+        if kind == "json":
+            return json.dumps(value, default=_json_default)
+        return value
+    
+    def _serialize(self, rows: List[Dict[str, Any]]) -> bytes:
+        if self.format == ExportFormat.PARQUET:
+            columns = {
+                field: [
+                    json.dumps(row[field], default=_json_default) if kind == "json" and row[field] is not None
+                    else row[field]
+                    for row in rows
+                ]
+                for field, kind in self.fields.items()
+            }
+            self.writer.write_table(pa.table(columns, schema=self.schema))
+            return self.sink.drain()
+        
+        if self.format == ExportFormat.NDJSON:
+            return "".join(json.dumps(row, default=_json_default) + "\n" for row in rows).encode()
+        
+        out = io.StringIO()
+        writer = csv.writer(out)
+        if not self.header_written:
+            writer.writerow(list(self.fields))
+            self.header_written = True
+        for row in rows:
+            writer.writerow([self._csv_value(kind, row[field]) for field, kind in self.fields.items()])
+        return out.getvalue().encode()
+    
+    def write(self, rows: List[Dict[str, Any]]) -> bytes:
+        """Serialize a chunk of export rows"""
+        return self._compress(self._serialize(rows))
+    
+    def close(self) -> bytes:
+        """Finish the export, returning any trailing bytes (CSV header of an empty export, Parquet footer, gzip trailer)"""
+        data = b""
+        if self.format == ExportFormat.CSV and not self.header_written:
+            data = self._serialize([])
+        if self.writer is not None:
+            self.writer.close()
+            data = self.sink.drain()
+        return self._compress(data, final=True)
+
+
+async def stream_export(
+    cursor,
+    fields: Dict[str, str],
+    export_format: ExportFormat,
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Serialize cursor results chunk by chunk
+    
+    Serialization runs in the threadpool so large chunks do not stall the
+    event loop; only one chunk of rows is held in memory at a time.
+    """
+    serializer = ExportSerializer(export_format, fields, compress)
+    rows = []
+    async for doc in cursor:
+        rows.append(export_row(doc, fields))
+        if len(rows) >= EXPORT_CHUNK_ROWS:
+            data = await run_in_threadpool(serializer.write, rows)
+            rows = []
+            if data:
+                yield data
+    
+    if rows:
+        data = await run_in_threadpool(serializer.write, rows)
+        if data:
+            yield data
+    yield await run_in_threadpool(serializer.close)
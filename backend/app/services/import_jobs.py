@@ -0,0 +1,430 @@
+"""
+Background import jobs
+Uploads are spooled to local disk, optionally as resumable chunks, and then
+ingested by a background worker that records progress on the job document
+and writes every rejected row to a downloadable errors CSV
+"""
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from datetime import datetime, timedelta
+from pathlib import Path
+import asyncio
+import csv
+import os
+import shutil
+import socket
+import uuid
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.models.import_job import ImportJobStatus
+from app.services.csv_import import (
+    IMPORT_TYPES, check_import_mode, stream_csv_import, parallel_csv_import
+)
+from app.services.columnar_import import detect_upload_format, stream_columnar_import
+from app.services.response_cache import bump_data_version
+from app.services.upload_streams import open_upload, strip_compression_suffix
+
+
+_job_slots = asyncio.Semaphore(settings.IMPORT_MAX_CONCURRENT_JOBS)
+_running_tasks = set()
+
+# Identifies this process as the owner of the jobs it runs
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Import statistics copied onto the job document as it runs
+STAT_FIELDS = [
+    "rows_processed", "rows_inserted", "rows_updated", "rows_unchanged",
+    "rows_failed", "rows_per_second", "sample_errors"
+]
+
+
+def spool_path(job_id: str) -> Path:
+    """Local file holding the uploaded data for a job"""
+    return Path(settings.IMPORT_SPOOL_DIR) / f"{job_id}.upload"
+
+
+def errors_path(job_id: str) -> Path:
+    """Local file holding the rejected rows for a job"""
+    return Path(settings.IMPORT_SPOOL_DIR) / f"{job_id}.errors.csv"
+
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a job document into an API response"""
+    bytes_received = job.get("bytes_received", 0)
+    bytes_processed = job.get("bytes_processed", 0)
+    if job["status"] == ImportJobStatus.COMPLETED:
+        progress = 100.0
+    elif bytes_received:
+        progress = round(min(bytes_processed / bytes_received, 1.0) * 100, 1)
+    else:
+        progress = 0.0
+    
+    return {
+        "id": str(job["_id"]),
+        "import_type": job["import_type"],
+        "filename": job["filename"],
+        "status": job["status"],
+        "mode": job.get("mode", "insert"),
+        "parallel": job.get("parallel", False),
+        "total_size": job.get("total_size"),
+        "bytes_received": bytes_received,
+        "bytes_processed": bytes_processed,
+        "progress_percent": progress,
+        "rows_processed": job.get("rows_processed", 0),
+        "rows_inserted": job.get("rows_inserted", 0),
+        "rows_updated": job.get("rows_updated", 0),
+        "rows_unchanged": job.get("rows_unchanged", 0),
+        "rows_failed": job.get("rows_failed", 0),
+        "rows_per_second": job.get("rows_per_second", 0.0),
+        "sample_errors": job.get("sample_errors", []),
+        "error_file_available": job.get("error_file_available", False),
+        "error_message": job.get("error_message"),
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "completed_at": job.get("completed_at")
+    }
+
+
+async def create_job(
+    db,
+    company_id: str,
+    user_id: str,
+    import_type: str,
+    filename: str,
+    total_size: Optional[int] = None,
+    parallel: bool = False,
+    mode: str = "insert"
+) -> Dict[str, Any]:
+    """
+    Create an import job in UPLOADING state with an empty spool file
+    
+    Raises:
+        ValueError: If the import type, mode or size is not acceptable
+    """
+    if import_type not in IMPORT_TYPES:
+        raise ValueError(f"Unsupported import type: {import_type}")
+    check_import_mode(import_type, mode)
+    inner_filename, compression = strip_compression_suffix(filename)
+    detect_upload_format(inner_filename, import_type, compressed=compression is not None)
+    if total_size is not None and total_size > settings.IMPORT_MAX_FILE_SIZE:
+        raise ValueError(f"File exceeds the {settings.IMPORT_MAX_FILE_SIZE} byte import limit")
+    
+    now = datetime.utcnow()
+    job = {
+        "company_id": company_id,
+        "created_by": user_id,
+        "import_type": import_type,
+        "filename": filename,
+        "status": ImportJobStatus.UPLOADING.value,
+        "total_size": total_size,
+        "mode": mode,
+        "parallel": parallel,
+        "bytes_received": 0,
+        "bytes_processed": 0,
+        "created_at": now,
+        "updated_at": now
+    }
+    result = await db.import_jobs.insert_one(job)
+    job["_id"] = result.inserted_id
+    
+    path = spool_path(str(result.inserted_id))
+    await run_in_threadpool(path.parent.mkdir, parents=True, exist_ok=True)
+    await run_in_threadpool(path.write_bytes, b"")
+    return job
+
+
+async def append_chunk(db, job: Dict[str, Any], offset: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """
+    Write an upload chunk at `offset` in the job's spool file
+    
+    A client resumes an interrupted upload by reading bytes_received from the
+    job and sending the remainder from that offset. Re-sending an earlier
+    offset overwrites everything after it. Chunks for one job must be sent
+    sequentially.
+    
+    Raises:
+        ValueError: If the job is not accepting data or the offset leaves a gap
+    """
+    if job["status"] != ImportJobStatus.UPLOADING:
+        raise ValueError(f"Job is {job['status']}, not accepting uploads")
+    if offset > job["bytes_received"]:
+        raise ValueError(f"Offset {offset} is past the {job['bytes_received']} bytes received")
+    
+    path = spool_path(str(job["_id"]))
+    spool = await run_in_threadpool(open, path, "r+b")
+    try:
+        await run_in_threadpool(spool.seek, offset)
+        await run_in_threadpool(spool.truncate)
+        size = offset
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > settings.IMPORT_MAX_FILE_SIZE:
+                raise ValueError(f"File exceeds the {settings.IMPORT_MAX_FILE_SIZE} byte import limit")
+            await run_in_threadpool(spool.write, chunk)
+    finally:
+        await run_in_threadpool(spool.close)
+    
+    return await db.import_jobs.find_one_and_update(
+        {"_id": job["_id"]},
+        {"$set": {"bytes_received": size, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def spool_upload(db, job: Dict[str, Any], binary_file) -> Dict[str, Any]:
+    """Copy a complete single-request upload into the job's spool file"""
+    path = spool_path(str(job["_id"]))
+    
+    def copy():
+        with open(path, "wb") as spool:
+            shutil.copyfileobj(binary_file, spool, 1024 * 1024)
+        return path.stat().st_size
+    
+    size = await run_in_threadpool(copy)
+    if size > settings.IMPORT_MAX_FILE_SIZE:
+        await run_in_threadpool(path.unlink)
+        await db.import_jobs.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": ImportJobStatus.FAILED.value, "error_message": "File too large"}}
+        )
+        raise ValueError(f"File exceeds the {settings.IMPORT_MAX_FILE_SIZE} byte import limit")
+    
+    return await db.import_jobs.find_one_and_update(
+        {"_id": job["_id"]},
+        {"$set": {"bytes_received": size, "total_size": size, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def start_job(db, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Mark an uploaded job as QUEUED and hand it to the background worker
+    
+    Raises:
+        ValueError: If the job is not uploading or the upload is incomplete
+    """
+    if job["status"] != ImportJobStatus.UPLOADING:
+        raise ValueError(f"Job is {job['status']}, not awaiting completion")
+    if job.get("total_size") is not None and job["bytes_received"] != job["total_size"]:
+        raise ValueError(
+            f"Upload incomplete: received {job['bytes_received']} of {job['total_size']} bytes"
+        )
+    if job["bytes_received"] == 0:
+        raise ValueError("Uploaded file is empty")
+    
+    job = await db.import_jobs.find_one_and_update(
+        {"_id": job["_id"], "status": ImportJobStatus.UPLOADING.value},
+        {"$set": {"status": ImportJobStatus.QUEUED.value, "updated_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if job is None:
+        raise ValueError("Job was already started")
+    schedule_job(db, job["_id"])
+    return job
+
+
+def schedule_job(db, job_id: ObjectId):
+    """Run a queued job on the event loop, keeping a reference until it finishes"""
+    task = asyncio.create_task(run_job(db, job_id))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+class RejectedRowsWriter:
+    """Appends rejected rows to a job's errors CSV, writing the header on first use"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = None
+        self.writer = None
+        self.fieldnames: List[str] = []
+    
+    def write(self, fieldnames: List[str], rejected: List[Tuple[int, Dict[str, Any], str]]):
+        if self.writer is None:
+            self.fieldnames = list(fieldnames)
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["row_number", "error"] + self.fieldnames)
+        for row_number, row, error in rejected:
+            self.writer.writerow([row_number, error] + [row.get(name, "") for name in self.fieldnames])
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+async def run_job(db, job_id: ObjectId):
+    """
+    Ingest a queued job's spool file
+    
+    Progress is written to the job document after every batch. The spool
+    file is removed once the job reaches a terminal state; the errors CSV
+    is kept for download.
+    """
+    async with _job_slots:
+        now = datetime.utcnow()
+        job = await db.import_jobs.find_one_and_update(
+            {"_id": job_id, "status": ImportJobStatus.QUEUED.value},
+            {"$set": {
+                "status": ImportJobStatus.RUNNING.value,
+                "started_at": now,
+                "worker_id": WORKER_ID,
+                "heartbeat_at": now
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            return
+        heartbeat = asyncio.create_task(_heartbeat(db, job_id))
+        
+        key = str(job_id)
+        path = spool_path(key)
+        error_writer = RejectedRowsWriter(errors_path(key))
+        spool = None
+        
+        async def on_rejected(fieldnames, rejected):
+            await run_in_threadpool(error_writer.write, fieldnames, rejected)
+        
+        async def on_progress(stats):
+            await db.import_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    **{field: stats[field] for field in STAT_FIELDS},
+                    "bytes_processed": stats.get("bytes_processed", spool.tell()),
+                    "updated_at": datetime.utcnow()
+                }}
+            )
+        
+        try:
+            spool = await run_in_threadpool(open, path, "rb")
+            stream, filename, compression = open_upload(
+                spool, job["filename"], settings.IMPORT_MAX_FILE_SIZE, settings.IMPORT_MAX_DECOMPRESSED_SIZE
+            )
+            file_format = detect_upload_format(filename, job["import_type"], compressed=compression is not None)
+            mode = job.get("mode", "insert")
+            if file_format != "csv":
+                stats = await stream_columnar_import(
+                    db, stream, file_format, job["company_id"], mode=mode,
+                    on_rejected=on_rejected, on_progress=on_progress, source_id=key
+                )
+            elif job.get("parallel") and compression is None:
+                stats = await parallel_csv_import(
+                    db, str(path), job["import_type"], job["company_id"],
+                    workers=settings.IMPORT_PARSE_WORKERS or None, mode=mode,
+                    on_rejected=on_rejected, on_progress=on_progress, source_id=key
+                )
+            else:
+                stats = await stream_csv_import(
+                    db, stream, job["import_type"], job["company_id"], mode=mode,
+                    on_rejected=on_rejected, on_progress=on_progress, source_id=key
+                )
+            update = {
+                **{field: stats[field] for field in STAT_FIELDS},
+                "status": ImportJobStatus.COMPLETED.value,
+                "bytes_processed": job["bytes_received"],
+                "error_file_available": stats["rows_failed"] > 0
+            }
+            print(f"Import job {key} completed: {stats['rows_inserted']} inserted, {stats['rows_failed']} failed")
+        except Exception as e:
+            update = {
+                "status": ImportJobStatus.FAILED.value,
+                "error_message": str(e),
+                "error_file_available": error_writer.writer is not None
+            }
+            print(f"Import job {key} failed: {e}")
+        finally:
+            heartbeat.cancel()
+            if spool is not None:
+                await run_in_threadpool(spool.close)
+            await run_in_threadpool(error_writer.close)
+        
+        update["completed_at"] = datetime.utcnow()
+        update["updated_at"] = update["completed_at"]
+        result = await db.import_jobs.update_one(
+            {"_id": job_id, "worker_id": WORKER_ID, "status": ImportJobStatus.RUNNING.value},
+            {"$set": update}
+        )
+        if result.matched_count == 0:
+            print(f"Import job {key} was failed as abandoned while running; keeping that status")
+        await bump_data_version(db, job["company_id"])
+        await run_in_threadpool(_remove_file, path)
+
+
+async def _heartbeat(db, job_id: ObjectId):
+    """Refresh heartbeat_at on a job this worker owns until cancelled"""
+    while True:
+        await asyncio.sleep(settings.IMPORT_JOB_HEARTBEAT_SECONDS)
+        await db.import_jobs.update_one(
+            {"_id": job_id, "worker_id": WORKER_ID},
+            {"$set": {"heartbeat_at": datetime.utcnow()}}
+        )
+
+
+def _remove_file(path: Path):
+    if path.exists():
+        os.remove(path)
+
+
+async def reap_stale_jobs(db) -> int:
+    """
+    Fail RUNNING jobs whose worker has stopped sending heartbeats
+    
+    Only jobs with neither a heartbeat nor a progress update within
+    IMPORT_JOB_STALE_SECONDS are touched, so jobs owned by live workers (other
+    processes, or old workers during a rolling restart) keep running. They are
+    failed rather than restarted, since re-ingesting a partially loaded file
+    would insert duplicate rows.
+    
+    Returns: Number of jobs failed
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.IMPORT_JOB_STALE_SECONDS)
+    stale = {
+        "status": ImportJobStatus.RUNNING.value,
+        "$or": [{"heartbeat_at": {"$lt": cutoff}}, {"heartbeat_at": {"$exists": False}}],
+        "updated_at": {"$lt": cutoff}
+    }
+    
+    reaped = 0
+    while True:
+        now = datetime.utcnow()
+        job = await db.import_jobs.find_one_and_update(
+            stale,
+            {"$set": {
+                "status": ImportJobStatus.FAILED.value,
+                "error_message": "Abandoned: the worker running this import stopped responding",
+                "completed_at": now,
+                "updated_at": now
+            }},
+            projection={"_id": 1, "worker_id": 1}
+        )
+        if job is None:
+            return reaped
+        print(f"Import job {job['_id']} abandoned by worker {job.get('worker_id')}; marked FAILED")
+        await run_in_threadpool(_remove_file, spool_path(str(job["_id"])))
+        reaped += 1
+
+
+async def watch_import_jobs(db):
+    """Periodically fail abandoned jobs; runs for the lifetime of the app"""
+    while True:
+        await asyncio.sleep(settings.IMPORT_JOB_STALE_SECONDS)
+        try:
+            await reap_stale_jobs(db)
+        except Exception as e:
+            print(f"✗ Import job reaper failed: {e}")
+
+
+async def resume_pending_jobs(db):
+    """
+    Fail abandoned jobs and re-schedule queued ones after a start
+    
+    Queued jobs are claimed atomically by run_job, so a job scheduled by
+    several workers still runs once.
+    """
+    await reap_stale_jobs(db)
+    
+    async for job in db.import_jobs.find({"status": ImportJobStatus.QUEUED.value}, {"_id": 1}):
+        schedule_job(db, job["_id"])
@@ -0,0 +1,85 @@
+"""
+Keyset pagination for list endpoints
+Pages are ordered by (sort field, _id) descending and continue from an opaque
+cursor holding the last row's values, so every page is a bounded index range
+scan however deep the client has paged, unlike skip/limit.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+import base64
+import binascii
+
+from bson import json_util
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    """Opaque continuation token pointing just past `doc`"""
+    values = [doc.get(sort_field), doc["_id"]] if sort_field != "_id" else [doc["_id"]]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode a continuation token
+    
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json_util.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+    if not isinstance(values, list) or len(values) not in (1, 2):
+        raise ValueError("Invalid pagination cursor")
+    return values
+
+
+def keyset_filter(sort_field: str, cursor: str) -> Dict[str, Any]:
+    """Filter matching the rows that come after `cursor` in descending (sort_field, _id) order"""
+    values = decode_cursor(cursor)
+    if sort_field == "_id":
+        return {"_id": {"$lt": values[-1]}}
+    if len(values) != 2:
+        raise ValueError("Invalid pagination cursor")
+    
+    value, last_id = values
+    if value is None:
+        # Missing values sort last, so only the _id tie-break is left
+        return {sort_field: None, "_id": {"$lt": last_id}}
+    return {
+        "$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "_id": {"$lt": last_id}},
+            {sort_field: None}
+        ]
+    }
+
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    projection: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of `collection` in descending (sort_field, _id) order
+    
+    `offset` is kept for older clients and only applies when no cursor is given.
+    
+    Raises:
+        ValueError: If the cursor is malformed
+    
+    Returns: (documents, cursor for the next page or None on the last page)
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort_field, cursor)]}
+        offset = 0
+    
+    sort = [("_id", -1)] if sort_field == "_id" else [(sort_field, -1), ("_id", -1)]
+    docs = await collection.find(query, projection).sort(sort).skip(offset).limit(limit + 1).to_list(length=limit + 1)
+    
+    next_cursor = encode_cursor(docs[limit - 1], sort_field) if len(docs) > limit else None
+    return docs[:limit], next_cursor
@@ -0,0 +1,133 @@
+"""
+Response cache - tenant-scoped cache for read-heavy endpoints
+Entries are keyed by (company_id, endpoint, params) and tagged with the
+tenant's data version from the data_versions collection. Whatever changes
+tenant data bumps that version, which makes every worker's cached entries
+for the tenant stale at once; TTL and LRU eviction bound age and memory.
+"""
+from typing import Dict, Any, Tuple, Callable, Awaitable, Optional
+from collections import OrderedDict
+from datetime import datetime
+import asyncio
+import time
+
+from pymongo import ReturnDocument
+
+from app.config import settings
+
+
+# Version scope for data shared by all tenants, e.g. global dataset recommendations
+GLOBAL_SCOPE = "*"
+
+DataVersion = Tuple[int, int]
+
+
+async def get_data_version(db, company_id: str) -> DataVersion:
+    """Current (tenant, global) data version; (0, 0) before anything has changed"""
+    versions = {
+        row["_id"]: row.get("version", 0)
+        async for row in db.data_versions.find({"_id": {"$in": [company_id, GLOBAL_SCOPE]}})
+    }
+    return versions.get(company_id, 0), versions.get(GLOBAL_SCOPE, 0)
+
+
+async def bump_data_version(db, company_id: str = GLOBAL_SCOPE) -> int:
+    """
+    Record that a tenant's data changed (or shared data, for GLOBAL_SCOPE)
+    
+    Call after the write, so a request that recomputes concurrently cannot
+    cache pre-change data under the new version.
+    """
+    row = await db.data_versions.find_one_and_update(
+        {"_id": company_id},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return row["version"]
+
+
+class ResponseCache:
+    """In-process LRU of computed responses, validated against data versions"""
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Tuple[DataVersion, float, Any]]" = OrderedDict()
+        self._locks: Dict[Tuple, asyncio.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+    
+    def _lookup(self, key: Tuple, version: DataVersion) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        entry_version, expires_at, value = entry
+        if entry_version != version or expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stale += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+    
+    def _store(self, key: Tuple, version: DataVersion, value: Any, ttl_seconds: float):
+        self._entries[key] = (version, time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    async def get_or_compute(
+        self,
+        db,
+        company_id: str,
+        endpoint: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        ttl_seconds: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached response for (company_id, endpoint, params), computing it on a miss
+        
+        Concurrent misses for the same key share one computation.
+        """
+        key = (company_id, endpoint, tuple(sorted(params.items())))
+        version = await get_data_version(db, company_id)
+        found, value = self._lookup(key, version)
+        if found:
+            self.hits += 1
+            return value
+        
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                found, value = self._lookup(key, version)
+                if found:
+                    self.hits += 1
+                    return value
+                self.misses += 1
+                value = await compute()
+                self._store(key, version, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+                return value
+        finally:
+            if not lock.locked():
+                self._locks.pop(key, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this worker"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0
+        }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL_SECONDS)
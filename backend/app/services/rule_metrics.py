@@ -0,0 +1,283 @@
+"""
+Rule metrics service - live per-rule alert outcome counters
+Counters in the rule_metrics collection are maintained incrementally as
+violations are written, reviewed or deleted, so per-rule precision and
+alert yield are read in O(rules) without recomputing over violations.
+"""
+from typing import Dict, Any, List, Iterable
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from app.services.violation_fields import TRANSACTION_IDS_EXPR, extract_transaction_ids
+from app.services.counters import add_counter_delta, apply_counter_deltas, clamped_counts
+from app.services.response_cache import bump_data_version
+
+
+# Violation status -> counter field
+STATUS_FIELDS = {
+    "OPEN": "open_count",
+    "CONFIRMED": "confirmed_count",
+    "DISMISSED": "dismissed_count",
+    "FALSE_POSITIVE": "false_positive_count"
+}
+
+COUNTER_FIELDS = ["violation_count", *STATUS_FIELDS.values(), "labeled_count", "laundering_count"]
+
+WRITE_BATCH_SIZE = 1000
+
+
+def _status_field(status: str) -> str:
+    return STATUS_FIELDS.get(status or "OPEN", "open_count")
+
+
+def _label_counts(labels: List[Any]) -> Dict[str, int]:
+    """Counter increments for one violation given the is_laundering labels of its transactions"""
+    labels = [label for label in labels if isinstance(label, bool)]
+    return {"labeled_count": 1 if labels else 0, "laundering_count": 1 if any(labels) else 0}
+
+
+async def _violation_labels(db, company_id: str, violations: List[Dict[str, Any]]) -> List[List[Any]]:
+    """
+    Ground-truth labels for each violation
+    
+    A label captured in document_data is used directly; otherwise the
+    referenced transactions are looked up in one query.
+    """
+    pending = {}
+    for position, violation in enumerate(violations):
+        document_data = violation.get("document_data") or {}
+        if not isinstance(document_data.get("is_laundering"), bool):
+            pending[position] = extract_transaction_ids(document_data)
+    
+    labels_by_transaction = {}
+    transaction_ids = list({transaction_id for ids in pending.values() for transaction_id in ids})
+    if transaction_ids:
+        cursor = db.transactions.find(
+            {"company_id": company_id, "transaction_id": {"$in": transaction_ids}},
+            {"_id": 0, "transaction_id": 1, "is_laundering": 1}
+        )
+        async for transaction in cursor:
+            labels_by_transaction[transaction["transaction_id"]] = transaction.get("is_laundering")
+    
+    labels = []
+    for position, violation in enumerate(violations):
+        if position in pending:
+            labels.append([labels_by_transaction.get(transaction_id) for transaction_id in pending[position]])
+        else:
+            labels.append([violation["document_data"]["is_laundering"]])
+    return labels
+
+
+def _counter_update_pipeline(counts: Dict[str, int], delta: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+    """Update pipeline applying counter deltas and refreshing the rule name when known"""
+    apply_counts = clamped_counts(counts)
+    apply_counts["updated_at"] = now
+    if delta.get("rule_name"):
+        apply_counts["rule_name"] = delta["rule_name"]
+    return [{"$set": apply_counts}]
+
+
+async def _apply_deltas(db, company_id: str, deltas: Dict[str, Dict[str, Any]]):
+    await apply_counter_deltas(db.rule_metrics, company_id, ["rule_id"], deltas, _counter_update_pipeline)
+
+
+def _add_delta(deltas: Dict[str, Dict[str, Any]], rule_id: str, counts: Dict[str, int], sign: int, rule_name=None):
+    """Accumulate counter deltas for one rule"""
+    delta = add_counter_delta(deltas, rule_id, counts, sign)
+    if rule_name:
+        delta["rule_name"] = rule_name
+
+
+async def apply_violation_changes(
+    db,
+    company_id: str,
+    violations: Iterable[Dict[str, Any]],
+    sign: int = 1
+):
+    """Add (sign=1) or remove (sign=-1) violations from the rule counters"""
+    violations = [violation for violation in violations if violation.get("rule_id")]
+    if not violations:
+        return
+    labels = await _violation_labels(db, company_id, violations)
+    
+    deltas: Dict[str, Dict[str, Any]] = {}
+    for violation, violation_labels in zip(violations, labels):
+        counts = {"violation_count": 1, _status_field(violation.get("status")): 1, **_label_counts(violation_labels)}
+        _add_delta(deltas, str(violation["rule_id"]), counts, sign, violation.get("rule_name"))
+    await _apply_deltas(db, company_id, deltas)
+
+
+async def record_status_change(db, company_id: str, violation: Dict[str, Any], new_status: str):
+    """Move a violation between status counters"""
+    old_field = _status_field(violation.get("status"))
+    new_field = _status_field(new_status)
+    if old_field == new_field or not violation.get("rule_id"):
+        return
+    deltas: Dict[str, Dict[str, Any]] = {}
+    _add_delta(deltas, str(violation["rule_id"]), {old_field: -1, new_field: 1}, 1)
+    await _apply_deltas(db, company_id, deltas)
+
+
+async def record_status_changes_matching(db, company_id: str, query: Dict[str, Any], new_status: str):
+    """
+    Move the violations matching `query` to the `new_status` counter
+    
+    Must be called before the violations are updated.
+    """
+    new_field = _status_field(new_status)
+    pipeline = [
+        {"$match": {"$and": [query, {"company_id": company_id, "rule_id": {"$ne": None}}]}},
+        {"$group": {
+            "_id": {"rule_id": "$rule_id", "status": {"$ifNull": ["$status", "OPEN"]}},
+            "count": {"$sum": 1}
+        }}
+    ]
+    
+    deltas: Dict[str, Dict[str, Any]] = {}
+    async for row in db.violations.aggregate(pipeline, allowDiskUse=True):
+        old_field = _status_field(row["_id"]["status"])
+        if old_field != new_field:
+            _add_delta(deltas, str(row["_id"]["rule_id"]), {old_field: -row["count"], new_field: row["count"]}, 1)
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
+
+
+def _grouped_counts_pipeline(company_id: str, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Aggregate counter values per rule for the violations matching `query`,
+    labelling each violation the same way as _violation_labels
+    """
+    status_counts = {
+        field: {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$status", "OPEN"]}, status]}, 1, 0]}}
+        for status, field in STATUS_FIELDS.items()
+    }
+    return [
+        {"$match": {"$and": [query, {"company_id": company_id, "rule_id": {"$ne": None}}]}},
+        {
+            "$project": {
+                "rule_id": 1,
+                "rule_name": 1,
+                "status": 1,
+                "document_label": "$document_data.is_laundering",
+                "transaction_ids": {
+                    "$cond": [
+                        {"$eq": [{"$type": "$document_data.is_laundering"}, "bool"]},
+                        [],
+                        TRANSACTION_IDS_EXPR
+                    ]
+                }
+            }
+        },
+        {
+            "$lookup": {
+                "from": "transactions",
+                "localField": "transaction_ids",
+                "foreignField": "transaction_id",
+                "pipeline": [
+                    {"$match": {"company_id": company_id}},
+                    {"$project": {"_id": 0, "is_laundering": 1}}
+                ],
+                "as": "transactions"
+            }
+        },
+        {
+            "$set": {
+                "labels": {
+                    "$filter": {
+                        "input": {"$concatArrays": [["$document_label"], "$transactions.is_laundering"]},
+                        "cond": {"$eq": [{"$type": "$$this"}, "bool"]}
+                    }
+                }
+            }
+        },
+        {
+            "$group": {
+                "_id": "$rule_id",
+                "rule_name": {"$last": "$rule_name"},
+                "violation_count": {"$sum": 1},
+                **status_counts,
+                "labeled_count": {"$sum": {"$cond": [{"$gt": [{"$size": "$labels"}, 0]}, 1, 0]}},
+                "laundering_count": {"$sum": {"$cond": [{"$in": [True, "$labels"]}, 1, 0]}}
+            }
+        }
+    ]
+
+
+async def remove_violations_matching(db, company_id: str, query: Dict[str, Any]):
+    """
+    Remove the violations matching `query` from the rule counters
+    
+    Must be called before the violations are deleted.
+    """
+    deltas: Dict[str, Dict[str, Any]] = {}
+    async for row in db.violations.aggregate(_grouped_counts_pipeline(company_id, query), allowDiskUse=True):
+        counts = {field: row.get(field, 0) for field in COUNTER_FIELDS}
+        _add_delta(deltas, str(row["_id"]), counts, -1)
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
+
+
+async def rebuild_rule_metrics(db, company_id: str) -> int:
+    """
+    Recompute the rule_metrics counters for a company from its violations
+    
+    Run after ground-truth labels change, and to repair any drift.
+    
+    Returns: Number of rules with counters
+    """
+    run_started = datetime.utcnow()
+    operations = []
+    rules = 0
+    async for row in db.violations.aggregate(_grouped_counts_pipeline(company_id, {}), allowDiskUse=True):
+        operations.append(UpdateOne(
+            {"company_id": company_id, "rule_id": str(row["_id"])},
+            {"$set": {
+                "rule_name": row.get("rule_name"),
+                **{field: row.get(field, 0) for field in COUNTER_FIELDS},
+                "updated_at": run_started
+            }},
+            upsert=True
+        ))
+        rules += 1
+        if len(operations) >= WRITE_BATCH_SIZE:
+            await db.rule_metrics.bulk_write(operations, ordered=False)
+            operations = []
+    
+    if operations:
+        await db.rule_metrics.bulk_write(operations, ordered=False)
+    
+    # Drop rules that no longer have violations
+    await db.rule_metrics.delete_many({"company_id": company_id, "updated_at": {"$lt": run_started}})
+    await bump_data_version(db, company_id)
+    return rules
+
+
+def _ratio(numerator: int, denominator: int) -> float:
+    return round(numerator / denominator, 4) if denominator else 0
+
+
+async def get_rule_metrics(db, company_id: str) -> List[Dict[str, Any]]:
+    """
+    Live per-rule metrics from the maintained counters
+    
+    precision is confirmed / reviewed (CONFIRMED, DISMISSED or FALSE_POSITIVE);
+    alert_yield is confirmed / all violations; label_precision is the share
+    of labelled violations whose transactions are laundering.
+    """
+    metrics = []
+    async for row in db.rule_metrics.find({"company_id": company_id}, {"_id": 0}):
+        counts = {field: row.get(field, 0) for field in COUNTER_FIELDS}
+        reviewed = counts["confirmed_count"] + counts["dismissed_count"] + counts["false_positive_count"]
+        metrics.append({
+            "rule_id": row["rule_id"],
+            "rule_name": row.get("rule_name"),
+            **counts,
+            "reviewed_count": reviewed,
+            "precision": _ratio(counts["confirmed_count"], reviewed),
+            "alert_yield": _ratio(counts["confirmed_count"], counts["violation_count"]),
+            "label_precision": _ratio(counts["laundering_count"], counts["labeled_count"]),
+            "updated_at": row.get("updated_at")
+        })
+    metrics.sort(key=lambda entry: -entry["violation_count"])
+    return metrics
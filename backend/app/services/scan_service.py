@@ -7,12 +7,16 @@ from datetime import datetime
 import time
 from bson import ObjectId
 
+from app.config import settings
 from app.db import get_database
 from app.models.scan import ScanStatus, ScanSummary, RuleScanResult
 from app.services.advanced_rules import (
     AdvancedRuleEngine,
     create_violations_from_pattern
 )
+from app.services.violation_events import violations_created, scan_completed
+from app.services.violation_fields import extract_account_ids, rule_fields
+from app.services.auto_case import auto_case_violations
 
 
 async def run_scan(
@@ -27,7 +31,7 @@ async def run_scan(
         company_id: Company ID for multi-tenant isolation
         collections: Optional list of collection names to scan
         rule_ids: Optional list of specific rule IDs to execute
-        
+    
     Returns:
         ScanSummary with execution results
     """
@@ -61,6 +65,7 @@ async def run_scan(
             "rule_results": []
         }
         result = await db.scan_runs.insert_one(scan_run_doc)
+        await scan_completed(db, company_id)
         
         return ScanSummary(
             scan_run_id=str(result.inserted_id),
@@ -121,7 +126,7 @@ async def run_scan(
                 execution_time_ms=(time.time() - rule_start) * 1000
             )
             rule_results.append(rule_result)
-            
+        
         except Exception as e:
             # Log error but continue with other rules
             print(f"Error executing rule {rule_id}: {str(e)}")
@@ -147,6 +152,24 @@ async def run_scan(
             }
         }
     )
+    await scan_completed(db, company_id)
+    
+    # Group the new (and any still un-cased) open violations into cases
+    auto_cases = {"cases_created": 0, "cases_extended": 0}
+    if settings.AUTO_CASE_AFTER_SCAN and total_violations:
+        try:
+            auto_cases = await auto_case_violations(
+                db,
+                company_id,
+                window_days=settings.AUTO_CASE_WINDOW_DAYS or None,
+                by_typology=settings.AUTO_CASE_BY_TYPOLOGY,
+                min_violations=settings.AUTO_CASE_MIN_VIOLATIONS
+            )
+            print(f"Auto-casing: {auto_cases['cases_created']} cases created, "
+                  f"{auto_cases['cases_extended']} extended, {auto_cases['violations_linked']} violations linked")
+        except Exception as e:
+            # The scan itself succeeded; cases can be built later via POST /cases/auto
+            print(f"Error during auto-casing: {str(e)}")
     
     execution_time = time.time() - scan_start_time
     
@@ -156,7 +179,9 @@ async def run_scan(
         total_rules_executed=len(rules),
         total_violations_found=total_violations,
         execution_time_seconds=round(execution_time, 2),
-        rule_results=rule_results
+        rule_results=rule_results,
+        cases_created=auto_cases["cases_created"],
+        cases_extended=auto_cases["cases_extended"]
     )
 
 
@@ -172,7 +197,7 @@ async def execute_rule(
         db: Database instance
         rule: Rule document
         scan_run_id: ID of the current scan run
-        
+    
     Returns:
         List of violation documents created
     """
@@ -200,14 +225,17 @@ async def execute_rule(
     now = datetime.utcnow()
     
     for doc in matching_docs:
+        document_data = sanitize_document(doc)
         violation_doc = {
             "company_id": rule["company_id"],
             "scan_run_id": scan_run_id,
             "rule_id": str(rule["_id"]),
             "rule_name": rule["name"],
+            **rule_fields(rule),
             "collection": collection_name,
             "document_id": str(doc.get("_id", "unknown")),
-            "document_data": sanitize_document(doc),
+            "document_data": document_data,
+            "account_ids": extract_account_ids(document_data),
             "severity": rule["severity"],
             "status": "OPEN",
             "reviewer_note": None,
@@ -220,6 +248,8 @@ async def execute_rule(
         violation_doc["_id"] = str(result.inserted_id)
         violations.append(violation_doc)
     
+    await violations_created(db, rule["company_id"], violations)
+    
     return violations
 
 
@@ -0,0 +1,168 @@
+"""
+Upload stream helpers
+Size limits and transparent gzip/zstd decompression for imports, so
+compressed uploads are decoded incrementally and never held in memory
+"""
+from typing import Optional, Tuple, BinaryIO, Dict
+import gzip
+import io
+import zlib
+
+import zstandard
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+READ_BUFFER_SIZE = 1024 * 1024
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Raised while reading a corrupt or truncated compressed stream
+DECOMPRESSION_ERRORS = (gzip.BadGzipFile, EOFError, zlib.error, zstandard.ZstdError)
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload exceeds its size limit while being read"""
+    pass
+
+
+class LimitedReader(io.RawIOBase):
+    """Read-only wrapper that fails as soon as more than `limit` bytes have been read"""
+    
+    def __init__(self, raw: BinaryIO, limit: int, description: str = "File"):
+        self.raw = raw
+        self.limit = limit
+        self.description = description
+        self.bytes_read = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self.raw.read(len(buffer))
+        size = len(data)
+        self.bytes_read += size
+        if self.bytes_read > self.limit:
+            raise UploadTooLarge(f"{self.description} exceeds the {self.limit} byte limit")
+        buffer[:size] = data
+        return size
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware rejecting oversized request bodies before they are spooled
+    
+    `limits` maps path prefixes to byte limits; the longest matching prefix
+    applies and other paths are not limited. A declared Content-Length over
+    the limit is refused without reading the body, and streamed bodies are
+    counted chunk by chunk, so a multipart upload is never spooled to disk in
+    full before its size is checked.
+    """
+    
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+    
+    def _limit_for(self, path: str) -> Optional[int]:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return None
+    
+    async def __call__(self, scope, receive, send):
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"Upload exceeds the {limit} byte limit"
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit + MULTIPART_OVERHEAD:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit + MULTIPART_OVERHEAD:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+
+def strip_compression_suffix(filename: str) -> Tuple[str, Optional[str]]:
+    """Split "data.csv.gz" into ("data.csv", "gzip")"""
+    lowered = filename.lower()
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if lowered.endswith(suffix):
+            return filename[:-len(suffix)], compression
+    return filename, None
+
+
+def detect_compression(binary_file: BinaryIO) -> Optional[str]:
+    """Detect gzip or zstd from the magic bytes of a seekable file"""
+    position = binary_file.tell()
+    head = binary_file.read(4)
+    binary_file.seek(position)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def open_upload(
+    binary_file: BinaryIO,
+    filename: str,
+    max_size: int,
+    max_decompressed_size: int
+) -> Tuple[BinaryIO, str, Optional[str]]:
+    """
+    Check an upload's size and wrap it in a decompressing reader if needed
+    
+    Compression is detected from the file's magic bytes; a .gz/.zst suffix is
+    stripped from the filename so the inner format can be recognised.
+    Uncompressed files are returned as-is so they stay seekable. The size
+    check here is exact; RequestSizeLimitMiddleware stops oversized bodies
+    before they are spooled.
+    
+    Args:
+        binary_file: Seekable binary file positioned at the start of the upload
+        filename: Original filename
+        max_size: Limit on the size of the upload as sent
+        max_decompressed_size: Limit on the bytes produced by decompression,
+            enforced while the stream is read
+    
+    Returns:
+        (readable binary stream, filename without compression suffix, compression or None)
+    
+    Raises:
+        UploadTooLarge: If the upload exceeds max_size
+    """
+    position = binary_file.tell()
+    size = binary_file.seek(0, io.SEEK_END) - position
+    binary_file.seek(position)
+    if size > max_size:
+        raise UploadTooLarge(f"Upload exceeds the {max_size} byte limit")
+    
+    inner_filename, _ = strip_compression_suffix(filename)
+    compression = detect_compression(binary_file)
+    if compression is None:
+        return binary_file, inner_filename, None
+    
+    if compression == "gzip":
+        stream = gzip.GzipFile(fileobj=binary_file, mode="rb")
+    else:
+        stream = zstandard.ZstdDecompressor().stream_reader(binary_file, read_across_frames=True)
+    
+    stream = LimitedReader(stream, max_decompressed_size, "Decompressed upload")
+    return io.BufferedReader(stream, READ_BUFFER_SIZE), inner_filename, compression
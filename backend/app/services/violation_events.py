@@ -0,0 +1,69 @@
+"""
+Violation event hooks
+Keeps materialized rollups and cached summaries in sync when violations are
+written, change status or are deleted, and when scans complete
+"""
+from typing import List, Dict, Any
+
+from app.services import account_risk, rule_metrics, violation_stats, comment_service
+from app.services.response_cache import bump_data_version
+
+
+async def violations_created(db, company_id: str, violations: List[Dict[str, Any]]):
+    """Call after violations have been inserted"""
+    if not violations:
+        return
+    await account_risk.apply_violation_changes(db, company_id, violations, sign=1)
+    await rule_metrics.apply_violation_changes(db, company_id, violations, sign=1)
+    await violation_stats.apply_violation_changes(db, company_id, violations, sign=1)
+    await bump_data_version(db, company_id)
+
+
+async def violation_status_changed(db, company_id: str, violation: Dict[str, Any], new_status: str):
+    """
+    Call after a violation's status or review fields have been updated
+    
+    Args:
+        violation: The violation as it was before the update
+        new_status: The status it was updated to
+    """
+    if violation.get("status") != new_status:
+        await account_risk.record_status_change(db, company_id, violation, new_status)
+        await rule_metrics.record_status_change(db, company_id, violation, new_status)
+        await violation_stats.record_status_change(db, company_id, violation, new_status)
+    await bump_data_version(db, company_id)
+
+
+async def violations_status_changing(db, company_id: str, query: Dict[str, Any], new_status: str):
+    """
+    Call before setting `new_status` on every violation matching `query`
+    
+    Rollups are adjusted once for the whole batch; call violations_updated
+    after the update.
+    """
+    await account_risk.record_status_changes_matching(db, company_id, query, new_status)
+    await rule_metrics.record_status_changes_matching(db, company_id, query, new_status)
+    await violation_stats.record_status_changes_matching(db, company_id, query, new_status)
+
+
+async def violations_deleting(db, company_id: str, query: Dict[str, Any]):
+    """Call before deleting the violations matching `query`; call violations_deleted afterwards"""
+    await account_risk.remove_violations_matching(db, company_id, query)
+    await rule_metrics.remove_violations_matching(db, company_id, query)
+    await violation_stats.remove_violations_matching(db, company_id, query)
+    await comment_service.remove_comments_matching(db, company_id, comment_service.VIOLATION, query)
+
+
+async def violations_updated(db, company_id: str):
+    """Call after a batch update of violations"""
+    await bump_data_version(db, company_id)
+
+
+async def violations_deleted(db, company_id: str):
+    """Call after violations have been deleted"""
+    await bump_data_version(db, company_id)
+
+
+async def scan_completed(db, company_id: str):
+    """Call after a scan run has been marked completed"""
+    await bump_data_version(db, company_id)
@@ -0,0 +1,89 @@
+"""
+Normalized fields stamped onto violation documents at write time
+Keeps lookups on violations index-backed instead of digging into document_data
+"""
+from typing import Dict, Any, List, Optional
+
+
+# document_data fields that reference accounts, in attribution order
+ACCOUNT_FIELDS = ["account_id", "src_account", "dst_account"]
+
+# Server-side equivalent of extract_account_ids, for migrations and pipeline updates
+ACCOUNT_IDS_EXPR = {
+    "$reduce": {
+        "input": [f"$document_data.{field}" for field in ACCOUNT_FIELDS],
+        "initialValue": [],
+        "in": {
+            "$cond": [
+                {"$or": [
+                    {"$eq": [{"$ifNull": ["$$this", None]}, None]},
+                    {"$in": [{"$toString": "$$this"}, "$$value"]}
+                ]},
+                "$$value",
+                {"$concatArrays": ["$$value", [{"$toString": "$$this"}]]}
+            ]
+        }
+    }
+}
+
+# Rule classification copied onto violations so framework/control filters
+# read violation indexes instead of resolving rule IDs first
+RULE_FIELDS = ["framework", "control_id"]
+
+# Primary account of a violation (first entry of account_ids)
+PRIMARY_ACCOUNT_EXPR = {"$arrayElemAt": ["$account_ids", 0]}
+
+# Transaction IDs a violation points at: the flagged transaction itself, or
+# every transaction listed by a pattern (advanced rule) violation
+TRANSACTION_IDS_EXPR = {
+    "$setUnion": [
+        {
+            "$cond": [
+                {"$ifNull": ["$document_data.transaction_id", False]},
+                ["$document_data.transaction_id"],
+                []
+            ]
+        },
+        {"$ifNull": ["$document_data.transactions.transaction_id", []]}
+    ]
+}
+
+
+def extract_account_ids(document_data: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Accounts referenced by a violating document, primary account first
+    """
+    account_ids: List[str] = []
+    for field in ACCOUNT_FIELDS:
+        value = (document_data or {}).get(field)
+        if value is None:
+            continue
+        value = str(value)
+        if value not in account_ids:
+            account_ids.append(value)
+    return account_ids
+
+
+def rule_fields(rule: Optional[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """Rule fields stamped onto the rule's violations"""
+    return {field: (rule or {}).get(field) for field in RULE_FIELDS}
+
+
+def primary_account_id(violation: Dict[str, Any]) -> Optional[str]:
+    """Account a violation is attributed to"""
+    account_ids = violation.get("account_ids")
+    if account_ids is None:
+        account_ids = extract_account_ids(violation.get("document_data"))
+    return account_ids[0] if account_ids else None
+
+
+def extract_transaction_ids(document_data: Optional[Dict[str, Any]]) -> List[str]:
+    """Python equivalent of TRANSACTION_IDS_EXPR"""
+    document_data = document_data or {}
+    transaction_ids = []
+    if document_data.get("transaction_id"):
+        transaction_ids.append(document_data["transaction_id"])
+    for transaction in document_data.get("transactions") or []:
+        if isinstance(transaction, dict) and transaction.get("transaction_id") is not None:
+            transaction_ids.append(transaction["transaction_id"])
+    return list(dict.fromkeys(transaction_ids))
@@ -0,0 +1,173 @@
+"""
+Violation daily stats service - per-day violation rollups
+The violation_daily_stats collection holds one row per (company, day,
+severity, rule) with total and per-status counts, maintained incrementally
+as violations are written, reviewed or deleted, so trend queries over any
+range read a few rows per day instead of regrouping violations.
+"""
+from typing import Dict, Any, List, Iterable, Tuple
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+
+from app.services.rule_metrics import STATUS_FIELDS
+from app.services.counters import add_counter_delta, apply_counter_deltas
+from app.services.response_cache import bump_data_version
+
+
+SEVERITIES = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+DAY_FORMAT = "%Y-%m-%d"
+COUNTER_FIELDS = ["count", *STATUS_FIELDS.values()]
+
+WRITE_BATCH_SIZE = 1000
+
+
+def _status_field(status: str) -> str:
+    return STATUS_FIELDS.get(status or "OPEN", "open_count")
+
+
+def _key(violation: Dict[str, Any]) -> Tuple[str, str, str]:
+    """(day, severity, rule_id) a violation is rolled up under"""
+    created_at = violation.get("created_at") or datetime.utcnow()
+    return created_at.strftime(DAY_FORMAT), violation.get("severity") or "", str(violation.get("rule_id") or "")
+
+
+async def _apply_deltas(db, company_id: str, deltas: Dict[Tuple[str, str, str], Dict[str, Any]]):
+    await apply_counter_deltas(db.violation_daily_stats, company_id, ["day", "severity", "rule_id"], deltas)
+
+
+async def apply_violation_changes(
+    db,
+    company_id: str,
+    violations: Iterable[Dict[str, Any]],
+    sign: int = 1
+):
+    """Add (sign=1) or remove (sign=-1) violations from the daily rollups"""
+    deltas: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for violation in violations:
+        add_counter_delta(deltas, _key(violation), {"count": sign, _status_field(violation.get("status")): sign})
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
+
+
+async def record_status_change(db, company_id: str, violation: Dict[str, Any], new_status: str):
+    """Move a violation between status counters on its day"""
+    old_field = _status_field(violation.get("status"))
+    new_field = _status_field(new_status)
+    if old_field == new_field:
+        return
+    await _apply_deltas(db, company_id, {_key(violation): {"counts": {old_field: -1, new_field: 1}}})
+
+
+# Server-side equivalent of _key
+KEY_EXPR = {
+    "day": {"$dateToString": {"format": DAY_FORMAT, "date": {"$ifNull": ["$created_at", "$$NOW"]}}},
+    "severity": {"$ifNull": ["$severity", ""]},
+    "rule_id": {"$ifNull": [{"$toString": "$rule_id"}, ""]}
+}
+
+
+def _grouped_counts_pipeline(company_id: str, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Aggregate rollup counters for the violations matching `query`"""
+    status_counts = {
+        field: {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$status", "OPEN"]}, status]}, 1, 0]}}
+        for status, field in STATUS_FIELDS.items()
+    }
+    return [
+        {"$match": {"$and": [query, {"company_id": company_id}]}},
+        {
+            "$group": {
+                "_id": KEY_EXPR,
+                "count": {"$sum": 1},
+                **status_counts
+            }
+        }
+    ]
+
+
+async def record_status_changes_matching(db, company_id: str, query: Dict[str, Any], new_status: str):
+    """
+    Move the violations matching `query` to the `new_status` counter on their days
+    
+    Must be called before the violations are updated.
+    """
+    new_field = _status_field(new_status)
+    pipeline = [
+        {"$match": {"$and": [query, {"company_id": company_id}]}},
+        {"$group": {"_id": {**KEY_EXPR, "status": {"$ifNull": ["$status", "OPEN"]}}, "count": {"$sum": 1}}}
+    ]
+    
+    deltas: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    async for row in db.violations.aggregate(pipeline, allowDiskUse=True):
+        old_field = _status_field(row["_id"]["status"])
+        if old_field != new_field:
+            key = (row["_id"]["day"], row["_id"]["severity"], row["_id"]["rule_id"])
+            add_counter_delta(deltas, key, {old_field: -row["count"], new_field: row["count"]})
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
+
+
+async def remove_violations_matching(db, company_id: str, query: Dict[str, Any]):
+    """
+    Remove the violations matching `query` from the daily rollups
+    
+    Must be called before the violations are deleted.
+    """
+    deltas: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    async for row in db.violations.aggregate(_grouped_counts_pipeline(company_id, query), allowDiskUse=True):
+        key = (row["_id"]["day"], row["_id"]["severity"], row["_id"]["rule_id"])
+        add_counter_delta(deltas, key, {field: -row.get(field, 0) for field in COUNTER_FIELDS})
+    if deltas:
+        await _apply_deltas(db, company_id, deltas)
+
+
+async def rebuild_violation_daily_stats(db, company_id: str) -> int:
+    """
+    Recompute a company's daily rollups from its violations
+    
+    Used to backfill existing data and to repair any drift.
+    
+    Returns: Number of rollup rows written
+    """
+    run_started = datetime.utcnow()
+    operations = []
+    rows = 0
+    async for row in db.violations.aggregate(_grouped_counts_pipeline(company_id, {}), allowDiskUse=True):
+        operations.append(UpdateOne(
+            {"company_id": company_id, **row["_id"]},
+            {"$set": {**{field: row.get(field, 0) for field in COUNTER_FIELDS}, "updated_at": run_started}},
+            upsert=True
+        ))
+        rows += 1
+        if len(operations) >= WRITE_BATCH_SIZE:
+            await db.violation_daily_stats.bulk_write(operations, ordered=False)
+            operations = []
+    
+    if operations:
+        await db.violation_daily_stats.bulk_write(operations, ordered=False)
+    
+    await db.violation_daily_stats.delete_many({"company_id": company_id, "updated_at": {"$lt": run_started}})
+    await bump_data_version(db, company_id)
+    return rows
+
+
+async def get_violation_trends(db, company_id: str, days: int) -> List[Dict[str, Any]]:
+    """
+    Daily violation counts by severity for the last `days` days
+    
+    Returns: One entry per day with violations, oldest first
+    """
+    start_day = (datetime.utcnow() - timedelta(days=days)).strftime(DAY_FORMAT)
+    pipeline = [
+        {"$match": {"company_id": company_id, "day": {"$gte": start_day}, "count": {"$gt": 0}}},
+        {"$group": {"_id": {"day": "$day", "severity": "$severity"}, "count": {"$sum": "$count"}}},
+        {"$sort": {"_id.day": 1}}
+    ]
+    
+    trends: Dict[str, Dict[str, Any]] = {}
+    async for row in db.violation_daily_stats.aggregate(pipeline):
+        day = row["_id"]["day"]
+        if day not in trends:
+            trends[day] = {"date": day, **{severity: 0 for severity in SEVERITIES}}
+        trends[day][row["_id"]["severity"]] = row["count"]
+    return list(trends.values())
@@ -4,89 +4,85 @@ Simulates laundering labels from IBM AML dataset for validation
 """
 import asyncio
 import sys
-import random
 from pathlib import Path
-from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import settings
+from app.services.detection_metrics import refresh_detection_metrics
+from app.services.rule_metrics import rebuild_rule_metrics
+
+
+def _label(is_laundering, laundering_type=None, confidence=0.0):
+    return {"is_laundering": is_laundering, "laundering_type": laundering_type, "confidence": confidence}
+
+
+def _sometimes(probability, label):
+    """Apply a laundering label to roughly `probability` of matching transactions"""
+    return {"$cond": [{"$lt": [{"$rand": {}}, probability]}, label, _label(False)]}
+
+
+# First matching branch wins, as in an if/elif chain
+LABEL_BRANCHES = [
+    # High-value cash transactions
+    ({"$and": [{"$gte": ["$amount", 10000]}, {"$eq": ["$transaction_type", "CASH"]}]},
+     _label(True, "placement", 0.85)),
+    # Structuring pattern (near threshold)
+    ({"$and": [{"$gte": ["$amount", 9000]}, {"$lt": ["$amount", 10000]}, {"$eq": ["$transaction_type", "CASH"]}]},
+     _label(True, "structuring", 0.92)),
+    # Large wire transfers: 50% chance
+    ({"$and": [{"$gte": ["$amount", 10000]}, {"$eq": ["$transaction_type", "WIRE"]}]},
+     _sometimes(0.5, _label(True, "layering", 0.65))),
+    # Round amounts (potential layering): 33% chance
+    ({"$and": [{"$gte": ["$amount", 5000]}, {"$eq": [{"$mod": ["$amount", 1000]}, 0]}]},
+     _sometimes(1 / 3, _label(True, "layering", 0.55)))
+]
 
 
 async def add_laundering_labels(db, company_id):
     """
     Add simulated laundering labels to transactions
     Based on IBM AML dataset structure
+    
+    Labels are computed server-side in a single pipeline update. Transactions
+    carrying real labels from a loaded dataset (is_laundering without
+    labeled_at, e.g. from import_aml_data.py --file) are left untouched.
     """
     print("\n1. Adding laundering labels to transactions...")
     
-    # Get all transactions
-    transactions = await db.transactions.find({"company_id": company_id}).to_list(length=None)
-    
-    if not transactions:
-        print("  ! No transactions found")
-        return
-    
-    # Label transactions based on patterns
-    labeled_count = 0
-    laundering_count = 0
-    
-    for txn in transactions:
-        # Determine if transaction should be labeled as laundering
-        is_laundering = False
-        laundering_type = None
-        confidence = 0.0
-        
-        amount = txn.get("amount", 0)
-        txn_type = txn.get("transaction_type", "")
-        
-        # High-value cash transactions
-        if amount >= 10000 and txn_type == "CASH":
-            is_laundering = True
-            laundering_type = "placement"
-            confidence = 0.85
-        
-        # Structuring pattern (near threshold)
-        elif 9000 <= amount < 10000 and txn_type == "CASH":
-            is_laundering = True
-            laundering_type = "structuring"
-            confidence = 0.92
-        
-        # Large wire transfers
-        elif amount >= 10000 and txn_type == "WIRE":
-            is_laundering = random.choice([True, False])  # 50% chance
-            laundering_type = "layering" if is_laundering else None
-            confidence = 0.65 if is_laundering else 0.0
-        
-        # Round amounts (potential layering)
-        elif amount % 1000 == 0 and amount >= 5000:
-            is_laundering = random.choice([True, False, False])  # 33% chance
-            laundering_type = "layering" if is_laundering else None
-            confidence = 0.55 if is_laundering else 0.0
-        
-        # Normal transactions
-        else:
-            is_laundering = False
-            laundering_type = None
-            confidence = 0.0
-        
-        # Update transaction with label
-        await db.transactions.update_one(
-            {"_id": txn["_id"]},
-            {
-                "$set": {
-                    "is_laundering": is_laundering,
-                    "laundering_type": laundering_type,
-                    "laundering_confidence": confidence,
-                    "labeled_at": datetime.utcnow()
+    label_filter = {
+        "company_id": company_id,
+        "$or": [{"is_laundering": {"$exists": False}}, {"labeled_at": {"$exists": True}}]
+    }
+    pipeline = [
+        {
+            "$set": {
+                "_label": {
+                    "$switch": {
+                        "branches": [{"case": case, "then": label} for case, label in LABEL_BRANCHES],
+                        "default": _label(False)
+                    }
                 }
             }
-        )
-        
-        labeled_count += 1
-        if is_laundering:
-            laundering_count += 1
+        },
+        {
+            "$set": {
+                "is_laundering": "$_label.is_laundering",
+                "laundering_type": "$_label.laundering_type",
+                "laundering_confidence": "$_label.confidence",
+                "labeled_at": "$$NOW"
+            }
+        },
+        {"$unset": "_label"}
+    ]
+    result = await db.transactions.update_many(label_filter, pipeline)
+    
+    labeled_count = result.matched_count
+    if not labeled_count:
+        print("  ! No transactions to label")
+        return
+    laundering_count = await db.transactions.count_documents({**label_filter, "is_laundering": True})
     
     print(f"✓ Labeled {labeled_count} transactions")
     print(f"  - Laundering: {laundering_count} ({laundering_count/labeled_count*100:.1f}%)")
@@ -101,81 +97,26 @@ async def calculate_detection_accuracy(db, company_id):
     """
     print("\n2. Calculating detection accuracy...")
     
-    # Get all violations
-    violations = await db.violations.find({"company_id": company_id}).to_list(length=None)
-    
-    if not violations:
-        print("  ! No violations found")
-        return
-    
-    # Extract transaction IDs from violations
-    detected_txn_ids = set()
-    for violation in violations:
-        doc_data = violation.get("document_data", {})
-        txn_id = doc_data.get("transaction_id")
-        if txn_id:
-            detected_txn_ids.add(txn_id)
-    
-    # Get all labeled transactions
-    all_txns = await db.transactions.find({"company_id": company_id}).to_list(length=None)
-    
-    # Calculate metrics
-    true_positives = 0  # Correctly detected laundering
-    false_positives = 0  # Incorrectly flagged as laundering
-    true_negatives = 0  # Correctly identified as normal
-    false_negatives = 0  # Missed laundering
-    
-    for txn in all_txns:
-        txn_id = txn.get("transaction_id")
-        is_laundering = txn.get("is_laundering", False)
-        is_detected = txn_id in detected_txn_ids
-        
-        if is_laundering and is_detected:
-            true_positives += 1
-        elif is_laundering and not is_detected:
-            false_negatives += 1
-        elif not is_laundering and is_detected:
-            false_positives += 1
-        elif not is_laundering and not is_detected:
-            true_negatives += 1
-    
-    # Calculate metrics
-    total = len(all_txns)
-    accuracy = (true_positives + true_negatives) / total if total > 0 else 0
-    precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-    recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-    f1_score = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-    
-    # Store metrics
-    metrics_doc = {
-        "company_id": company_id,
-        "calculated_at": datetime.utcnow(),
-        "total_transactions": total,
-        "true_positives": true_positives,
-        "false_positives": false_positives,
-        "true_negatives": true_negatives,
-        "false_negatives": false_negatives,
-        "accuracy": round(accuracy, 4),
-        "precision": round(precision, 4),
-        "recall": round(recall, 4),
-        "f1_score": round(f1_score, 4),
-        "detection_rate": round(true_positives / (true_positives + false_negatives), 4) if (true_positives + false_negatives) > 0 else 0
-    }
-    
-    # Clear old metrics and insert new
-    await db.detection_metrics.delete_many({"company_id": company_id})
-    await db.detection_metrics.insert_one(metrics_doc)
+    metrics_doc = await refresh_detection_metrics(db, company_id)
+    if not metrics_doc["flagged_transactions"]:
+        print("  ! No violations reference labelled transactions")
     
     print(f"✓ Detection Accuracy Metrics:")
-    print(f"  - Accuracy:  {accuracy*100:.2f}%")
-    print(f"  - Precision: {precision*100:.2f}%")
-    print(f"  - Recall:    {recall*100:.2f}%")
-    print(f"  - F1 Score:  {f1_score:.4f}")
+    print(f"  - Accuracy:  {metrics_doc['accuracy']*100:.2f}%")
+    print(f"  - Precision: {metrics_doc['precision']*100:.2f}%")
+    print(f"  - Recall:    {metrics_doc['recall']*100:.2f}%")
+    print(f"  - F1 Score:  {metrics_doc['f1_score']:.4f}")
     print(f"\n  Confusion Matrix:")
-    print(f"  - True Positives:  {true_positives}")
-    print(f"  - False Positives: {false_positives}")
-    print(f"  - True Negatives:  {true_negatives}")
-    print(f"  - False Negatives: {false_negatives}")
+    print(f"  - True Positives:  {metrics_doc['true_positives']}")
+    print(f"  - False Positives: {metrics_doc['false_positives']}")
+    print(f"  - True Negatives:  {metrics_doc['true_negatives']}")
+    print(f"  - False Negatives: {metrics_doc['false_negatives']}")
+    
+    if metrics_doc["by_rule"]:
+        print("\n  Per Rule:")
+        for rule in metrics_doc["by_rule"]:
+            print(f"  - {rule['rule_name']}: precision {rule['precision']*100:.1f}%, "
+                  f"recall {rule['recall']*100:.1f}%, F1 {rule['f1_score']:.4f}")
     
     return metrics_doc
 
@@ -250,6 +191,8 @@ async def main():
     try:
         # Add labels and calculate metrics
         await add_laundering_labels(db, company_id)
+        # Labels feed the live per-rule counters
+        await rebuild_rule_metrics(db, company_id)
         metrics = await calculate_detection_accuracy(db, company_id)
         report = await generate_detection_report(db, company_id)
         
@@ -260,7 +203,7 @@ async def main():
         print(f"Detection metrics stored in 'detection_metrics' collection")
         print(f"View metrics in the Analytics dashboard")
         print("\n" + "=" * 70)
-        
+    
     except Exception as e:
         print(f"\n✗ Error: {e}")
         import traceback
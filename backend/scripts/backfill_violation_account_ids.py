@@ -0,0 +1,70 @@
+"""
+Backfill normalized account_ids on existing violations
+Populates the field server-side and builds the multikey index used for account lookups
+"""
+import asyncio
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.services.violation_fields import ACCOUNT_IDS_EXPR
+from app.services.response_cache import bump_data_version
+
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Backfill account_ids on violations')
+    parser.add_argument('--company-id', type=str, help='Only backfill this company (default: all)')
+    parser.add_argument('--force', action='store_true', help='Recompute account_ids even where already set')
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("PolicyGuard - Violation account_ids Backfill")
+    print("=" * 70)
+    
+    print(f"\nConnecting to MongoDB at {settings.MONGO_URI}...")
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client[settings.MONGO_DB_NAME]
+    
+    try:
+        await client.admin.command('ping')
+        print("✓ Connected to MongoDB successfully")
+    except Exception as e:
+        print(f"✗ Failed to connect to MongoDB: {e}")
+        return
+    
+    query = {}
+    if args.company_id:
+        query["company_id"] = args.company_id
+    if not args.force:
+        query["account_ids"] = {"$exists": False}
+    
+    try:
+        # Pipeline update computes the array on the server, no documents are transferred
+        result = await db.violations.update_many(query, [{"$set": {"account_ids": ACCOUNT_IDS_EXPR}}])
+        print(f"\n✓ Backfilled account_ids on {result.modified_count} violations")
+        
+        if result.modified_count:
+            if args.company_id:
+                company_ids = [args.company_id]
+            else:
+                company_ids = [str(c["_id"]) async for c in db.companies.find({}, {"_id": 1})]
+            for company_id in company_ids:
+                await bump_data_version(db, company_id)
+        
+        await db.violations.create_index([("company_id", 1), ("account_ids", 1), ("created_at", -1)])
+        print("✓ Index (company_id, account_ids, created_at) is in place")
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
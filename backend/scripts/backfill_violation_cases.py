@@ -0,0 +1,87 @@
+"""
+Backfill case_ids on violations linked to existing cases
+Auto-casing treats violations without case_ids as un-cased, so run this once
+before the first scan with auto-casing enabled to keep it from re-casing
+violations that analysts already linked by hand.
+"""
+import asyncio
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateMany
+from bson import ObjectId
+from app.config import settings
+from app.services.response_cache import bump_data_version
+
+WRITE_BATCH_SIZE = 500
+
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Backfill case_ids on linked violations')
+    parser.add_argument('--company-id', type=str, help='Only backfill this company (default: all)')
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("PolicyGuard - Violation case_ids Backfill")
+    print("=" * 70)
+    
+    print(f"\nConnecting to MongoDB at {settings.MONGO_URI}...")
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client[settings.MONGO_DB_NAME]
+    
+    try:
+        await client.admin.command('ping')
+        print("✓ Connected to MongoDB successfully")
+    except Exception as e:
+        print(f"✗ Failed to connect to MongoDB: {e}")
+        return
+    
+    case_query = {"linked_violation_ids.0": {"$exists": True}}
+    if args.company_id:
+        case_query["company_id"] = args.company_id
+    
+    try:
+        # One multi-document update per case, sent in unordered batches
+        operations = []
+        modified = 0
+        cases = 0
+        company_ids = set()
+        async for case in db.cases.find(case_query, {"company_id": 1, "linked_violation_ids": 1}):
+            violation_ids = [ObjectId(vid) for vid in case["linked_violation_ids"] if ObjectId.is_valid(vid)]
+            operations.append(UpdateMany(
+                {"_id": {"$in": violation_ids}, "company_id": case["company_id"]},
+                {"$addToSet": {"case_ids": str(case["_id"])}}
+            ))
+            cases += 1
+            company_ids.add(case["company_id"])
+            if len(operations) >= WRITE_BATCH_SIZE:
+                result = await db.violations.bulk_write(operations, ordered=False)
+                modified += result.modified_count
+                operations = []
+        
+        if operations:
+            result = await db.violations.bulk_write(operations, ordered=False)
+            modified += result.modified_count
+        print(f"\n✓ Linked {modified} violations to {cases} cases")
+        
+        for company_id in company_ids:
+            await bump_data_version(db, company_id)
+        
+        await db.violations.create_index([("company_id", 1), ("status", 1), ("case_ids", 1), ("created_at", 1)])
+        await db.violations.create_index([("company_id", 1), ("case_ids", 1), ("created_at", -1), ("_id", -1)])
+        print("✓ Indexes on (company_id, [status,] case_ids, created_at) are in place")
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
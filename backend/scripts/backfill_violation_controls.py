@@ -0,0 +1,94 @@
+"""
+Backfill framework and control_id on existing violations
+Copies each rule's classification onto its violations and builds the
+indexes used by the framework/control_id filters on GET /violations
+"""
+import asyncio
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateMany
+from app.config import settings
+from app.services.violation_fields import RULE_FIELDS, rule_fields
+from app.services.response_cache import bump_data_version
+
+WRITE_BATCH_SIZE = 500
+
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Backfill framework and control_id on violations')
+    parser.add_argument('--company-id', type=str, help='Only backfill this company (default: all)')
+    parser.add_argument('--force', action='store_true', help='Rewrite the fields even where already set')
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("PolicyGuard - Violation framework/control_id Backfill")
+    print("=" * 70)
+    
+    print(f"\nConnecting to MongoDB at {settings.MONGO_URI}...")
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client[settings.MONGO_DB_NAME]
+    
+    try:
+        await client.admin.command('ping')
+        print("✓ Connected to MongoDB successfully")
+    except Exception as e:
+        print(f"✗ Failed to connect to MongoDB: {e}")
+        return
+    
+    rule_query = {}
+    if args.company_id:
+        rule_query["company_id"] = args.company_id
+    
+    try:
+        # One multi-document update per rule, sent in unordered batches
+        operations = []
+        modified = 0
+        rules = 0
+        company_ids = set()
+        async for rule in db.rules.find(rule_query, {"company_id": 1, **{field: 1 for field in RULE_FIELDS}}):
+            query = {"company_id": rule["company_id"], "rule_id": str(rule["_id"])}
+            if not args.force:
+                query["framework"] = {"$exists": False}
+            operations.append(UpdateMany(query, {"$set": rule_fields(rule)}))
+            rules += 1
+            company_ids.add(rule["company_id"])
+            if len(operations) >= WRITE_BATCH_SIZE:
+                result = await db.violations.bulk_write(operations, ordered=False)
+                modified += result.modified_count
+                operations = []
+        
+        if operations:
+            result = await db.violations.bulk_write(operations, ordered=False)
+            modified += result.modified_count
+        print(f"\n✓ Backfilled framework/control_id on {modified} violations from {rules} rules")
+        
+        # Built-in pattern violations have no rule document
+        unmatched = {"framework": {"$exists": False}}
+        if args.company_id:
+            unmatched["company_id"] = args.company_id
+        result = await db.violations.update_many(unmatched, {"$set": rule_fields(None)})
+        print(f"✓ Marked {result.modified_count} violations without a rule document")
+        
+        # Cached violation lists and ETags for these companies are now stale
+        for company_id in company_ids:
+            await bump_data_version(db, company_id)
+        
+        await db.violations.create_index([("company_id", 1), ("framework", 1), ("created_at", -1), ("_id", -1)])
+        await db.violations.create_index([("company_id", 1), ("control_id", 1), ("created_at", -1), ("_id", -1)])
+        print("✓ Indexes (company_id, framework|control_id, created_at) are in place")
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
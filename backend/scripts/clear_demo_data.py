@@ -9,6 +9,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import settings
+from app.services.response_cache import bump_data_version
 
 DEMO_COMPANY_NAME = "AML Demo Bank"
 
@@ -37,12 +38,14 @@ async def main():
     # Delete all data for this company
     collections_to_clear = [
         "accounts", "transactions", "policies", "rules", 
-        "violations", "scan_runs", "cases", "alert_configs", "scan_schedules"
+        "violations", "scan_runs", "cases", "comments", "alert_configs", "scan_schedules",
+        "account_risk", "rule_metrics", "violation_daily_stats", "detection_metrics"
     ]
     
     for coll_name in collections_to_clear:
         result = await db[coll_name].delete_many({"company_id": company_id})
         print(f"✓ Cleared {result.deleted_count} documents from {coll_name}")
+    await bump_data_version(db, company_id)
     
     print(f"\n✓ All data cleared for {DEMO_COMPANY_NAME}")
     print("You can now run: python scripts/seed_demo_data.py")
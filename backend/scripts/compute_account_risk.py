@@ -0,0 +1,66 @@
+"""
+Compute Network-Propagated Account Risk
+Batch job that refreshes the account_risk collection read by the accounts endpoints
+"""
+import asyncio
+import sys
+import argparse
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.services.account_risk import compute_account_risk
+
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Recompute account risk scores')
+    parser.add_argument('--company-id', type=str, help='Company ID to score (default: all companies)')
+    parser.add_argument('--alpha', type=float, default=0.85, help='PageRank damping factor')
+    parser.add_argument('--max-iter', type=int, default=100, help='Maximum power iterations')
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("PolicyGuard - Account Risk Propagation")
+    print("=" * 70)
+    
+    print(f"\nConnecting to MongoDB at {settings.MONGO_URI}...")
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client[settings.MONGO_DB_NAME]
+    
+    try:
+        await client.admin.command('ping')
+        print("✓ Connected to MongoDB successfully")
+    except Exception as e:
+        print(f"✗ Failed to connect to MongoDB: {e}")
+        return
+    
+    if args.company_id:
+        company_ids = [args.company_id]
+    else:
+        company_ids = [str(c["_id"]) async for c in db.companies.find({}, {"_id": 1})]
+    
+    try:
+        for company_id in company_ids:
+            started = time.time()
+            summary = await compute_account_risk(
+                db, company_id, alpha=args.alpha, max_iter=args.max_iter
+            )
+            print(f"\n✓ Company {company_id}")
+            print(f"  - Graph: {summary['graph_accounts']} accounts, {summary['graph_edges']} edges")
+            print(f"  - Seed accounts: {summary['seed_accounts']}")
+            print(f"  - Accounts scored: {summary['accounts_scored']}")
+            print(f"  - Time: {time.time() - started:.2f}s")
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,390 @@
+"""
+Synthetic Transaction Generator for PolicyGuard
+Generates millions of transactions across several tenants with injected AML
+typologies and ground-truth labels, for reproducible scale and accuracy benchmarks.
+
+Rows are generated with numpy a chunk at a time and written either straight to
+MongoDB with bulk inserts or to one Parquet file per tenant.
+
+Usage:
+    python scripts/generate_synthetic_data.py --transactions 10000000 --tenants 4
+    python scripts/generate_synthetic_data.py --transactions 1000000 --output parquet --path synthetic/
+"""
+import asyncio
+import sys
+import argparse
+import time
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.db import ensure_unique_index
+from app.services.columnar_import import batch_to_documents
+from app.services.csv_import import batch_writer
+from app.services.response_cache import bump_data_version
+
+
+TRANSACTION_TYPES = ['TRANSFER', 'WIRE', 'CASH', 'ACH', 'CARD', 'CHECK']
+TRANSACTION_TYPE_WEIGHTS = [0.35, 0.15, 0.15, 0.15, 0.15, 0.05]
+CHANNELS = ['ONLINE', 'MOBILE', 'PHONE', 'ATM', 'BRANCH']
+CHANNEL_WEIGHTS = [0.45, 0.35, 0.05, 0.05, 0.10]
+ACCOUNT_TYPES = ['CHECKING', 'SAVINGS', 'BUSINESS', 'INVESTMENT']
+COUNTRIES = ['US', 'UK', 'CA', 'DE', 'FR', 'JP', 'AU', 'SG']
+DEFAULT_END_DATE = '2025-01-01'
+
+# Typology -> (rows per pattern instance (min, max), share of the typology rows)
+TYPOLOGIES = {
+    # Several cash deposits just under the $10,000 reporting threshold within a week
+    'STRUCTURING': ((3, 6), 0.4),
+    # Repeated wires of exact round thousands from one account
+    'ROUND_AMOUNTS': ((3, 5), 0.2),
+    # Funds passed along a chain of accounts within minutes, shaved slightly at each hop
+    'RAPID_TRANSFERS': ((3, 5), 0.25),
+    # Funds that return to the originating account through 3-6 hops within a day
+    'CYCLE': ((3, 6), 0.15)
+}
+
+
+def build_ids(prefix, numbers):
+    """Vectorized "<prefix><number>" strings; negative numbers become nulls"""
+    numbers = pa.array(numbers, mask=numbers < 0)
+    return pc.binary_join_element_wise(prefix, pc.cast(numbers, pa.string()), '')
+
+
+def categories(values, codes):
+    """String column from indexes into a list of values; negative indexes become nulls"""
+    return pa.array(values, pa.string()).take(pa.array(codes, mask=codes < 0))
+
+
+def pattern_layout(rng, instances, size_range):
+    """
+    Lay out `instances` pattern instances of random size
+    
+    Returns:
+        (instance index of each row, position of each row within its instance, instance sizes)
+    """
+    sizes = rng.integers(size_range[0], size_range[1] + 1, instances)
+    instance = np.repeat(np.arange(instances), sizes)
+    starts = np.cumsum(sizes) - sizes
+    position = np.arange(sizes.sum()) - np.repeat(starts, sizes)
+    return instance, position, sizes
+
+
+def generate_typology(rng, typology, instances, num_accounts, start, span_seconds):
+    """
+    Generate the rows of one typology
+    
+    Returns:
+        Dict of numpy columns, with categorical columns as indexes into their
+        value lists, plus the instance index of each row
+    """
+    size_range, _ = TYPOLOGIES[typology]
+    instance, position, sizes = pattern_layout(rng, instances, size_range)
+    n = len(instance)
+    base_time = start + rng.integers(0, span_seconds, instances)
+    transaction_type = np.full(n, TRANSACTION_TYPES.index('WIRE'))
+    channel = np.full(n, CHANNELS.index('ONLINE'))
+    
+    if typology in ('STRUCTURING', 'ROUND_AMOUNTS'):
+        src = rng.integers(0, num_accounts, instances)[instance]
+        dst = rng.integers(0, num_accounts, n)
+        if typology == 'STRUCTURING':
+            amount = rng.uniform(9000, 9999, n)
+            offsets = rng.integers(0, 7 * 86400, n)
+            transaction_type[:] = TRANSACTION_TYPES.index('CASH')
+            channel[:] = CHANNELS.index('BRANCH')
+        else:
+            amount = rng.integers(10, 100, n) * 1000.0
+            offsets = rng.integers(0, 3 * 86400, n)
+    else:
+        # Chains and cycles: row i of an instance moves funds from node i to node i + 1
+        nodes = rng.integers(0, num_accounts, sizes.sum() + instances)
+        node_starts = np.cumsum(sizes + 1) - (sizes + 1)
+        first_node = node_starts[instance]
+        src = nodes[first_node + position]
+        if typology == 'CYCLE':
+            dst = nodes[first_node + (position + 1) % sizes[instance]]
+            hop_seconds = rng.integers(600, 4 * 3600, n)
+        else:
+            dst = nodes[first_node + position + 1]
+            hop_seconds = rng.integers(60, 30 * 60, n)
+        offsets = position * hop_seconds
+        amount = rng.uniform(20000, 200000, instances)[instance] * (1 - 0.01 * position)
+        transaction_type[:] = TRANSACTION_TYPES.index('TRANSFER')
+    
+    return {
+        'timestamp': base_time[instance] + offsets,
+        'amount': amount,
+        'transaction_type': transaction_type,
+        'channel': channel,
+        'src': src,
+        'dst': dst,
+        'laundering_type': np.full(n, list(TYPOLOGIES).index(typology)),
+        'instance': instance
+    }
+
+
+def generate_chunk(rng, rows, num_accounts, start, span_seconds, typology_rate, first_instance=0):
+    """
+    Generate `rows` transactions, about `typology_rate` of them from typology patterns
+    
+    Returns:
+        Dict of numpy columns sorted by timestamp. laundering_type and
+        typology_id are -1 for background rows; typology IDs start at first_instance.
+    """
+    parts = []
+    typology_rows = int(rows * typology_rate)
+    for typology, (size_range, share) in TYPOLOGIES.items():
+        instances = int(typology_rows * share / np.mean(size_range))
+        if instances:
+            part = generate_typology(rng, typology, instances, num_accounts, start, span_seconds)
+            part['typology_id'] = part.pop('instance') + first_instance
+            first_instance += instances
+            parts.append(part)
+    
+    background = rows - sum(len(part['amount']) for part in parts)
+    transaction_type = rng.choice(len(TRANSACTION_TYPES), background, p=TRANSACTION_TYPE_WEIGHTS)
+    channel = rng.choice(len(CHANNELS), background, p=CHANNEL_WEIGHTS)
+    channel[transaction_type == TRANSACTION_TYPES.index('CASH')] = CHANNELS.index('BRANCH')
+    # Skew activity so a minority of accounts carry most of the volume
+    src = (num_accounts * rng.power(0.5, background)).astype(np.int64)
+    parts.append({
+        'timestamp': start + rng.integers(0, span_seconds, background),
+        'amount': np.clip(rng.lognormal(7.0, 1.5, background), 1, 5000000),
+        'transaction_type': transaction_type,
+        'channel': channel,
+        'src': np.minimum(src, num_accounts - 1),
+        'dst': rng.integers(0, num_accounts, background),
+        'laundering_type': np.full(background, -1),
+        'typology_id': np.full(background, -1)
+    })
+    
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    order = np.argsort(columns['timestamp'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+
+def chunk_to_batch(columns, first_number, id_prefix):
+    """Arrow record batch in the transaction schema"""
+    n = len(columns['amount'])
+    laundering_type = categories(list(TYPOLOGIES), columns['laundering_type'])
+    batch = {
+        'transaction_id': build_ids(f"{id_prefix}SYN", np.arange(first_number, first_number + n)),
+        'timestamp': pa.array(columns['timestamp'].astype('datetime64[s]')),
+        'amount': pa.array(np.round(columns['amount'], 2)),
+        'currency': pa.nulls(n, pa.string()).fill_null('USD'),
+        'transaction_type': categories(TRANSACTION_TYPES, columns['transaction_type']),
+        'channel': categories(CHANNELS, columns['channel']),
+        'src_account': build_ids(f"{id_prefix}ACC", columns['src']),
+        'dst_account': build_ids(f"{id_prefix}ACC", columns['dst']),
+        'description': pa.nulls(n, pa.string()).fill_null('Synthetic transaction'),
+        'status': pa.nulls(n, pa.string()).fill_null('COMPLETED'),
+        'is_laundering': pc.is_valid(laundering_type),
+        'laundering_type': laundering_type,
+        'typology_id': build_ids(f"{id_prefix}TYP", columns['typology_id'])
+    }
+    return pa.RecordBatch.from_arrays(list(batch.values()), names=list(batch.keys()))
+
+
+def to_upload_layout(batch):
+    """Rename columns to the transaction import's names so the file can be uploaded as-is"""
+    names = {'timestamp': 'date', 'src_account': 'from_account', 'dst_account': 'to_account',
+             'transaction_type': 'type'}
+    return pa.RecordBatch.from_arrays(batch.columns, names=[names.get(name, name) for name in batch.schema.names])
+
+
+def generate_accounts(rng, company_id, num_accounts, id_prefix, end_date):
+    """Account documents for one tenant, opened before end_date"""
+    now = datetime.utcnow()
+    opened_days = rng.integers(30, 3650, num_accounts).tolist()
+    account_types = rng.choice(ACCOUNT_TYPES, num_accounts).tolist()
+    countries = rng.choice(COUNTRIES, num_accounts).tolist()
+    balances = np.round(rng.lognormal(9.0, 1.5, num_accounts), 2).tolist()
+    risk_scores = rng.integers(10, 90, num_accounts).tolist()
+    return [
+        {
+            "company_id": company_id,
+            "account_id": f"{id_prefix}ACC{i}",
+            "customer_id": f"{id_prefix}CUST{i}",
+            "customer_name": f"Synthetic Customer {i}",
+            "account_type": account_types[i],
+            "balance": balances[i],
+            "currency": "USD",
+            "country": countries[i],
+            "opened_date": end_date - timedelta(days=opened_days[i]),
+            "status": "ACTIVE",
+            "risk_score": risk_scores[i],
+            "created_at": now
+        }
+        for i in range(num_accounts)
+    ]
+
+
+async def generate_tenant(db, args, tenant, company_id, rows, stats):
+    """Generate and write one tenant's transactions (and accounts when writing to MongoDB)"""
+    id_prefix = f"{str(company_id)[:4]}-" if args.prefix_ids else ""
+    # Anchored on --end-date rather than the clock, so a seed always gives the same timestamps
+    start = int((args.end_date - timedelta(days=args.days)).replace(tzinfo=timezone.utc).timestamp())
+    span_seconds = args.days * 86400
+    writer = None
+    write_batch = None
+    slots = asyncio.Semaphore(args.workers)
+    pending = set()
+    
+    if db is not None:
+        if not args.append:
+            await db.transactions.delete_many({"company_id": company_id})
+            await db.accounts.delete_many({"company_id": company_id})
+        rng = np.random.default_rng([args.seed, tenant])
+        accounts = generate_accounts(rng, company_id, args.accounts, id_prefix, args.end_date)
+        for offset in range(0, len(accounts), args.batch_size):
+            await db.accounts.insert_many(accounts[offset:offset + args.batch_size], ordered=False)
+        write_batch = batch_writer(db, 'transactions', 'insert')
+    
+    async def write(documents, first_row):
+        try:
+            inserted, _, _, errors = await write_batch(documents, list(range(first_row, first_row + len(documents))))
+            stats['rows_written'] += inserted
+            if errors:
+                print(f"  ! {len(errors)} rows rejected: {errors[0][1]}")
+        finally:
+            slots.release()
+    
+    def build_chunk(index, first_number, size):
+        # Each chunk has its own seed, so output does not depend on how chunks are scheduled
+        rng = np.random.default_rng([args.seed, tenant, index])
+        columns = generate_chunk(rng, size, args.accounts, start, span_seconds, args.typology_rate,
+                                 first_instance=index << 32)
+        batch = chunk_to_batch(columns, first_number, id_prefix)
+        if db is None:
+            return batch, []
+        now = datetime.utcnow()
+        documents = [
+            batch_to_documents(batch.slice(offset, args.batch_size), company_id, now)
+            for offset in range(0, batch.num_rows, args.batch_size)
+        ]
+        return batch, documents
+    
+    generated = 0
+    index = 0
+    while generated < rows:
+        size = min(args.chunk_size, rows - generated)
+        batch, chunks = await asyncio.to_thread(build_chunk, index, generated, size)
+        labels = batch.column('laundering_type').value_counts().to_pylist()
+        for entry in labels:
+            if entry['values'] is not None:
+                stats['typologies'][entry['values']] = stats['typologies'].get(entry['values'], 0) + entry['counts']
+        
+        if db is None:
+            if writer is None:
+                path = Path(args.path) / f"{company_id}_transactions.parquet"
+                writer = pq.ParquetWriter(path, to_upload_layout(batch).schema)
+                print(f"  - Writing {path}")
+            writer.write_batch(to_upload_layout(batch))
+            stats['rows_written'] += batch.num_rows
+        else:
+            first_row = generated
+            for documents in chunks:
+                await slots.acquire()
+                task = asyncio.create_task(write(documents, first_row))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                first_row += len(documents)
+        
+        generated += batch.num_rows
+        index += 1
+        stats['rows_generated'] += batch.num_rows
+        elapsed = time.time() - stats['started']
+        print(f"  - {stats['rows_generated']:,} rows generated, {stats['rows_written']:,} written "
+              f"({stats['rows_generated'] / elapsed:,.0f} rows/s)", end='\r')
+    
+    if pending:
+        await asyncio.gather(*pending)
+    if writer is not None:
+        writer.close()
+    if db is not None:
+        await bump_data_version(db, company_id)
+    print()
+
+
+async def main():
+    """Main generator function"""
+    parser = argparse.ArgumentParser(description='Generate synthetic AML transactions with labelled typologies')
+    parser.add_argument('--transactions', type=int, default=1000000, help='Total transactions across all tenants')
+    parser.add_argument('--tenants', type=int, default=1, help='Number of tenants when --company-ids is not given')
+    parser.add_argument('--company-ids', type=str, help='Comma-separated company IDs to generate for')
+    parser.add_argument('--accounts', type=int, default=10000, help='Accounts per tenant')
+    parser.add_argument('--days', type=int, default=90, help='Days of history to spread transactions over')
+    parser.add_argument('--end-date', type=lambda value: datetime.strptime(value, '%Y-%m-%d'),
+                        default=DEFAULT_END_DATE, help='Day the history ends, YYYY-MM-DD (default: %(default)s)')
+    parser.add_argument('--typology-rate', type=float, default=0.01, help='Share of rows from injected typologies')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed gives the same data')
+    parser.add_argument('--output', choices=['mongo', 'parquet'], default='mongo')
+    parser.add_argument('--path', type=str, default='.', help='Directory for Parquet output')
+    parser.add_argument('--chunk-size', type=int, default=1000000, help='Rows generated at a time')
+    parser.add_argument('--batch-size', type=int, default=50000, help='Rows per bulk insert')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent bulk inserts')
+    parser.add_argument('--append', action='store_true', help='Keep existing tenant data instead of clearing it')
+    parser.add_argument('--prefix-ids', action='store_true',
+                        help='Prefix IDs with the company ID, as import_aml_data.py does')
+    args = parser.parse_args()
+    
+    if args.company_ids:
+        company_ids = [company_id.strip() for company_id in args.company_ids.split(',') if company_id.strip()]
+    else:
+        company_ids = [f"synthetic-{tenant + 1}" for tenant in range(args.tenants)]
+    
+    print("=" * 60)
+    print("PolicyGuard - Synthetic Transaction Generator")
+    print(f"{args.transactions:,} transactions across {len(company_ids)} tenant(s), seed {args.seed}")
+    print("=" * 60)
+    
+    client = None
+    db = None
+    if args.output == 'mongo':
+        print(f"\nConnecting to MongoDB at {settings.MONGO_URI}...")
+        client = AsyncIOMotorClient(settings.MONGO_URI)
+        db = client[settings.MONGO_DB_NAME]
+        try:
+            await client.admin.command('ping')
+            print("✓ Connected to MongoDB successfully")
+        except Exception as e:
+            print(f"✗ Failed to connect to MongoDB: {e}")
+            return
+        await ensure_unique_index(db.transactions, [("company_id", 1), ("transaction_id", 1)])
+        await ensure_unique_index(db.accounts, [("company_id", 1), ("account_id", 1)])
+    else:
+        Path(args.path).mkdir(parents=True, exist_ok=True)
+    
+    stats = {'rows_generated': 0, 'rows_written': 0, 'typologies': {}, 'started': time.time()}
+    per_tenant, remainder = divmod(args.transactions, len(company_ids))
+    try:
+        for tenant, company_id in enumerate(company_ids):
+            rows = per_tenant + (1 if tenant < remainder else 0)
+            print(f"\nTenant {company_id}: {rows:,} transactions, {args.accounts:,} accounts")
+            await generate_tenant(db, args, tenant, company_id, rows, stats)
+    finally:
+        if client is not None:
+            client.close()
+    
+    elapsed = time.time() - stats['started']
+    print("\n" + "=" * 60)
+    print(f"✓ Generated {stats['rows_generated']:,} transactions in {elapsed:.1f}s "
+          f"({stats['rows_generated'] / elapsed:,.0f} rows/s)")
+    print("Labelled typology rows (is_laundering = true):")
+    for typology, count in sorted(stats['typologies'].items()):
+        print(f"  - {typology}: {count:,}")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
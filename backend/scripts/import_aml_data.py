@@ -1,18 +1,235 @@
 import asyncio
 import sys
 import argparse
+import time
 from pathlib import Path
 from datetime import datetime, timedelta
 import random
 
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
 # Add parent directory to path to import app modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import settings
+from app.db import ensure_unique_index
+from app.services.columnar_import import batch_to_documents
+from app.services.csv_import import batch_writer
+from app.services.response_cache import bump_data_version, GLOBAL_SCOPE
+
+# Column layout of the IBM AML transaction files (HI/LI-Small/Medium/Large_Trans.csv).
+# The header repeats "Account", so columns are named explicitly.
+IBM_COLUMNS = [
+    'timestamp', 'from_bank', 'from_account', 'to_bank', 'to_account',
+    'amount_received', 'receiving_currency', 'amount_paid', 'payment_currency',
+    'payment_format', 'is_laundering'
+]
+
+IBM_COLUMN_TYPES = {
+    'timestamp': pa.timestamp('s'),
+    'from_bank': pa.string(),
+    'from_account': pa.string(),
+    'to_bank': pa.string(),
+    'to_account': pa.string(),
+    'amount_received': pa.float64(),
+    'receiving_currency': pa.string(),
+    'amount_paid': pa.float64(),
+    'payment_currency': pa.string(),
+    'payment_format': pa.string(),
+    'is_laundering': pa.int8()
+}
+
+IBM_PAYMENT_FORMATS = {
+    'Wire': 'WIRE',
+    'Cash': 'CASH',
+    'Cheque': 'CHECK',
+    'ACH': 'ACH',
+    'Credit Card': 'CARD',
+    'Bitcoin': 'CRYPTO',
+    'Reinvestment': 'REINVESTMENT'
+}
+
+IBM_CURRENCIES = {
+    'US Dollar': 'USD',
+    'Euro': 'EUR',
+    'UK Pound': 'GBP',
+    'Yen': 'JPY',
+    'Yuan': 'CNY',
+    'Rupee': 'INR',
+    'Ruble': 'RUB',
+    'Swiss Franc': 'CHF',
+    'Canadian Dollar': 'CAD',
+    'Australian Dollar': 'AUD',
+    'Mexican Peso': 'MXN',
+    'Brazil Real': 'BRL',
+    'Saudi Riyal': 'SAR',
+    'Shekel': 'ILS',
+    'Bitcoin': 'BTC'
+}
+
+
+def map_values(array, mapping, default=None):
+    """Translate a low-cardinality string column through a dict, one lookup per distinct value"""
+    encoded = pc.dictionary_encode(array)
+    translated = pa.array(
+        [mapping.get(value, value if default is None else default) for value in encoded.dictionary.to_pylist()],
+        pa.string()
+    )
+    return translated.take(encoded.indices)
+
+
+def map_ibm_batch(batch, id_prefix, first_row):
+    """Map a batch of IBM AML rows to transaction columns"""
+    n = batch.num_rows
+    row_ids = pc.cast(pa.array(range(first_row, first_row + n), pa.int64()), pa.string())
+    payment_format = batch.column('payment_format')
+    transaction_type = map_values(payment_format, IBM_PAYMENT_FORMATS, 'OTHER')
+    
+    columns = {
+        'transaction_id': pc.binary_join_element_wise(id_prefix, row_ids, ''),
+        'timestamp': batch.column('timestamp'),
+        'amount': batch.column('amount_paid'),
+        'currency': map_values(batch.column('payment_currency'), IBM_CURRENCIES),
+        'transaction_type': transaction_type,
+        'channel': pc.if_else(pc.equal(transaction_type, 'CASH'), 'BRANCH', 'ONLINE'),
+        # Account numbers are only unique within a bank
+        'src_account': pc.binary_join_element_wise(batch.column('from_bank'), batch.column('from_account'), '-'),
+        'dst_account': pc.binary_join_element_wise(batch.column('to_bank'), batch.column('to_account'), '-'),
+        'amount_received': batch.column('amount_received'),
+        'received_currency': map_values(batch.column('receiving_currency'), IBM_CURRENCIES),
+        'description': pc.binary_join_element_wise('IBM AML ', payment_format, ''),
+        'status': pa.nulls(n, pa.string()).fill_null('COMPLETED'),
+        'is_laundering': pc.equal(batch.column('is_laundering'), 1)
+    }
+    return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns.keys()))
+
+
+def open_ibm_csv(path, block_size):
+    """Open an IBM AML transaction file (optionally .gz/.bz2/.zst) as a streaming batch reader"""
+    return pa_csv.open_csv(
+        pa.input_stream(path),
+        read_options=pa_csv.ReadOptions(column_names=IBM_COLUMNS, skip_rows=1, block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=IBM_COLUMN_TYPES,
+            timestamp_parsers=['%Y/%m/%d %H:%M']
+        )
+    )
+
+
+async def load_ibm_transactions(db, path, company_id, id_prefix='', batch_size=50000,
+                                workers=4, block_size_mb=16, limit=None, mode='insert'):
+    """
+    Stream an IBM AML transaction file into the transactions collection
+    
+    Rows are parsed and mapped in Arrow by a background thread, then written
+    by up to `workers` concurrent bulk writes. Memory stays bounded by
+    roughly (workers + 1) batches regardless of file size.
+    
+    Returns:
+        Import statistics
+    """
+    path = Path(path)
+    source = path.name.split('.')[0].replace('_Trans', '')
+    id_prefix = f"{id_prefix}{source}-"
+    write_batch = batch_writer(db, 'transactions', mode)
+    reader = open_ibm_csv(str(path), block_size_mb * 1024 * 1024)
+    
+    stats = {'rows_read': 0, 'rows_inserted': 0, 'rows_updated': 0, 'rows_unchanged': 0,
+             'rows_failed': 0, 'laundering_rows': 0}
+    slots = asyncio.Semaphore(workers)
+    pending = set()
+    started = time.time()
+    
+    async def write(documents, first_row):
+        try:
+            inserted, updated, unchanged, errors = await write_batch(
+                documents, list(range(first_row, first_row + len(documents)))
+            )
+            stats['rows_inserted'] += inserted
+            stats['rows_updated'] += updated
+            stats['rows_unchanged'] += unchanged
+            stats['rows_failed'] += len(errors)
+            if errors:
+                print(f"  ! {len(errors)} rows rejected near row {first_row}: {errors[0][1]}")
+        finally:
+            slots.release()
+    
+    def next_documents():
+        # Runs in a worker thread: read, map and convert the next slice of rows
+        try:
+            batch = reader.read_next_batch()
+        except StopIteration:
+            return None
+        if limit is not None:
+            batch = batch.slice(0, max(limit - stats['rows_read'], 0))
+        mapped = map_ibm_batch(batch, id_prefix, stats['rows_read'])
+        documents = []
+        for offset in range(0, mapped.num_rows, batch_size):
+            documents.append(batch_to_documents(mapped.slice(offset, batch_size), company_id, datetime.utcnow()))
+        return batch.num_rows, pc.sum(mapped.column('is_laundering').cast(pa.int64())).as_py() or 0, documents
+    
+    while limit is None or stats['rows_read'] < limit:
+        result = await asyncio.to_thread(next_documents)
+        if result is None:
+            break
+        rows, laundering, chunks = result
+        first_row = stats['rows_read']
+        stats['rows_read'] += rows
+        stats['laundering_rows'] += laundering
+        for documents in chunks:
+            await slots.acquire()
+            task = asyncio.create_task(write(documents, first_row))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            first_row += len(documents)
+        
+        elapsed = time.time() - started
+        print(f"  - {stats['rows_read']:,} rows read, {stats['rows_inserted']:,} written "
+              f"({stats['rows_read'] / elapsed:,.0f} rows/s)", end='\r')
+    
+    if pending:
+        await asyncio.gather(*pending)
+    stats['elapsed_seconds'] = round(time.time() - started, 1)
+    print()
+    return stats
+
+
+async def build_accounts_from_transactions(db, company_id):
+    """
+    Create an account document for every account seen in the company's
+    transactions, server-side, leaving existing accounts untouched
+    """
+    await ensure_unique_index(db.accounts, [("company_id", 1), ("account_id", 1)])
+    pipeline = [
+        {"$match": {"company_id": company_id}},
+        {"$project": {"accounts": ["$src_account", "$dst_account"]}},
+        {"$unwind": "$accounts"},
+        {"$group": {"_id": "$accounts"}},
+        {"$project": {
+            "_id": 0,
+            "company_id": company_id,
+            "account_id": "$_id",
+            "customer_id": "$_id",
+            "customer_name": {"$concat": ["Account ", "$_id"]},
+            "account_type": "CHECKING",
+            "status": "ACTIVE",
+            "risk_score": 50,
+            "created_at": "$$NOW"
+        }},
+        {"$merge": {
+            "into": "accounts",
+            "on": ["company_id", "account_id"],
+            "whenMatched": "keepExisting",
+            "whenNotMatched": "insert"
+        }}
+    ]
+    await db.transactions.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
 
-# Sample data generator for demo purposes
-# In production, this would load from actual IBM AML CSV files
+# Sample data generator for demo purposes; pass --file to load the real IBM AML CSVs
 
 def generate_sample_transactions(company_id=None, num_transactions=1000):
     """Generate sample transaction data for demo."""
@@ -137,10 +354,56 @@ async def seed_example_rules(db, company_id=None):
     return result.inserted_ids
 
 
+async def import_ibm_file(db, args, company_id, id_prefix, filter_dict):
+    """Load a real IBM AML file and derive its accounts"""
+    path = Path(args.file)
+    if not path.exists():
+        print(f"✗ File not found: {path}")
+        return
+    
+    print(f"\n2. Streaming transactions from {path.name}...")
+    if args.mode == 'insert':
+        result = await db.transactions.delete_many(filter_dict)  # Clear existing for this company
+        print(f"  - Removed {result.deleted_count} existing transactions")
+    await ensure_unique_index(db.transactions, [("company_id", 1), ("transaction_id", 1)])
+    
+    stats = await load_ibm_transactions(
+        db, path, company_id,
+        id_prefix=id_prefix,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        block_size_mb=args.block_size_mb,
+        limit=args.limit,
+        mode=args.mode
+    )
+    print(f"✓ Read {stats['rows_read']:,} rows in {stats['elapsed_seconds']}s "
+          f"({stats['laundering_rows']:,} labelled laundering)")
+    print(f"  - inserted {stats['rows_inserted']:,}, updated {stats['rows_updated']:,}, "
+          f"unchanged {stats['rows_unchanged']:,}, failed {stats['rows_failed']:,}")
+    
+    print("3. Building accounts from transactions...")
+    await build_accounts_from_transactions(db, company_id)
+    print("✓ Accounts created")
+    
+    await db.transactions.create_index([("company_id", 1), ("timestamp", -1)])
+    await db.transactions.create_index([("company_id", 1), ("src_account", 1)])
+    await db.transactions.create_index([("company_id", 1), ("dst_account", 1)])
+    print("✓ Index check on transactions collection done")
+
+
 async def main():
     """Main import function."""
     parser = argparse.ArgumentParser(description='Import AML data for a specific company')
     parser.add_argument('--company-id', type=str, help='Company ID to scope the data to')
+    parser.add_argument('--file', type=str,
+                        help='IBM AML transactions CSV (e.g. HI-Small_Trans.csv, optionally .gz/.bz2/.zst); '
+                             'sample data is generated when omitted')
+    parser.add_argument('--batch-size', type=int, default=50000, help='Rows per bulk write')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent bulk writes')
+    parser.add_argument('--block-size-mb', type=int, default=16, help='CSV bytes parsed per read')
+    parser.add_argument('--limit', type=int, help='Stop after this many rows')
+    parser.add_argument('--mode', choices=['insert', 'upsert'], default='insert',
+                        help='insert clears the company\'s transactions first; upsert updates in place')
     args = parser.parse_args()
     
     company_id = args.company_id
@@ -169,73 +432,78 @@ async def main():
     
     filter_dict = {"company_id": company_id} if company_id else {}
     
-    # Generate and import transactions
-    print("\n2. Generating sample transaction data...")
-    transactions = generate_sample_transactions(company_id, 1000)
-    # Ensure IDs are unique across companies and match account ID format
-    for i, t in enumerate(transactions):
-        t['transaction_id'] = f"{id_prefix}TXN{i:06d}"
-        if 'src_account' in t and t['src_account'].startswith('ACC'):
-            t['src_account'] = f"{id_prefix}{t['src_account']}"
-        if 'dst_account' in t and t['dst_account'].startswith('ACC'):
-            t['dst_account'] = f"{id_prefix}{t['dst_account']}"
-    
-    print(f"✓ Generated {len(transactions)} sample transactions")
-    
-    print("3. Importing transactions into MongoDB...")
-    await db.transactions.delete_many(filter_dict)  # Clear existing for this company
-    try:
-        result = await db.transactions.insert_many(transactions)
-        print(f"✓ Imported {len(result.inserted_ids)} transactions")
-    except Exception as e:
-        print(f"✗ Failed to import transactions: {e}")
-        if hasattr(e, 'details'):
-            print(f"  Details: {e.details}")
-    
-    # Create indexes - safely
-    async def safe_create_index(collection, keys, **kwargs):
+    if args.file:
+        await import_ibm_file(db, args, company_id, id_prefix, filter_dict)
+    else:
+        # Generate and import transactions
+        print("\n2. Generating sample transaction data...")
+        transactions = generate_sample_transactions(company_id, 1000)
+        # Ensure IDs are unique across companies and match account ID format
+        for i, t in enumerate(transactions):
+            t['transaction_id'] = f"{id_prefix}TXN{i:06d}"
+            if 'src_account' in t and t['src_account'].startswith('ACC'):
+                t['src_account'] = f"{id_prefix}{t['src_account']}"
+            if 'dst_account' in t and t['dst_account'].startswith('ACC'):
+                t['dst_account'] = f"{id_prefix}{t['dst_account']}"
+        
+        print(f"✓ Generated {len(transactions)} sample transactions")
+        
+        print("3. Importing transactions into MongoDB...")
+        await db.transactions.delete_many(filter_dict)  # Clear existing for this company
         try:
-            await collection.create_index(keys, **kwargs)
+            result = await db.transactions.insert_many(transactions)
+            print(f"✓ Imported {len(result.inserted_ids)} transactions")
         except Exception as e:
-            print(f"  ! Note on index {keys}: {str(e)}")
-
-    print("Checking indexes...")
-    await safe_create_index(db.transactions, 'transaction_id')
-    await safe_create_index(db.transactions, 'amount')
-    await safe_create_index(db.transactions, 'timestamp')
-    await safe_create_index(db.transactions, 'src_account')
-    if company_id:
-        await safe_create_index(db.transactions, 'company_id')
-    
-    # Generate and import accounts
-    print("\n4. Generating sample account data...")
-    accounts = generate_sample_accounts(company_id, 100)
-    # Ensure IDs are unique across companies
-    for i, a in enumerate(accounts):
-        a['account_id'] = f"{id_prefix}ACC{i:04d}"
+            print(f"✗ Failed to import transactions: {e}")
+            if hasattr(e, 'details'):
+                print(f"  Details: {e.details}")
         
-    print(f"✓ Generated {len(accounts)} sample accounts")
-    
-    print("5. Importing accounts into MongoDB...")
-    await db.accounts.delete_many(filter_dict)  # Clear existing for this company
-    try:
-        result = await db.accounts.insert_many(accounts)
-        print(f"✓ Imported {len(result.inserted_ids)} accounts")
-    except Exception as e:
-        print(f"✗ Failed to import accounts: {e}")
-        if hasattr(e, 'details'):
-            print(f"  Details: {e.details}")
-    
-    # Create indexes - safely
-    await safe_create_index(db.accounts, 'account_id')
-    await safe_create_index(db.accounts, 'customer_id')
-    if company_id:
-        await safe_create_index(db.accounts, 'company_id')
-    print("✓ Index check on accounts collection done")
+        # Create indexes - safely
+        async def safe_create_index(collection, keys, **kwargs):
+            try:
+                await collection.create_index(keys, **kwargs)
+            except Exception as e:
+                print(f"  ! Note on index {keys}: {str(e)}")
+        
+        print("Checking indexes...")
+        await safe_create_index(db.transactions, 'transaction_id')
+        await safe_create_index(db.transactions, 'amount')
+        await safe_create_index(db.transactions, 'timestamp')
+        await safe_create_index(db.transactions, 'src_account')
+        if company_id:
+            await safe_create_index(db.transactions, 'company_id')
+        
+        # Generate and import accounts
+        print("\n4. Generating sample account data...")
+        accounts = generate_sample_accounts(company_id, 100)
+        # Ensure IDs are unique across companies
+        for i, a in enumerate(accounts):
+            a['account_id'] = f"{id_prefix}ACC{i:04d}"
+        
+        print(f"✓ Generated {len(accounts)} sample accounts")
+        
+        print("5. Importing accounts into MongoDB...")
+        await db.accounts.delete_many(filter_dict)  # Clear existing for this company
+        try:
+            result = await db.accounts.insert_many(accounts)
+            print(f"✓ Imported {len(result.inserted_ids)} accounts")
+        except Exception as e:
+            print(f"✗ Failed to import accounts: {e}")
+            if hasattr(e, 'details'):
+                print(f"  Details: {e.details}")
+        
+        # Create indexes - safely
+        await safe_create_index(db.accounts, 'account_id')
+        await safe_create_index(db.accounts, 'customer_id')
+        if company_id:
+            await safe_create_index(db.accounts, 'company_id')
+        print("✓ Index check on accounts collection done")
     
     # Seed example rules
     print("\n6. Seeding example compliance rules...")
     await seed_example_rules(db, company_id)
+    # Data loaded without a company is shared by every tenant
+    await bump_data_version(db, company_id or GLOBAL_SCOPE)
     
     # Summary
     print("\n" + "=" * 60)
@@ -0,0 +1,124 @@
+"""
+Move embedded violation and case comments into the comments collection
+Copies each document's `comments` array into the comments collection, sets
+`comment_count` and removes the array. Safe to re-run: comments are upserted
+on their natural key and documents without an array are skipped.
+"""
+import asyncio
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from app.config import settings
+from app.services.comment_service import ENTITY_COLLECTIONS
+from app.services.response_cache import bump_data_version
+
+WRITE_BATCH_SIZE = 500
+
+
+async def migrate_entity(db, entity_type: str, company_id=None) -> tuple:
+    """Migrate one entity collection; returns (documents migrated, comments copied, company ids)"""
+    collection = db[ENTITY_COLLECTIONS[entity_type]]
+    query = {"comments": {"$exists": True}}
+    if company_id:
+        query["company_id"] = company_id
+    
+    migrated = 0
+    copied = 0
+    company_ids = set()
+    async for doc in collection.find(query, {"company_id": 1, "comments": 1}):
+        entity_id = str(doc["_id"])
+        comments = doc.get("comments") or []
+        
+        operations = []
+        for comment in comments:
+            key = {
+                "company_id": doc["company_id"],
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "user_id": comment.get("user_id"),
+                "created_at": comment.get("created_at")
+            }
+            operations.append(UpdateOne(
+                key,
+                {"$setOnInsert": {**key, "user_name": comment.get("user_name"), "comment": comment.get("comment")}},
+                upsert=True
+            ))
+            if len(operations) >= WRITE_BATCH_SIZE:
+                await db.comments.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            await db.comments.bulk_write(operations, ordered=False)
+        
+        # Count what is stored, so comments added since the array was read are included
+        count = await db.comments.count_documents({
+            "company_id": doc["company_id"], "entity_type": entity_type, "entity_id": entity_id
+        })
+        await collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"comment_count": count}, "$unset": {"comments": ""}}
+        )
+        migrated += 1
+        copied += len(comments)
+        company_ids.add(doc["company_id"])
+    
+    # Documents that never had comments still need a count
+    missing = {"comment_count": {"$exists": False}}
+    if company_id:
+        missing["company_id"] = company_id
+    await collection.update_many(missing, {"$set": {"comment_count": 0}})
+    
+    return migrated, copied, company_ids
+
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Move embedded comments into the comments collection')
+    parser.add_argument('--company-id', type=str, help='Only migrate this company (default: all)')
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("PolicyGuard - Comment Migration")
+    print("=" * 70)
+    
+    print(f"\nConnecting to MongoDB at {settings.MONGO_URI}...")
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client[settings.MONGO_DB_NAME]
+    
+    try:
+        await client.admin.command('ping')
+        print("✓ Connected to MongoDB successfully")
+    except Exception as e:
+        print(f"✗ Failed to connect to MongoDB: {e}")
+        return
+    
+    try:
+        await db.comments.create_index(
+            [("company_id", 1), ("entity_type", 1), ("entity_id", 1), ("created_at", -1), ("_id", -1)]
+        )
+        
+        company_ids = set()
+        for entity_type, collection_name in ENTITY_COLLECTIONS.items():
+            migrated, copied, companies = await migrate_entity(db, entity_type, args.company_id)
+            company_ids |= companies
+            print(f"✓ Moved {copied} comments from {migrated} {collection_name}")
+        
+        # Cached responses for these companies still embed the old arrays
+        for company_id in company_ids:
+            await bump_data_version(db, company_id)
+        
+        print("\n✓ Comment migration complete")
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Rebuild violation rollups
+Recomputes the rule_metrics counters and violation_daily_stats rollups from
+the violations collection, to backfill existing data or repair drift
+"""
+import asyncio
+import sys
+import argparse
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.services.rule_metrics import rebuild_rule_metrics
+from app.services.violation_stats import rebuild_violation_daily_stats
+
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Rebuild violation rollups')
+    parser.add_argument('--company-id', type=str, help='Company ID to rebuild (default: all companies)')
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    print("PolicyGuard - Violation Rollup Rebuild")
+    print("=" * 70)
+    
+    print(f"\nConnecting to MongoDB at {settings.MONGO_URI}...")
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client[settings.MONGO_DB_NAME]
+    
+    try:
+        await client.admin.command('ping')
+        print("✓ Connected to MongoDB successfully")
+    except Exception as e:
+        print(f"✗ Failed to connect to MongoDB: {e}")
+        return
+    
+    if args.company_id:
+        company_ids = [args.company_id]
+    else:
+        company_ids = [str(c["_id"]) async for c in db.companies.find({}, {"_id": 1})]
+    
+    try:
+        for company_id in company_ids:
+            started = time.time()
+            rules = await rebuild_rule_metrics(db, company_id)
+            rows = await rebuild_violation_daily_stats(db, company_id)
+            print(f"\n✓ Company {company_id}")
+            print(f"  - Rule metrics: {rules} rules")
+            print(f"  - Daily stats: {rows} rows")
+            print(f"  - Time: {time.time() - started:.2f}s")
+    except Exception as e:
+        print(f"\n✗ Error: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
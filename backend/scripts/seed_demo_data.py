@@ -15,6 +15,11 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 from app.config import settings
 from app.services.auth_service import hash_password
+from app.services.account_risk import compute_account_risk
+from app.services.rule_metrics import rebuild_rule_metrics
+from app.services.violation_stats import rebuild_violation_daily_stats
+from app.services.violation_fields import extract_account_ids, rule_fields
+from app.services.comment_service import CASE
 
 
 # Demo company and user credentials
@@ -476,14 +481,17 @@ async def run_demo_scan(db, company_id, rule_ids, user_id):
                 assigned_to_user_id = user_id if idx % 3 == 0 else None
                 assigned_to_user_name = DEMO_ADMIN_NAME if idx % 3 == 0 else None
                 
+                document_data = {k: str(v) if isinstance(v, ObjectId) else v for k, v in doc.items()}
                 violation_doc = {
                     "company_id": company_id,
                     "scan_run_id": scan_run_id,
                     "rule_id": rule_id,
                     "rule_name": rule["name"],
+                    **rule_fields(rule),
                     "collection": collection_name,
                     "document_id": str(doc.get("_id", "unknown")),
-                    "document_data": {k: str(v) if isinstance(v, ObjectId) else v for k, v in doc.items()},
+                    "document_data": document_data,
+                    "account_ids": extract_account_ids(document_data),
                     "severity": rule["severity"],
                     "status": "OPEN",  # Changed from ERROR to OPEN
                     "explanation": rule.get("explanation", f"Violation detected by rule: {rule['name']}"),
@@ -510,7 +518,7 @@ async def run_demo_scan(db, company_id, rule_ids, user_id):
                 "execution_time_ms": (time.time() - rule_start) * 1000
             }
             rule_results.append(rule_result)
-            
+        
         except Exception as e:
             print(f"  ! Error executing rule {rule_id}: {str(e)}")
             rule_results.append({
@@ -553,6 +561,7 @@ async def seed_cases(db, company_id, user_id):
     
     # Clear existing demo cases
     await db.cases.delete_many({"company_id": company_id})
+    await db.comments.delete_many({"company_id": company_id, "entity_type": CASE})
     
     # Get some violations to link to cases
     violations = await db.violations.find({"company_id": company_id}).limit(10).to_list(length=10)
@@ -571,7 +580,7 @@ async def seed_cases(db, company_id, user_id):
             "primary_account_id": "ACC0023",
             "assigned_to_user_id": user_id,
             "assigned_to_user_name": DEMO_ADMIN_NAME,
-            "violation_ids": [str(violations[0]["_id"]), str(violations[1]["_id"])],
+            "linked_violation_ids": [str(violations[0]["_id"]), str(violations[1]["_id"])],
             "comments": [
                 {
                     "user_id": user_id,
@@ -592,7 +601,7 @@ async def seed_cases(db, company_id, user_id):
             "primary_account_id": "ACC0045",
             "assigned_to_user_id": user_id,
             "assigned_to_user_name": DEMO_ADMIN_NAME,
-            "violation_ids": [str(violations[2]["_id"]), str(violations[3]["_id"]), str(violations[4]["_id"])],
+            "linked_violation_ids": [str(violations[2]["_id"]), str(violations[3]["_id"]), str(violations[4]["_id"])],
             "comments": [
                 {
                     "user_id": user_id,
@@ -612,8 +621,25 @@ async def seed_cases(db, company_id, user_id):
         }
     ]
     
+    # Comments are stored in their own collection; cases only keep a count
+    case_comments = [case.pop("comments") for case in cases]
+    for case, comments in zip(cases, case_comments):
+        case["comment_count"] = len(comments)
+    
     result = await db.cases.insert_many(cases)
     case_ids = [str(cid) for cid in result.inserted_ids]
+    await db.comments.insert_many([
+        {"company_id": company_id, "entity_type": CASE, "entity_id": case_id, **comment}
+        for case_id, comments in zip(case_ids, case_comments)
+        for comment in comments
+    ])
+    
+    # Linked violations record their case, which keeps auto-casing off them
+    for case_id, case in zip(case_ids, cases):
+        await db.violations.update_many(
+            {"_id": {"$in": [ObjectId(vid) for vid in case["linked_violation_ids"]]}},
+            {"$addToSet": {"case_ids": case_id}}
+        )
     print(f"✓ Seeded {len(case_ids)} investigation cases (all assigned to demo user)")
     
     return case_ids
@@ -674,10 +700,12 @@ async def create_indexes(db):
         await db.users.create_index([("company_id", 1), ("email", 1)], unique=True)
         
         # Accounts
-        await db.accounts.create_index([("company_id", 1), ("account_id", 1)])
+        await db.accounts.create_index([("company_id", 1), ("account_id", 1)], unique=True)
         await db.accounts.create_index("risk_score")
+        await db.accounts.create_index([("company_id", 1), ("_id", -1)])
         
         # Transactions
+        await db.transactions.create_index([("company_id", 1), ("transaction_id", 1)], unique=True)
         await db.transactions.create_index([("company_id", 1), ("timestamp", -1)])
         await db.transactions.create_index([("company_id", 1), ("src_account", 1)])
         await db.transactions.create_index("amount")
@@ -687,23 +715,55 @@ async def create_indexes(db):
         
         # Rules
         await db.rules.create_index([("company_id", 1), ("enabled", 1)])
+        await db.rules.create_index([("company_id", 1), ("created_at", -1), ("_id", -1)])
         
         # Violations
         await db.violations.create_index([("company_id", 1), ("status", 1)])
         await db.violations.create_index([("company_id", 1), ("severity", 1)])
-        await db.violations.create_index([("company_id", 1), ("created_at", -1)])
+        await db.violations.create_index([("company_id", 1), ("created_at", -1), ("_id", -1)])
+        await db.violations.create_index([("company_id", 1), ("framework", 1), ("created_at", -1), ("_id", -1)])
+        await db.violations.create_index([("company_id", 1), ("control_id", 1), ("created_at", -1), ("_id", -1)])
+        await db.violations.create_index([("company_id", 1), ("status", 1), ("case_ids", 1), ("created_at", 1)])
+        await db.violations.create_index([("company_id", 1), ("case_ids", 1), ("created_at", -1), ("_id", -1)])
+        await db.violations.create_index([("company_id", 1), ("account_ids", 1), ("created_at", -1)])
+        await db.violations.create_index([("company_id", 1), ("rule_id", 1), ("created_at", -1)])
         
         # Scan runs
-        await db.scan_runs.create_index([("company_id", 1), ("started_at", -1)])
+        await db.scan_runs.create_index([("company_id", 1), ("started_at", -1), ("_id", -1)])
         
         # Cases
         await db.cases.create_index([("company_id", 1), ("status", 1)])
+        await db.cases.create_index([("company_id", 1), ("created_at", -1), ("_id", -1)])
+        await db.cases.create_index(
+            [("company_id", 1), ("auto_case_key", 1)],
+            unique=True,
+            partialFilterExpression={"auto_case_key": {"$type": "string"}, "status": {"$in": ["OPEN", "IN_REVIEW"]}}
+        )
+        
+        # Comments
+        await db.comments.create_index(
+            [("company_id", 1), ("entity_type", 1), ("entity_id", 1), ("created_at", -1), ("_id", -1)]
+        )
         
         print("✓ Database indexes created")
     except Exception as e:
         print(f"  ! Note: Some indexes may already exist: {str(e)}")
 
 
+async def seed_account_risk(db, company_id):
+    """Rebuild the materialized account risk table from the seeded violations"""
+    print("\n11. Computing account risk scores...")
+    
+    summary = await compute_account_risk(db, company_id)
+    print(f"✓ Scored {summary['accounts_scored']} accounts ({summary['seed_accounts']} with confirmed violations)")
+    
+    # Seeded violations bypass the write hooks, so rebuild the violation rollups too
+    rules = await rebuild_rule_metrics(db, company_id)
+    print(f"✓ Rebuilt outcome counters for {rules} rules")
+    rows = await rebuild_violation_daily_stats(db, company_id)
+    print(f"✓ Rebuilt {rows} daily violation rollups")
+
+
 async def main():
     """Main seeding function"""
     print("=" * 70)
@@ -734,6 +794,7 @@ async def main():
         case_ids = await seed_cases(db, company_id, user_id)
         await update_violation_statuses(db, company_id)
         await create_indexes(db)
+        await seed_account_risk(db, company_id)
         
         # Summary
         print("\n" + "=" * 70)
@@ -758,7 +819,7 @@ async def main():
         print(f"  3. Login at http://localhost:5173/login")
         print(f"  4. Explore the populated dashboard, violations, accounts, and analytics!")
         print("\n" + "=" * 70)
-        
+    
     except Exception as e:
         print(f"\n✗ Error during seeding: {e}")
         import traceback
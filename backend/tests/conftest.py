@@ -0,0 +1,9 @@
+"""
+Unit tests for pure helpers; they need no MongoDB
+The test_*.py scripts in backend/ are end-to-end runs against a live
+database and are run directly, not collected here.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
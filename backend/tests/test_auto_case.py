@@ -0,0 +1,105 @@
+"""Tests for auto-case grouping keys and case upserts"""
+from datetime import datetime
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.services.auto_case import DUPLICATE_KEY, _case_upsert, _upsert_cases, group_case_key
+
+
+def test_group_case_key_by_account():
+    assert group_case_key({"account_id": "ACC1"}) == "ACC1"
+
+
+def test_group_case_key_by_rule_and_window():
+    group_id = {"account_id": "ACC1", "rule_id": "R7", "window_start": datetime(2024, 3, 4)}
+    assert group_case_key(group_id) == "ACC1|rule:R7|window:2024-03-04"
+
+
+def test_group_case_key_ignores_field_order():
+    window = datetime(2024, 3, 4)
+    assert group_case_key({"window_start": window, "rule_id": "R7", "account_id": "ACC1"}) == \
+        group_case_key({"account_id": "ACC1", "rule_id": "R7", "window_start": window})
+
+
+def test_group_case_keys_are_distinct():
+    window = datetime(2024, 3, 4)
+    keys = {
+        group_case_key({"account_id": "ACC1"}),
+        group_case_key({"account_id": "ACC1", "rule_id": "R7"}),
+        group_case_key({"account_id": "ACC1", "window_start": window}),
+        group_case_key({"account_id": "ACC1", "rule_id": "R7", "window_start": window}),
+        group_case_key({"account_id": "ACC2", "rule_id": "R7", "window_start": window})
+    }
+    assert len(keys) == 5
+
+
+class RacingCases:
+    """
+    cases collection where a concurrent scan opens the given cases just
+    before our first write, so each of its upserts hits the unique index
+    """
+    
+    def __init__(self, keys, races=1):
+        self.open_keys = set(keys)
+        self.races = races
+        self.calls = []
+    
+    async def bulk_write(self, operations, ordered=True):
+        self.calls.append(operations)
+        keys = [operation._filter["auto_case_key"] for operation in operations]
+        upserted = [{"index": index} for index, key in enumerate(keys) if key not in self.open_keys]
+        if self.races:
+            self.races -= 1
+            raise BulkWriteError({
+                "writeErrors": [
+                    {"index": index, "code": DUPLICATE_KEY, "errmsg": "E11000 duplicate key"}
+                    for index, key in enumerate(keys) if key in self.open_keys
+                ],
+                "upserted": upserted,
+                "nMatched": 0
+            })
+        
+        class Result:
+            bulk_api_result = {"upserted": upserted, "nMatched": len(keys) - len(upserted)}
+        return Result()
+
+
+class FakeDB:
+    def __init__(self, cases):
+        self.cases = cases
+
+
+def _upserts(*account_ids):
+    now = datetime(2024, 3, 4)
+    return [
+        _case_upsert("acme", account_id, {
+            "_id": {"account_id": account_id},
+            "violation_ids": ["v1"],
+            "rule_names": ["Structuring"],
+            "severity_rank": 2
+        }, now)
+        for account_id in account_ids
+    ]
+
+
+def test_upsert_retry_matches_case_opened_concurrently():
+    cases = RacingCases({"ACC1"})
+    counts = asyncio.run(_upsert_cases(FakeDB(cases), _upserts("ACC1")))
+    assert counts == {"created": 0, "extended": 1}
+    assert len(cases.calls) == 2
+
+
+def test_upsert_retries_only_the_racing_cases():
+    cases = RacingCases({"ACC1", "ACC3"})
+    counts = asyncio.run(_upsert_cases(FakeDB(cases), _upserts("ACC1", "ACC2", "ACC3")))
+    assert [operation._filter["auto_case_key"] for operation in cases.calls[1]] == ["ACC1", "ACC3"]
+    assert counts == {"created": 1, "extended": 2}
+
+
+def test_upsert_gives_up_after_one_retry():
+    cases = RacingCases({"ACC1"}, races=2)
+    with pytest.raises(BulkWriteError):
+        asyncio.run(_upsert_cases(FakeDB(cases), _upserts("ACC1")))
+    assert len(cases.calls) == 2
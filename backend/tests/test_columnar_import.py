@@ -0,0 +1,59 @@
+"""Tests for vectorized record batch mapping"""
+import pyarrow as pa
+
+from app.services.columnar_import import map_batch
+from app.services.csv_import import default_transaction_id
+
+
+def _batch(count, bad_rows=(), with_ids=True):
+    rows = {
+        "date": [None if i in bad_rows else f"2024-01-{i % 28 + 1:02d}T10:00:00" for i in range(count)],
+        "amount": [100.0 + i for i in range(count)],
+        "from_account": [f"A{i}" for i in range(count)],
+        "to_account": [f"B{i}" for i in range(count)]
+    }
+    if with_ids:
+        rows["transaction_id"] = [f"T{i}" for i in range(count)]
+    return pa.RecordBatch.from_pydict(rows)
+
+
+def test_map_batch_without_bad_rows():
+    documents, row_numbers, rejected, rows_read = map_batch(_batch(50), "acme", 1)
+    assert rows_read == 50
+    assert rejected == []
+    assert row_numbers == list(range(1, 51))
+    assert [doc["transaction_id"] for doc in documents] == [f"T{i}" for i in range(50)]
+    assert documents[0]["company_id"] == "acme"
+    assert documents[0]["currency"] == "USD"
+
+
+def test_map_batch_isolates_bad_rows():
+    bad_rows = {0, 17, 18, 63}
+    documents, row_numbers, rejected, rows_read = map_batch(_batch(64, bad_rows), "acme", 101)
+    assert rows_read == 64
+    assert [row_number for row_number, _, _ in rejected] == [101 + i for i in sorted(bad_rows)]
+    assert all("'date' is required" in error for _, _, error in rejected)
+    assert rejected[1][1]["transaction_id"] == "T17"
+    
+    good = [i for i in range(64) if i not in bad_rows]
+    assert row_numbers == [101 + i for i in good]
+    assert [doc["transaction_id"] for doc in documents] == [f"T{i}" for i in good]
+
+
+def test_map_batch_all_rows_bad():
+    documents, row_numbers, rejected, _ = map_batch(_batch(5, set(range(5))), "acme", 1)
+    assert documents == [] and row_numbers == []
+    assert len(rejected) == 5
+
+
+def test_map_batch_default_ids_follow_row_numbers():
+    documents, row_numbers, _, _ = map_batch(_batch(10, {4}, with_ids=False), "acme", 21, source_id="upload-1")
+    assert [doc["transaction_id"] for doc in documents] == [
+        default_transaction_id("upload-1", row_number) for row_number in row_numbers
+    ]
+
+
+def test_map_batch_rejects_missing_ids_in_upsert_mode():
+    documents, _, rejected, _ = map_batch(_batch(4, with_ids=False), "acme", 1)
+    assert documents == []
+    assert [row_number for row_number, _, _ in rejected] == [1, 2, 3, 4]
@@ -0,0 +1,23 @@
+"""Tests for If-None-Match handling"""
+import pytest
+
+from app.routes.conditional import etag_matches
+
+
+ETAG = 'W/"abc123"'
+
+
+@pytest.mark.parametrize("header", [
+    'W/"abc123"',
+    '"abc123"',
+    '  W/"abc123"  ',
+    '"other", W/"abc123"',
+    '*'
+])
+def test_etag_matches(header):
+    assert etag_matches(header, ETAG)
+
+
+@pytest.mark.parametrize("header", [None, "", '"other"', 'W/"abc1234"', '"abc123'])
+def test_etag_does_not_match(header):
+    assert not etag_matches(header, ETAG)
@@ -0,0 +1,30 @@
+"""Tests for default transaction IDs"""
+import pytest
+
+from app.services.csv_import import default_transaction_id, import_source_id
+
+
+def test_default_transaction_id_is_stable():
+    assert default_transaction_id("upload-1", 7) == default_transaction_id("upload-1", 7)
+
+
+def test_default_transaction_id_format():
+    transaction_id = default_transaction_id("upload-1", 7)
+    assert transaction_id.startswith("TXN")
+    assert len(transaction_id) == 23
+
+
+def test_default_transaction_id_differs_per_row_and_upload():
+    ids = {default_transaction_id(source, row) for source in ("upload-1", "upload-2") for row in range(1, 101)}
+    assert len(ids) == 200
+
+
+def test_default_transaction_id_requires_source():
+    with pytest.raises(ValueError):
+        default_transaction_id(None, 1)
+
+
+def test_import_source_id():
+    assert import_source_id("upsert", "upload-1") is None
+    assert import_source_id("insert", "upload-1") == "upload-1"
+    assert import_source_id("insert") != import_source_id("insert")
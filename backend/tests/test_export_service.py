@@ -0,0 +1,91 @@
+"""Tests for chunked export serialization"""
+from datetime import datetime
+import csv
+import gzip
+import io
+import json
+
+import pyarrow.parquet as pq
+import pytest
+from bson import ObjectId
+
+from app.services.export_service import ExportFormat, ExportSerializer, export_row
+
+
+FIELDS = {
+    "id": "string",
+    "severity": "string",
+    "account_ids": "list",
+    "details": "json",
+    "created_at": "timestamp"
+}
+
+
+def _rows(count):
+    return [
+        export_row({
+            "_id": ObjectId(),
+            "severity": "HIGH" if i % 2 else None,
+            "account_ids": [f"ACC{i}", f"ACC{i + 1}"],
+            "details": {"score": i, "seen": datetime(2024, 1, 1)},
+            "created_at": datetime(2024, 1, 1, 0, 0, i % 60)
+        }, FIELDS)
+        for i in range(count)
+    ]
+
+
+def _serialize(export_format, chunks, compress=False):
+    serializer = ExportSerializer(export_format, FIELDS, compress)
+    data = b"".join(serializer.write(chunk) for chunk in chunks)
+    data += serializer.close()
+    return gzip.decompress(data) if compress else data
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_csv_round_trip(compress):
+    rows = _rows(10)
+    data = _serialize(ExportFormat.CSV, [rows[:4], rows[4:]], compress)
+    parsed = list(csv.DictReader(io.StringIO(data.decode())))
+    assert len(parsed) == 10
+    assert parsed[0] == {
+        "id": rows[0]["id"],
+        "severity": "",
+        "account_ids": "ACC0;ACC1",
+        "details": json.dumps({"score": 0, "seen": "2024-01-01T00:00:00"}),
+        "created_at": "2024-01-01T00:00:00"
+    }
+    assert parsed[1]["severity"] == "HIGH"
+
+
+def test_csv_empty_export_has_header():
+    data = _serialize(ExportFormat.CSV, [])
+    assert data.decode().strip() == ",".join(FIELDS)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_ndjson_round_trip(compress):
+    rows = _rows(5)
+    data = _serialize(ExportFormat.NDJSON, [rows[:2], rows[2:]], compress)
+    parsed = [json.loads(line) for line in data.decode().splitlines()]
+    assert [row["id"] for row in parsed] == [row["id"] for row in rows]
+    assert parsed[3]["account_ids"] == ["ACC3", "ACC4"]
+    assert parsed[3]["details"] == {"score": 3, "seen": "2024-01-01T00:00:00"}
+
+
+def test_parquet_round_trip():
+    rows = _rows(10)
+    data = _serialize(ExportFormat.PARQUET, [rows[:3], rows[3:]])
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column_names == list(FIELDS)
+    parsed = table.to_pylist()
+    assert [row["id"] for row in parsed] == [row["id"] for row in rows]
+    assert parsed[0]["severity"] is None
+    assert parsed[1]["account_ids"] == ["ACC1", "ACC2"]
+    assert json.loads(parsed[2]["details"]) == {"score": 2, "seen": "2024-01-01T00:00:00"}
+    assert parsed[5]["created_at"] == datetime(2024, 1, 1, 0, 0, 5)
+
+
+def test_parquet_empty_export():
+    table = pq.read_table(io.BytesIO(_serialize(ExportFormat.PARQUET, [])))
+    assert table.num_rows == 0
+    assert table.column_names == list(FIELDS)
@@ -0,0 +1,62 @@
+"""Tests for background import job failure handling"""
+import asyncio
+
+from bson import ObjectId
+
+from app.services import import_jobs
+
+
+class FakeJobs:
+    """import_jobs collection holding a single job"""
+    
+    def __init__(self, job):
+        self.job = job
+        self.updates = []
+    
+    async def find_one_and_update(self, query, update, return_document=None):
+        self.job.update(update["$set"])
+        return dict(self.job)
+    
+    async def update_one(self, query, update):
+        self.updates.append(update["$set"])
+        self.job.update(update["$set"])
+        
+        class Result:
+            matched_count = 1
+        return Result()
+
+
+class FakeDB:
+    def __init__(self, job):
+        self.import_jobs = FakeJobs(job)
+
+
+def test_missing_spool_fails_job_and_stops_heartbeat(monkeypatch, tmp_path):
+    async def bump_data_version(db, company_id):
+        pass
+    
+    monkeypatch.setattr(import_jobs, "bump_data_version", bump_data_version)
+    monkeypatch.setattr(import_jobs, "spool_path", lambda key: tmp_path / f"{key}.upload")
+    monkeypatch.setattr(import_jobs, "errors_path", lambda key: tmp_path / f"{key}.errors.csv")
+    monkeypatch.setattr(import_jobs.settings, "IMPORT_JOB_HEARTBEAT_SECONDS", 0.01)
+    
+    job_id = ObjectId()
+    db = FakeDB({
+        "_id": job_id,
+        "status": "QUEUED",
+        "company_id": "acme",
+        "filename": "transactions.csv",
+        "import_type": "transactions"
+    })
+    
+    async def run():
+        await import_jobs.run_job(db, job_id)
+        updates = len(db.import_jobs.updates)
+        await asyncio.sleep(0.05)
+        return updates
+    
+    updates = asyncio.run(run())
+    assert db.import_jobs.job["status"] == "FAILED"
+    assert "No such file" in db.import_jobs.job["error_message"]
+    # No heartbeat writes after the job finished
+    assert len(db.import_jobs.updates) == updates
@@ -0,0 +1,60 @@
+"""Tests for keyset pagination cursors"""
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services.pagination import decode_cursor, encode_cursor, keyset_filter
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "created_at": datetime(2024, 3, 1, 12, 30)}
+    assert decode_cursor(encode_cursor(doc, "created_at")) == [doc["created_at"], doc["_id"]]
+
+
+def test_cursor_round_trip_on_id():
+    doc = {"_id": ObjectId()}
+    assert decode_cursor(encode_cursor(doc, "_id")) == [doc["_id"]]
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor({"_id": ObjectId(), "rule_name": "a/b+c?"}, "rule_name")
+    assert "=" not in cursor
+    assert "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor!", "e30", "WzEsMiwzXQ"])
+def test_decode_cursor_rejects_malformed(cursor):
+    # e30 is {} and WzEsMiwzXQ is [1,2,3]
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_filter_on_id():
+    last_id = ObjectId()
+    cursor = encode_cursor({"_id": last_id}, "_id")
+    assert keyset_filter("_id", cursor) == {"_id": {"$lt": last_id}}
+
+
+def test_keyset_filter_on_field():
+    doc = {"_id": ObjectId(), "created_at": datetime(2024, 3, 1)}
+    assert keyset_filter("created_at", encode_cursor(doc, "created_at")) == {
+        "$or": [
+            {"created_at": {"$lt": doc["created_at"]}},
+            {"created_at": doc["created_at"], "_id": {"$lt": doc["_id"]}},
+            {"created_at": None}
+        ]
+    }
+
+
+def test_keyset_filter_past_missing_values():
+    doc = {"_id": ObjectId()}
+    assert keyset_filter("created_at", encode_cursor(doc, "created_at")) == {
+        "created_at": None, "_id": {"$lt": doc["_id"]}
+    }
+
+
+def test_keyset_filter_rejects_id_cursor_for_field():
+    cursor = encode_cursor({"_id": ObjectId()}, "_id")
+    with pytest.raises(ValueError):
+        keyset_filter("created_at", cursor)
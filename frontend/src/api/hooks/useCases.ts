@@ -1,6 +1,6 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { apiClient } from '../client';
-import type { Case } from '../../types';
+import type { Case, CaseDetail } from '../../types';
 
 export function useCases(filters?: { status?: string; severity?: string }) {
   return useQuery<Case[]>({
@@ -16,10 +16,11 @@ export function useCases(filters?: { status?: string; severity?: string }) {
 }
 
 export function useCase(id: string | null) {
-  return useQuery<Case>({
+  return useQuery<CaseDetail>({
     queryKey: ['cases', id],
     queryFn: async () => {
-      const response = await apiClient.get(`/cases/${id}`);
+      // Case with its first page of linked violations, joined server-side
+      const response = await apiClient.get(`/cases/${id}/expanded`);
       return response.data;
     },
     enabled: !!id,
@@ -1,6 +1,6 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { apiClient } from '../client';
-import type { Violation } from '../../types';
+import type { Violation, ViolationComment } from '../../types';
 
 interface ViolationFilters {
   rule_id?: string;
@@ -48,6 +48,17 @@ export const useUpdateViolation = () => {
   });
 };
 
+export const useViolationComments = (violationId: string | null) => {
+  return useQuery({
+    queryKey: ['violation-comments', violationId],
+    queryFn: async () => {
+      const { data } = await apiClient.get<ViolationComment[]>(`/violations/${violationId}/comments`);
+      return data;
+    },
+    enabled: !!violationId,
+  });
+};
+
 export const useAddViolationComment = () => {
   const queryClient = useQueryClient();
   
@@ -56,8 +67,9 @@ export const useAddViolationComment = () => {
       const { data } = await apiClient.post<Violation>(`/violations/${violationId}/comment`, { comment });
       return data;
     },
-    onSuccess: () => {
+    onSuccess: (data) => {
       queryClient.invalidateQueries({ queryKey: ['violations'] });
+      queryClient.invalidateQueries({ queryKey: ['violation-comments', data.id] });
     },
   });
 };
@@ -297,15 +297,15 @@ export default function CasesPage() {
 
                             <Typography variant="subtitle2" gutterBottom sx={{ fontWeight: 700 }}>Evidence Portfolio</Typography>
                             <Typography variant="caption" color="text.secondary" display="block" sx={{ mb: 1 }}>
-                                Linked violations being investigated in this case:
+                                Linked violations being investigated in this case ({detail.linked_violation_count}, newest first):
                             </Typography>
                             <Box sx={{ mb: 4 }}>
-                                {detail.linked_violation_ids?.length === 0 ? (
+                                {detail.linked_violations?.length === 0 ? (
                                     <Alert severity="info" variant="outlined">No violations linked to this case yet.</Alert>
                                 ) : (
-                                    detail.linked_violation_ids?.map((vid, idx) => (
+                                    detail.linked_violations?.map((v) => (
                                         <Paper
-                                            key={vid}
+                                            key={v.id}
                                             variant="outlined"
                                             sx={{
                                                 p: 1.5,
@@ -316,9 +316,14 @@ export default function CasesPage() {
                                                 justifyContent: 'space-between'
                                             }}
                                         >
-                                            <Typography variant="caption" sx={{ fontFamily: 'monospace', fontWeight: 600 }}>
-                                                EVIDENCE_{idx + 1}: {vid}
-                                            </Typography>
+                                            <Box>
+                                                <Typography variant="caption" sx={{ fontWeight: 700 }} display="block">
+                                                    {v.rule_name} · {v.severity} · {v.status}
+                                                </Typography>
+                                                <Typography variant="caption" color="text.secondary" sx={{ fontFamily: 'monospace' }}>
+                                                    {v.document_id} · {new Date(v.created_at).toLocaleString()}
+                                                </Typography>
+                                            </Box>
                                             <IconButton size="small"><VisibilityIcon fontSize="inherit" /></IconButton>
                                         </Paper>
                                     ))
@@ -38,6 +38,7 @@ import {
   useViolations,
   useUpdateViolation,
   useAddViolationComment,
+  useViolationComments,
   useAssignViolation
 } from '../../api/hooks/useViolations';
 import { useCreateCase } from '../../api/hooks/useCases';
@@ -60,6 +61,9 @@ export default function ViolationsPage() {
 
   const updateViolation = useUpdateViolation();
   const addComment = useAddViolationComment();
+  // List rows only carry comment_count; the thread is fetched per violation, newest first
+  const { data: comments } = useViolationComments(selectedViolation?.id ?? null);
+  const thread = comments ? [...comments].reverse() : [];
   const assignViolation = useAssignViolation();
   const createCase = useCreateCase();
 
@@ -336,12 +340,12 @@ export default function ViolationsPage() {
 
               <Typography variant="subtitle2" gutterBottom sx={{ fontWeight: 700 }}>Collaboration & Audit Log</Typography>
               <List sx={{ mb: 3 }}>
-                {selectedViolation.comments?.length === 0 ? (
+                {thread.length === 0 ? (
                   <Typography variant="body2" color="text.secondary" sx={{ py: 2, fontStyle: 'italic' }}>
                     No comments yet. Be the first to add an investigation note.
                   </Typography>
                 ) : (
-                  selectedViolation.comments?.map((c, i) => (
+                  thread.map((c, i) => (
                     <Box key={i} sx={{ mb: 2, p: 2, borderRadius: 2, bgcolor: alpha(theme.palette.action.hover, 0.5), border: `1px solid ${theme.palette.divider}` }}>
                       <Box sx={{ display: 'flex', justifyContent: 'space-between', mb: 1 }}>
                         <Typography variant="caption" sx={{ fontWeight: 800, color: theme.palette.primary.main }}>{c.user_name}</Typography>
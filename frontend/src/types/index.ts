@@ -60,6 +60,8 @@ export interface Violation {
   assigned_to_user_id?: string;
   assigned_to_user_name?: string;
   comments?: ViolationComment[];
+  comment_count?: number;
+  case_ids?: string[];
   created_at: string;
   updated_at: string;
 }
@@ -82,6 +84,7 @@ export interface Case {
   assigned_to_user_name?: string;
   linked_violation_ids: string[];
   comments: CaseComment[];
+  comment_count?: number;
   due_by?: string;
   sla_status?: 'ON_TRACK' | 'AT_RISK' | 'BREACHED';
   level?: 'L1' | 'L2' | 'QA';
@@ -92,6 +95,27 @@ export interface Case {
   created_by_name: string;
 }
 
+export interface LinkedViolation {
+  id: string;
+  rule_id: string;
+  rule_name: string;
+  framework?: string;
+  control_id?: string;
+  collection: string;
+  document_id: string;
+  account_ids: string[];
+  severity: 'LOW' | 'MEDIUM' | 'HIGH' | 'CRITICAL';
+  status: 'OPEN' | 'CONFIRMED' | 'DISMISSED' | 'FALSE_POSITIVE';
+  assigned_to_user_name?: string;
+  created_at: string;
+}
+
+// GET /cases/{id}/expanded: one page of linked violations instead of linked_violation_ids
+export interface CaseDetail extends Omit<Case, 'linked_violation_ids'> {
+  linked_violations: LinkedViolation[];
+  linked_violation_count: number;
+}
+
 export interface ActivityLogEntry {
   type: string;
   user_id: string;